@@ -0,0 +1,55 @@
+"""Add wallet cost basis
+
+Revision ID: 3b7d2f91c4a8
+Revises: e33bb845793c
+Create Date: 2026-10-17 10:12:41.518203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b7d2f91c4a8"
+down_revision: Union[str, None] = "e33bb845793c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("wallets")}
+    if "total_cost" not in columns:
+        op.add_column(
+            "wallets",
+            sa.Column("total_cost", sa.Numeric(15, 2), nullable=False, server_default="0"),
+        )
+    if "avg_buy_price" not in columns:
+        op.add_column(
+            "wallets",
+            sa.Column("avg_buy_price", sa.Numeric(15, 6), nullable=False, server_default="0"),
+        )
+
+    # Backfill only columns added here, so a re-run cannot overwrite live cost
+    # basis: average the BUY history, then value the open quantity at it
+    if "avg_buy_price" not in columns:
+        op.execute(
+            """
+            UPDATE wallets SET avg_buy_price = COALESCE((
+                SELECT SUM(t.amount) / NULLIF(SUM(t.quantity), 0)
+                FROM transactions t
+                WHERE t.user_id = wallets.user_id
+                  AND t.stock_id = wallets.stock_id
+                  AND t.type = 'BUY'
+            ), 0)
+            """
+        )
+    if "total_cost" not in columns:
+        op.execute("UPDATE wallets SET total_cost = ROUND(quantity * avg_buy_price, 2)")
+
+
+def downgrade() -> None:
+    op.drop_column("wallets", "avg_buy_price")
+    op.drop_column("wallets", "total_cost")
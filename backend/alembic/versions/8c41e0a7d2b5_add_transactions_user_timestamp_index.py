@@ -0,0 +1,33 @@
+"""Add transactions user/timestamp index
+
+Revision ID: 8c41e0a7d2b5
+Revises: 3b7d2f91c4a8
+Create Date: 2026-10-17 14:03:27.904115
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8c41e0a7d2b5"
+down_revision: Union[str, None] = "3b7d2f91c4a8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    indexes = {i["name"] for i in sa.inspect(op.get_bind()).get_indexes("transactions")}
+    if "ix_transactions_user_timestamp_id" not in indexes:
+        op.create_index(
+            "ix_transactions_user_timestamp_id",
+            "transactions",
+            ["user_id", "timestamp", "id"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_user_timestamp_id", table_name="transactions")
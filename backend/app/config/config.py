@@ -35,6 +35,41 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Idempotency-Key settings
+    IDEMPOTENCY_BACKEND: str = "memory"  # Options: memory, database
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+
+    # Per-user trade lock settings
+    TRADE_LOCK_BACKEND: str = "memory"  # Options: memory, advisory
+    TRADE_LOCK_STRIPES: int = 256
+
+    # Group-commit trade journal settings
+    TRADE_JOURNAL_ENABLED: bool = False
+    TRADE_JOURNAL_FLUSH_MS: int = 5
+    TRADE_JOURNAL_MAX_BATCH: int = 200
+
+    # Portfolio summary cache settings
+    PORTFOLIO_CACHE_MAX_ENTRIES: int = 10000
+
+    # In-process price cache settings
+    PRICE_CACHE_HISTORY_SIZE: int = 300
+
+    # Price change log settings
+    PRICE_CHANGE_LOG_SIZE: int = 288
+
+    # Live price stream settings
+    PRICE_STREAM_QUEUE_SIZE: int = 16
+    PRICE_STREAM_KEEPALIVE_SECONDS: int = 15
+
+    # Stock history cache settings
+    STOCK_HISTORY_CACHE_MAX_ENTRIES: int = 2000
+
+    # Portfolio snapshot settings
+    PORTFOLIO_SNAPSHOTS_ENABLED: bool = True
+    PORTFOLIO_SNAPSHOT_CHUNK_SIZE: int = 1000
+    PORTFOLIO_SNAPSHOT_RETENTION_DAYS: int = 30  # 0 keeps snapshots forever
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from app.db.database import AsyncSessionLocal
 from app.db.models import Stock, StockPriceHistory
+from app.services.candles import candle_rollup
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -99,6 +100,9 @@ async def add_price_history_to_stocks():
                     f"Added {len(price_history_data)} price history points for {stock.symbol}"
                 )
 
+            # The session does not autoflush; the backfill reads the new history rows
+            await session.flush()
+            await candle_rollup.backfill(session)
             await session.commit()
             logger.info("Successfully added price history to all stocks!")
 
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.dialects import postgresql, sqlite
 from app.utils.logger import setup_logger
 from app.config import get_settings
 from urllib.parse import quote_plus
@@ -88,6 +89,16 @@ async def get_db() -> AsyncSession:
         await session.close()
 
 
+def dialect_insert(session: AsyncSession):
+    """
+    Return the dialect specific insert() construct for the session's bind.
+    Both the PostgreSQL and SQLite variants support ON CONFLICT clauses.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
 async def init_db() -> None:
     """
     Initialize database tables and perform any startup database operations.
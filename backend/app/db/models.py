@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Enum, UniqueConstraint, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Enum, UniqueConstraint, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -16,6 +16,14 @@ class TransactionType(enum.Enum):
     SELL = "SELL"
 
 
+class OrderStatus(enum.Enum):
+    """Limit order lifecycle status"""
+    OPEN = "OPEN"
+    FILLED = "FILLED"
+    CANCELLED = "CANCELLED"
+    REJECTED = "REJECTED"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -87,6 +95,11 @@ class Transaction(Base):
     user = relationship("User", back_populates="transactions")
     stock = relationship("Stock", back_populates="transactions")
 
+    # Composite index backing keyset pagination of a user's history
+    __table_args__ = (
+        Index('ix_transactions_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
+
 
 class Wallet(Base):
     """Wallet model tracking user's stock holdings"""
@@ -96,6 +109,9 @@ class Wallet(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False, index=True)
     quantity = Column(Numeric(precision=15, scale=6), nullable=False, default=0)
+    # Running cost basis (average cost method), maintained by every trade
+    total_cost = Column(Numeric(precision=15, scale=2), nullable=False, default=0, server_default="0")
+    avg_buy_price = Column(Numeric(precision=15, scale=6), nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -109,6 +125,28 @@ class Wallet(Base):
     )
 
 
+class LimitOrder(Base):
+    """Limit order resting until the stock price crosses its limit"""
+    __tablename__ = "limit_orders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False, index=True)
+    side = Column(Enum(TransactionType), nullable=False)
+    limit_price = Column(Numeric(precision=15, scale=2), nullable=False)
+    amount = Column(Numeric(precision=15, scale=2), nullable=True)  # Cash to spend (BUY)
+    quantity = Column(Numeric(precision=15, scale=6), nullable=True)  # Stock to sell (SELL)
+    status = Column(Enum(OrderStatus), nullable=False, default=OrderStatus.OPEN, index=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    filled_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    user = relationship("User")
+    stock = relationship("Stock")
+    transaction = relationship("Transaction")
+
+
 class StockPriceHistory(Base):
     """Historical stock price tracking for graphing and analysis"""
     __tablename__ = "stock_price_history"
@@ -122,6 +160,49 @@ class StockPriceHistory(Base):
     stock = relationship("Stock", back_populates="price_history")
 
 
+class PriceCandle(Base):
+    """OHLC rollup of stock prices at 5m, 1h or 1d resolution"""
+    __tablename__ = "price_candles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    resolution = Column(String(4), nullable=False)  # 5m, 1h, 1d
+    bucket_start = Column(DateTime, nullable=False)
+    open = Column(Numeric(precision=15, scale=2), nullable=False)
+    high = Column(Numeric(precision=15, scale=2), nullable=False)
+    low = Column(Numeric(precision=15, scale=2), nullable=False)
+    close = Column(Numeric(precision=15, scale=2), nullable=False)
+
+    # Relationships
+    stock = relationship("Stock")
+
+    # One candle per stock, resolution and bucket; also serves range scans
+    __table_args__ = (
+        UniqueConstraint('stock_id', 'resolution', 'bucket_start', name='unique_stock_resolution_bucket'),
+    )
+
+
+class PortfolioSnapshot(Base):
+    """Portfolio valuation of one user taken after a price tick"""
+    __tablename__ = "portfolio_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    current_value = Column(Numeric(precision=15, scale=2), nullable=False)
+    total_invested = Column(Numeric(precision=15, scale=2), nullable=False)
+    gain_loss_amount = Column(Numeric(precision=15, scale=2), nullable=False)
+    gain_loss_percentage = Column(Numeric(precision=15, scale=2), nullable=False)
+    cash_balance = Column(Numeric(precision=15, scale=2), nullable=False)
+    timestamp = Column(DateTime, default=func.now(), nullable=False, index=True)
+
+    # Relationships
+    user = relationship("User")
+
+    __table_args__ = (
+        Index('ix_portfolio_snapshots_user_timestamp', 'user_id', 'timestamp'),
+    )
+
+
 class UserUIConfig(Base):
     """Per-user UI configuration storage (e.g., LMS/layout preferences)."""
     __tablename__ = "user_ui_config"
@@ -132,3 +213,13 @@ class UserUIConfig(Base):
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     user = relationship("User")
+
+
+class IdempotencyKey(Base):
+    """Stored trade responses keyed by client supplied Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(320), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    response = Column(JSON, nullable=True)  # NULL while the first request is in flight
+    created_at = Column(DateTime, default=func.now(), index=True)
@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import AsyncSessionLocal, engine, Base
 from app.db.models import User, Stock, Transaction, Wallet, StockPriceHistory, TransactionType
+from app.services.candles import candle_rollup
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -154,6 +155,9 @@ async def create_stocks(session: AsyncSession) -> dict:
 
         logger.info(f"Created stock: {stock.symbol} - {stock.name} @ ${stock.current_price} with {len(price_history_data)} price history points")
 
+    # The session does not autoflush; the backfill reads the new history rows
+    await session.flush()
+    await candle_rollup.backfill(session)
     await session.commit()
     return stocks
 
@@ -208,7 +212,9 @@ async def create_sample_transactions(
     wallet_a = Wallet(
         user_id=trader1.id,
         stock_id=stock_a.id,
-        quantity=quantity_a
+        quantity=quantity_a,
+        total_cost=amount_a,
+        avg_buy_price=stock_a.current_price
     )
     session.add(wallet_a)
 
@@ -234,7 +240,9 @@ async def create_sample_transactions(
     wallet_b = Wallet(
         user_id=trader1.id,
         stock_id=stock_b.id,
-        quantity=quantity_b
+        quantity=quantity_b,
+        total_cost=amount_b,
+        avg_buy_price=stock_b.current_price
     )
     session.add(wallet_b)
 
@@ -262,7 +270,9 @@ async def create_sample_transactions(
     wallet_c = Wallet(
         user_id=trader2.id,
         stock_id=stock_c.id,
-        quantity=quantity_c
+        quantity=quantity_c,
+        total_cost=amount_c,
+        avg_buy_price=stock_c.current_price
     )
     session.add(wallet_c)
 
@@ -292,7 +302,9 @@ async def create_sample_transactions(
     wallet_d = Wallet(
         user_id=investor.id,
         stock_id=stock_d.id,
-        quantity=quantity_d
+        quantity=quantity_d,
+        total_cost=amount_d,
+        avg_buy_price=stock_d.current_price
     )
     session.add(wallet_d)
 
@@ -317,7 +329,9 @@ async def create_sample_transactions(
     wallet_e = Wallet(
         user_id=investor.id,
         stock_id=stock_e.id,
-        quantity=quantity_e
+        quantity=quantity_e,
+        total_cost=amount_e,
+        avg_buy_price=stock_e.current_price
     )
     session.add(wallet_e)
 
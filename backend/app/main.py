@@ -9,9 +9,14 @@ from app.routes.transactions import router as transactions_router
 from app.routes.stocks import router as stocks_router
 from app.routes.portfolio import router as portfolio_router
 from app.routes.lms import router as lms_router
+from app.routes.orders import router as orders_router
 from app.db.database import init_db, engine
 from app.config import get_settings
 from app.services.scheduler import background_scheduler
+from app.services.order_matcher import order_matcher
+from app.services.portfolio_snapshots import portfolio_snapshot_writer
+from app.services.price_cache import price_cache
+from app.services.trade_journal import trade_journal
 
 settings = get_settings()
 logger = setup_logger(__name__)
@@ -28,6 +33,16 @@ async def lifespan(app: FastAPI):
     try:
         await init_db()
 
+        # Rebuild the in-memory limit order book
+        await order_matcher.load_open_orders()
+
+        # Warm the in-memory quotes and recent price history
+        await price_cache.warm()
+
+        # Start the group-commit trade journal writer if enabled
+        if trade_journal.enabled:
+            await trade_journal.start()
+
         # Start background scheduler for stock price updates
         background_scheduler.start()
         logger.info("Background scheduler started - stock prices will update every 5 minutes")
@@ -45,6 +60,10 @@ async def lifespan(app: FastAPI):
         background_scheduler.shutdown()
         logger.info("Background scheduler stopped")
 
+        # Flush queued trades and finish any snapshot before the engine goes away
+        await trade_journal.shutdown()
+        await portfolio_snapshot_writer.shutdown()
+
         await engine.dispose()
 
 
@@ -71,5 +90,6 @@ app.include_router(transactions_router, prefix="/api")
 app.include_router(stocks_router, prefix="/api")
 app.include_router(portfolio_router, prefix="/api")
 app.include_router(lms_router, prefix="/api")
+app.include_router(orders_router, prefix="/api")
 
 logger.info("Application routes configured")
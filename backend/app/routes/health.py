@@ -1,4 +1,8 @@
 from fastapi import APIRouter
+from app.services.history_cache import stock_history_cache
+from app.services.portfolio_cache import portfolio_cache
+from app.services.price_stream import price_broadcaster
+from app.services.trade_locks import trade_locks
 from app.utils.logger import setup_logger
 
 router = APIRouter()
@@ -9,3 +13,27 @@ logger = setup_logger(__name__)
 async def health_check():
     logger.info("Health check endpoint called")
     return {"status": "healthy"}
+
+
+@router.get("/health/trade-locks", tags=["Health"])
+async def trade_lock_metrics():
+    """Per-user trade lock wait time metrics"""
+    return trade_locks.get_metrics()
+
+
+@router.get("/health/portfolio-cache", tags=["Health"])
+async def portfolio_cache_metrics():
+    """Portfolio summary cache hit/miss metrics"""
+    return portfolio_cache.get_metrics()
+
+
+@router.get("/health/stock-history-cache", tags=["Health"])
+async def stock_history_cache_metrics():
+    """Downsampled stock history cache hit/miss metrics"""
+    return stock_history_cache.get_metrics()
+
+
+@router.get("/health/price-stream", tags=["Health"])
+async def price_stream_metrics():
+    """Live price stream subscriber and drop metrics"""
+    return price_broadcaster.get_metrics()
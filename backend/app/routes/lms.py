@@ -16,6 +16,7 @@ from app.utils.logger import setup_logger
 from app.db.database import get_db
 from app.db.models import UserUIConfig, User
 from app.routes.auth import get_current_user
+from app.utils.etag import conditional_get
 
 router = APIRouter(prefix="/v1/lms", tags=["lms"])
 logger = setup_logger(__name__)
@@ -42,8 +43,13 @@ DEFAULT_LMS_CONFIG = {
     }
 }
 
+# Bumped on every change to DEFAULT_LMS_CONFIG; drives the /config ETag
+lms_config_version = 0
+lms_config_etag = conditional_get("lms", lambda: lms_config_version)
 
-@router.get("/config", response_model=LMSConfigResponse, status_code=status.HTTP_200_OK)
+
+@router.get("/config", response_model=LMSConfigResponse, status_code=status.HTTP_200_OK,
+            dependencies=[Depends(lms_config_etag)])
 async def get_lms_config():
     """
     Get current LMS configuration for frontend
@@ -53,7 +59,8 @@ async def get_lms_config():
     - Portfolio screen display options
     - Dashboard layout preferences
 
-    This configuration can be cached by frontend and synced periodically
+    This configuration can be cached by frontend and synced periodically;
+    send the returned ETag as If-None-Match to get a 304 while it is unchanged
     """
     logger.info("LMS configuration requested")
 
@@ -104,9 +111,11 @@ async def update_global_lms_config(
     current_user: User = Depends(get_current_user),
 ):
     """Update global LMS configuration (temporarily open to any authenticated user)."""
+    global lms_config_version
     DEFAULT_LMS_CONFIG["buy_screen"] = payload.buy_screen.model_dump()
     DEFAULT_LMS_CONFIG["portfolio_screen"] = payload.portfolio_screen.model_dump()
     DEFAULT_LMS_CONFIG["dashboard_screen"] = payload.dashboard_screen.model_dump()
+    lms_config_version += 1
     return payload
 
 
@@ -0,0 +1,215 @@
+"""
+Limit order routes for placing and cancelling resting orders
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from app.db.database import get_db
+from app.db.models import User, Stock, Wallet, LimitOrder, OrderStatus, TransactionType
+from app.schemas.order import LimitOrderCreate, LimitOrderResponse, OrderStatusEnum
+from app.services.order_book import order_book
+from app.services.order_matcher import book_order_from_row
+from app.services.trade_executor import trade_executor
+from app.services.trade_locks import trade_locks
+from app.services.trade_versions import user_trade_versions
+from app.utils.logger import setup_logger
+
+router = APIRouter(prefix="/v1/orders", tags=["orders"])
+logger = setup_logger(__name__)
+
+
+@router.post("", response_model=LimitOrderResponse, status_code=status.HTTP_201_CREATED)
+async def place_limit_order(request: LimitOrderCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Place a limit buy or sell order
+
+    - BUY orders fill when the price falls to or below the limit
+    - SELL orders fill when the price rises to or above the limit
+    - Orders already crossed by the current price fill immediately
+    - Otherwise the order rests in the book until a price tick crosses it
+
+    Cash and stock are not reserved; an order that can no longer be
+    funded when it is crossed is marked REJECTED.
+    """
+    try:
+        user_result = await db.execute(
+            select(User.id, User.balance).where(User.id == request.user_id)
+        )
+        user = user_result.one_or_none()
+
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with id {request.user_id} not found",
+            )
+
+        stock_result = await db.execute(
+            select(Stock.id, Stock.current_price).where(Stock.id == request.stock_id)
+        )
+        stock = stock_result.one_or_none()
+
+        if not stock:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Stock with id {request.stock_id} not found",
+            )
+
+        side = TransactionType(request.side.value)
+        order = LimitOrder(
+            user_id=request.user_id,
+            stock_id=request.stock_id,
+            side=side,
+            limit_price=request.limit_price,
+            amount=request.amount if side == TransactionType.BUY else None,
+            quantity=request.quantity if side == TransactionType.SELL else None,
+        )
+
+        if side == TransactionType.BUY:
+            marketable = stock.current_price <= request.limit_price
+            if not marketable and user.balance < request.amount:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Insufficient balance. Available: ${user.balance}, Required: ${request.amount}",
+                )
+        else:
+            marketable = stock.current_price >= request.limit_price
+            if not marketable:
+                wallet_result = await db.execute(
+                    select(Wallet.quantity).where(
+                        Wallet.user_id == request.user_id, Wallet.stock_id == request.stock_id
+                    )
+                )
+                available = wallet_result.scalar_one_or_none() or Decimal("0")
+                if available < request.quantity:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Insufficient stock quantity. Available: {available}, Required: {request.quantity}",
+                    )
+
+        if marketable:
+            async with trade_locks.hold(db, request.user_id):
+                if side == TransactionType.BUY:
+                    trade = await trade_executor.buy(
+                        db, request.user_id, request.stock_id, request.amount
+                    )
+                else:
+                    trade = await trade_executor.sell(
+                        db, request.user_id, request.stock_id, request.quantity
+                    )
+                order.status = OrderStatus.FILLED
+                order.transaction_id = trade.transaction_id
+                order.filled_at = datetime.now()
+                db.add(order)
+                await db.commit()
+            user_trade_versions.bump(request.user_id)
+        else:
+            db.add(order)
+            await db.commit()
+
+        await db.refresh(order)
+
+        if order.status == OrderStatus.OPEN:
+            order_book.add(book_order_from_row(order))
+
+        logger.info(
+            f"User {order.user_id} placed limit {side.value} order {order.id} "
+            f"on stock {order.stock_id} at ${order.limit_price} ({order.status.value})"
+        )
+
+        return LimitOrderResponse.model_validate(order)
+
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error placing limit order: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while placing the order",
+        )
+
+
+@router.delete("/{order_id}", response_model=LimitOrderResponse, status_code=status.HTTP_200_OK)
+async def cancel_limit_order(order_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Cancel an open limit order
+
+    Only OPEN orders can be cancelled.
+    """
+    try:
+        # Conditional UPDATE, so an order the matcher claimed is never cancelled
+        result = await db.execute(
+            update(LimitOrder)
+            .where(LimitOrder.id == order_id, LimitOrder.status == OrderStatus.OPEN)
+            .values(status=OrderStatus.CANCELLED)
+            .returning(LimitOrder)
+        )
+        order = result.scalar_one_or_none()
+
+        if not order:
+            current = await db.execute(select(LimitOrder.status).where(LimitOrder.id == order_id))
+            order_status = current.scalar_one_or_none()
+            if order_status is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Order with id {order_id} not found",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Order {order_id} is {order_status.value} and cannot be cancelled",
+            )
+
+        await db.commit()
+        await db.refresh(order)
+
+        order_book.remove(order_id)
+
+        logger.info(f"Cancelled limit order {order_id}")
+
+        return LimitOrderResponse.model_validate(order)
+
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error cancelling limit order {order_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while cancelling the order",
+        )
+
+
+@router.get(
+    "/user/{user_id}", response_model=list[LimitOrderResponse], status_code=status.HTTP_200_OK
+)
+async def get_user_orders(
+    user_id: int,
+    order_status: Optional[OrderStatusEnum] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List a user's limit orders, newest first
+
+    - **status**: Optional status filter (OPEN, FILLED, CANCELLED, REJECTED)
+    """
+    try:
+        query = select(LimitOrder).where(LimitOrder.user_id == user_id)
+        if order_status is not None:
+            query = query.where(LimitOrder.status == OrderStatus(order_status.value))
+
+        result = await db.execute(query.order_by(LimitOrder.id.desc()))
+        return [LimitOrderResponse.model_validate(o) for o in result.scalars().all()]
+
+    except Exception as e:
+        logger.error(f"Error fetching limit orders for user {user_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching orders",
+        )
@@ -1,24 +1,97 @@
 """
 Portfolio routes for viewing user portfolio summaries
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from decimal import Decimal
-from typing import List
+from sqlalchemy import select, and_, func, type_coerce
+from typing import List, Optional
 
-from app.db.database import get_db
-from app.db.models import User, Stock, Transaction, Wallet, TransactionType
+from app.db.database import get_db, AsyncSessionLocal
+from app.db.models import User, Stock, Wallet
+from app.routes.auth import get_current_admin
 from app.schemas.portfolio import (
     PortfolioSummaryResponse,
-    HoldingDetail
+    HoldingDetail,
+    PortfolioBatchRequest,
+    PortfolioHistoryResponse,
+    LeaderboardResponse,
+    PortfolioRiskResponse
 )
+from app.services.leaderboard import leaderboard
+from app.services.portfolio_cache import portfolio_cache
+from app.services.portfolio_history import portfolio_history_builder
+from app.services.portfolio_valuation import portfolio_valuator
+from app.services.risk_metrics import risk_analyzer
+from app.utils.fixed_point import Cents, from_cents, percentage
 from app.utils.logger import setup_logger
 
 router = APIRouter(prefix="/v1/portfolio", tags=["portfolio"])
 logger = setup_logger(__name__)
 
 
+async def _stream_valuations(user_ids: Optional[List[int]]):
+    """
+    Yield NDJSON valuations one chunk of users at a time
+
+    Runs in its own session because the request's session is closed
+    before a streaming response body is sent.
+    """
+    async with AsyncSessionLocal() as session:
+        async for chunk in portfolio_valuator.value_users(session, user_ids):
+            yield "".join(f"{valuation.model_dump_json()}\n" for valuation in chunk)
+
+
+@router.post("/batch", status_code=status.HTTP_200_OK)
+async def value_portfolios(
+    request: PortfolioBatchRequest,
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Value many users' portfolios against the current prices (admin only)
+
+    - **user_ids**: Users to value; omit to value every user
+
+    Streams one NDJSON line per user, ordered by user id. Unknown user
+    ids are skipped.
+    """
+    logger.info(
+        f"Admin {current_user.id} requested bulk valuation of "
+        f"{'all' if request.user_ids is None else len(request.user_ids)} users"
+    )
+    return StreamingResponse(
+        _stream_valuations(request.user_ids),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/leaderboard", response_model=LeaderboardResponse, status_code=status.HTTP_200_OK)
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    order: str = Query("gainers", pattern="^(gainers|losers)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the top users by portfolio gain percentage
+
+    - **limit**: Number of entries (1-100). Default: 10
+    - **order**: ``gainers`` (largest gain first) or ``losers`` (largest loss first)
+
+    Served from an incrementally maintained in-memory ranking; only users
+    who traded since the last read are reloaded from the database.
+    """
+    try:
+        entries = await leaderboard.top(db, limit, losers=order == "losers")
+        return LeaderboardResponse(order=order, total_ranked=len(leaderboard), entries=entries)
+
+    except Exception as e:
+        logger.error(f"Error fetching leaderboard: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching the leaderboard"
+        )
+
+
 @router.get("/{user_id}", response_model=PortfolioSummaryResponse, status_code=status.HTTP_200_OK)
 async def get_portfolio_summary(
     user_id: int,
@@ -33,113 +106,90 @@ async def get_portfolio_summary(
     - Gain/loss (amount and percentage)
     - Cash balance
     - Detailed holdings for each stock
+
+    Summaries are cached until the next price tick or the user's next trade.
     """
     try:
-        # Fetch user
-        user_result = await db.execute(select(User).where(User.id == user_id))
-        user = user_result.scalar_one_or_none()
+        cache_key = portfolio_cache.key(user_id)
+        cached = portfolio_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-        if not user:
+        # One statement returns the cash balance, a compact row per open
+        # position and the portfolio totals (as window aggregates), so
+        # nothing is summed in Python and no ORM entities are loaded.
+        # Money columns arrive as integer cents; each position is rounded to
+        # cents before it is summed, so the totals match the holdings.
+        invested = Wallet.total_cost
+        position_value = func.round(Wallet.quantity * Stock.current_price, 2)
+        result = await db.execute(
+            select(
+                User.balance,
+                Stock.id.label("stock_id"),
+                Stock.symbol,
+                Stock.name,
+                Stock.current_price,
+                Wallet.quantity,
+                Wallet.avg_buy_price,
+                type_coerce(invested, Cents).label("invested"),
+                type_coerce(position_value, Cents).label("current_value"),
+                type_coerce(func.coalesce(func.sum(invested).over(), 0), Cents).label("total_invested"),
+                type_coerce(func.coalesce(func.sum(position_value).over(), 0), Cents).label("total_value")
+            )
+            .select_from(User)
+            .outerjoin(Wallet, and_(Wallet.user_id == User.id, Wallet.quantity > 0))
+            .outerjoin(Stock, Wallet.stock_id == Stock.id)
+            .where(User.id == user_id)
+            .order_by(Wallet.id)
+        )
+        rows = result.all()
+
+        if not rows:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User with id {user_id} not found"
             )
 
-        # Fetch all wallet entries with stock info
-        wallet_result = await db.execute(
-            select(Wallet, Stock)
-            .join(Stock, Wallet.stock_id == Stock.id)
-            .where(Wallet.user_id == user_id, Wallet.quantity > 0)
-        )
-        wallet_stocks = wallet_result.all()
-
-        # Fetch all user transactions for calculations
-        transactions_result = await db.execute(
-            select(Transaction)
-            .where(Transaction.user_id == user_id)
-            .order_by(Transaction.timestamp.desc())
-        )
-        all_transactions = transactions_result.scalars().all()
-
-        # Calculate totals
-        total_invested = Decimal("0")
-        current_value = Decimal("0")
         holdings: List[HoldingDetail] = []
 
         # Calculate per-stock metrics
-        for wallet, stock in wallet_stocks:
-            # Get transactions for this stock
-            stock_transactions = [
-                t for t in all_transactions if t.stock_id == stock.id
-            ]
-
-            # Calculate average buy price
-            total_buy_amount = Decimal("0")
-            total_buy_quantity = Decimal("0")
-
-            for trans in stock_transactions:
-                if trans.type == TransactionType.BUY:
-                    total_buy_amount += trans.amount
-                    total_buy_quantity += trans.quantity
-
-            # Calculate invested and current value for this holding
-            if total_buy_quantity > 0:
-                average_buy_price = total_buy_amount / total_buy_quantity
-            else:
-                average_buy_price = Decimal("0")
-
-            invested_in_stock = wallet.quantity * average_buy_price
-            current_stock_value = wallet.quantity * stock.current_price
-            gain_loss = current_stock_value - invested_in_stock
-
-            if invested_in_stock > 0:
-                gain_loss_percentage = (gain_loss / invested_in_stock) * Decimal("100")
-            else:
-                gain_loss_percentage = Decimal("0")
-
-            # Add to holdings list
+        for row in rows:
+            if row.stock_id is None:
+                continue
+
+            gain_loss = row.current_value - row.invested
+
             holdings.append(HoldingDetail(
-                stock_id=stock.id,
-                stock_symbol=stock.symbol,
-                stock_name=stock.name,
-                quantity=wallet.quantity,
-                average_buy_price=average_buy_price,
-                current_price=stock.current_price,
-                invested=invested_in_stock,
-                current_value=current_stock_value,
-                gain_loss=gain_loss,
-                gain_loss_percentage=gain_loss_percentage
+                stock_id=row.stock_id,
+                stock_symbol=row.symbol,
+                stock_name=row.name,
+                quantity=row.quantity,
+                average_buy_price=row.avg_buy_price,
+                current_price=row.current_price,
+                invested=from_cents(row.invested),
+                current_value=from_cents(row.current_value),
+                gain_loss=from_cents(gain_loss),
+                gain_loss_percentage=percentage(gain_loss, row.invested)
             ))
 
-            # Add to totals
-            total_invested += invested_in_stock
-            current_value += current_stock_value
-
         # Calculate overall gain/loss
+        total_invested = rows[0].total_invested
+        current_value = rows[0].total_value
         gain_loss_amount = current_value - total_invested
 
-        if total_invested > 0:
-            gain_loss_percentage = (gain_loss_amount / total_invested) * Decimal("100")
-        else:
-            gain_loss_percentage = Decimal("0")
-
-        # Round values for clean display
-        total_invested = total_invested.quantize(Decimal('0.01'))
-        current_value = current_value.quantize(Decimal('0.01'))
-        gain_loss_amount = gain_loss_amount.quantize(Decimal('0.01'))
-        gain_loss_percentage = gain_loss_percentage.quantize(Decimal('0.01'))
-
         logger.info(f"Portfolio summary generated for user {user_id}")
 
-        return PortfolioSummaryResponse(
-            user_id=user.id,
-            total_invested=total_invested,
-            current_value=current_value,
-            gain_loss_amount=gain_loss_amount,
-            gain_loss_percentage=gain_loss_percentage,
-            cash_balance=user.balance,
+        summary = PortfolioSummaryResponse(
+            user_id=user_id,
+            total_invested=from_cents(total_invested),
+            current_value=from_cents(current_value),
+            gain_loss_amount=from_cents(gain_loss_amount),
+            gain_loss_percentage=percentage(gain_loss_amount, total_invested),
+            cash_balance=rows[0].balance,
             holdings=holdings
         )
+        portfolio_cache.put(cache_key, summary)
+        return summary
 
     except HTTPException:
         raise
@@ -149,3 +199,76 @@ async def get_portfolio_summary(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while generating portfolio summary"
         )
+
+
+@router.get("/{user_id}/history", response_model=PortfolioHistoryResponse, status_code=status.HTTP_200_OK)
+async def get_portfolio_history(
+    user_id: int,
+    time_range: str = Query("7d", alias="range", pattern="^(7d|30d)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get a user's portfolio value over time, one point per hour
+
+    - **range**: Time range (7d, 30d). Default: 7d
+
+    Rebuilt by replaying the user's transactions against the stock price
+    history; each point has the holdings value, cash balance and total.
+    """
+    try:
+        user_result = await db.execute(select(User.balance).where(User.id == user_id))
+        balance = user_result.scalar_one_or_none()
+
+        if balance is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with id {user_id} not found"
+            )
+
+        points = await portfolio_history_builder.build(db, user_id, balance, time_range)
+
+        return PortfolioHistoryResponse(user_id=user_id, range=time_range, points=points)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error building portfolio history for user {user_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while building portfolio history"
+        )
+
+
+@router.get("/{user_id}/risk", response_model=PortfolioRiskResponse, status_code=status.HTTP_200_OK)
+async def get_portfolio_risk(
+    user_id: int,
+    time_range: str = Query("30d", alias="range", pattern="^(7d|30d)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get risk metrics for a user's current holdings
+
+    - **range**: Lookback window of hourly returns (7d, 30d). Default: 30d
+
+    Per holding and for the whole portfolio: annualized volatility, beta
+    against an equal-weight index of all stocks, maximum drawdown and
+    one-hour historical value at risk at 95% confidence.
+    """
+    try:
+        user_result = await db.execute(select(User.id).where(User.id == user_id))
+        if user_result.scalar_one_or_none() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with id {user_id} not found"
+            )
+
+        return await risk_analyzer.analyze(db, user_id, time_range)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing portfolio risk for user {user_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while computing portfolio risk"
+        )
@@ -1,34 +1,71 @@
 """
 Stock routes for listing and managing stocks
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime, timedelta
+from itertools import groupby
 from typing import Optional
+import numpy as np
 
-from app.db.database import get_db
+from app.config import get_settings
+from app.db.database import get_db, AsyncSessionLocal
 from app.db.models import Stock, StockPriceHistory
 from app.schemas.stock import (
     StockListResponse,
     StockResponse,
     StockHistoryListResponse,
-    StockPriceHistoryResponse
+    StockPriceHistoryResponse,
+    StockHistorySeries,
+    StockHistoryBatchResponse,
+    StockPriceChange,
+    StockChangesResponse
 )
+from app.schemas.order import OrderBookDepthResponse, DepthLevel
+from app.services.candles import candle_rollup
+from app.services.history_cache import stock_history_cache
+from app.services.order_book import order_book
+from app.services.price_cache import price_cache
+from app.services.price_changes import price_change_log
+from app.services.price_stream import price_broadcaster
+from app.services.price_ticks import price_ticks
+from app.utils.etag import BOOT_ID, conditional_get
 from app.utils.logger import setup_logger
+from app.utils.lttb import lttb_indices
 
 router = APIRouter(prefix="/v1/stocks", tags=["stocks"])
+settings = get_settings()
 logger = setup_logger(__name__)
 
+HISTORY_RANGES = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30)
+}
 
-@router.get("", response_model=StockListResponse, status_code=status.HTTP_200_OK)
+MAX_BATCH_STOCKS = 100
+
+# Quotes and history only change when prices tick
+price_tick_etag = conditional_get("tick", lambda: price_ticks.version)
+
+
+@router.get("", response_model=StockListResponse, status_code=status.HTTP_200_OK,
+             dependencies=[Depends(price_tick_etag)])
 async def get_all_stocks(db: AsyncSession = Depends(get_db)):
     """
     Get all available stocks with current prices
 
-    Returns list of all stocks with their current prices and metadata
+    Returns list of all stocks with their current prices and metadata,
+    served from the in-memory price cache once it is warm
     """
     try:
+        if price_cache.ready:
+            return StockListResponse(stocks=price_cache.list_stocks(), last_updated=datetime.now())
+
         result = await db.execute(select(Stock))
         stocks = result.scalars().all()
 
@@ -45,7 +82,264 @@ async def get_all_stocks(db: AsyncSession = Depends(get_db)):
         )
 
 
-@router.get("/{stock_id}", response_model=StockResponse, status_code=status.HTTP_200_OK)
+@router.get("/history", response_model=StockHistoryBatchResponse, status_code=status.HTTP_200_OK,
+             dependencies=[Depends(price_tick_etag)])
+async def get_stocks_price_history(
+    ids: str = Query(..., pattern=r"^\d+(,\d+)*$"),
+    time_range: str = Query("24h", alias="range", pattern="^(1h|24h|7d|30d)$"),
+    max_points: Optional[int] = Query(None, ge=2, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the price history of several stocks in one request
+
+    - **ids**: Comma-separated stock IDs (at most 100); unknown IDs are skipped
+    - **range**: Time range for history (1h, 24h, 7d, 30d). Default: 24h
+    - **max_points**: Per-stock point budget; when set, LTTB-downsampled candle
+      closes are returned instead of raw ticks
+
+    All series are read with one query and returned as columnar arrays.
+    """
+    try:
+        stock_ids = list(dict.fromkeys(int(i) for i in ids.split(",")))
+        if len(stock_ids) > MAX_BATCH_STOCKS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MAX_BATCH_STOCKS} stocks can be requested at once"
+            )
+
+        stocks_result = await db.execute(
+            select(Stock.id, Stock.symbol, Stock.current_price).where(Stock.id.in_(stock_ids))
+        )
+        stocks = {row.id: row for row in stocks_result}
+
+        start_time = datetime.now() - HISTORY_RANGES[time_range]
+
+        if max_points is None:
+            resolution = "raw"
+            history_result = await db.execute(
+                select(StockPriceHistory.stock_id, StockPriceHistory.timestamp, StockPriceHistory.price)
+                .where(
+                    StockPriceHistory.stock_id.in_(stocks),
+                    StockPriceHistory.timestamp >= start_time
+                )
+                .order_by(StockPriceHistory.stock_id, StockPriceHistory.timestamp)
+            )
+            rows = history_result.all()
+        else:
+            resolution = candle_rollup.choose_resolution(HISTORY_RANGES[time_range], max_points)
+            rows = await candle_rollup.close_series(db, list(stocks), resolution, start_time)
+
+        # Rows arrive grouped by stock: split them in one pass
+        columns = {}
+        for stock_id, group in groupby(rows, key=lambda row: row.stock_id):
+            timestamps, prices = [], []
+            for row in group:
+                timestamps.append(row.timestamp)
+                prices.append(row.price)
+            if max_points is not None and len(prices) > max_points:
+                keep = lttb_indices(
+                    np.array([t.timestamp() for t in timestamps]),
+                    np.array(prices, dtype=float),
+                    max_points
+                )
+                timestamps = [timestamps[i] for i in keep]
+                prices = [prices[i] for i in keep]
+            columns[stock_id] = (timestamps, prices)
+
+        series = []
+        for stock_id in stock_ids:
+            if stock_id not in stocks:
+                continue
+            timestamps, prices = columns.get(stock_id, ([], []))
+            series.append(StockHistorySeries(
+                stock_id=stock_id,
+                symbol=stocks[stock_id].symbol,
+                current_price=stocks[stock_id].current_price,
+                timestamps=timestamps,
+                prices=prices
+            ))
+
+        return StockHistoryBatchResponse(range=time_range, resolution=resolution, series=series)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching batch stock history for {ids}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching stock price history"
+        )
+
+
+async def _changes_since(
+    since: int,
+    epoch: Optional[str],
+    version: int,
+    db: Optional[AsyncSession] = None
+) -> StockChangesResponse:
+    """
+    Prices changed after ``since`` up to ``version``, from the change log
+
+    Falls back to every stock's price (``reset``) when the log cannot
+    answer or ``since`` was issued under another epoch (a previous run of
+    the server, whose versions overlap this one's); only that fallback,
+    with a cold price cache, reads the database, opening a session of its
+    own when ``db`` is not given.
+    """
+    changes = price_change_log.since(since, version) if since > 0 and epoch == BOOT_ID else None
+    if changes is not None:
+        return StockChangesResponse(
+            epoch=BOOT_ID,
+            version=version,
+            changes=[
+                StockPriceChange(stock_id=stock_id, current_price=price)
+                for stock_id, price in sorted(changes.items())
+            ]
+        )
+
+    if price_cache.ready:
+        quotes = [(q.id, q.current_price) for q in price_cache.list_stocks()]
+    elif db is not None:
+        result = await db.execute(select(Stock.id, Stock.current_price).order_by(Stock.id))
+        quotes = result.all()
+    else:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Stock.id, Stock.current_price).order_by(Stock.id))
+            quotes = result.all()
+    return StockChangesResponse(
+        epoch=BOOT_ID,
+        version=version,
+        reset=True,
+        changes=[StockPriceChange(stock_id=stock_id, current_price=price) for stock_id, price in quotes]
+    )
+
+
+@router.get("/changes", response_model=StockChangesResponse, status_code=status.HTTP_200_OK,
+            dependencies=[Depends(price_tick_etag)])
+async def get_stock_price_changes(
+    since: int = Query(..., ge=0),
+    epoch: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the prices changed after a tick version
+
+    - **since**: The ``version`` of the previous response; 0 on the first poll
+    - **epoch**: The ``epoch`` of the previous response
+
+    Answered from the in-memory change log. On the first poll, or when
+    ``since`` is too old to answer or ``epoch`` is missing or not the
+    server's current one (it changes on every restart), ``reset`` is true
+    and every stock's price is returned instead.
+    """
+    try:
+        return await _changes_since(since, epoch, price_ticks.version, db)
+
+    except Exception as e:
+        logger.error(f"Error fetching stock price changes since {since}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching stock price changes"
+        )
+
+
+@router.get("/next-tick", response_model=StockChangesResponse, status_code=status.HTTP_200_OK)
+async def wait_for_next_tick(
+    after: int = Query(..., ge=0),
+    epoch: Optional[str] = Query(None),
+    timeout: float = Query(30, gt=0, le=60)
+):
+    """
+    Long-poll for the next price tick
+
+    - **after**: The ``version`` the client already has
+    - **epoch**: The ``epoch`` that version came with
+    - **timeout**: Seconds to wait (at most 60). Default: 30
+
+    Parks without a database session until a tick moves the version past
+    ``after``, then returns the prices changed since ``after`` (with
+    ``reset`` semantics as in ``/changes``). A nonzero ``after`` from
+    another epoch is answered with a reset at once. On timeout the response
+    keeps ``version == after`` and has no changes; poll again with the same
+    values.
+    """
+    try:
+        if after > 0 and epoch != BOOT_ID:
+            return await _changes_since(after, epoch, price_ticks.version)
+
+        version = await price_ticks.wait(after, timeout)
+        if version == after:
+            return StockChangesResponse(epoch=BOOT_ID, version=version, changes=[])
+        return await _changes_since(after, epoch, version)
+
+    except Exception as e:
+        logger.error(f"Error waiting for the price tick after {after}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while waiting for the next price tick"
+        )
+
+
+async def _sse_ticks():
+    """Yield each published tick as an SSE frame, with keepalive comments in between"""
+    queue = price_broadcaster.subscribe()
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=settings.PRICE_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                return
+            yield message.sse
+    finally:
+        price_broadcaster.unsubscribe(queue)
+
+
+@router.get("/stream", status_code=status.HTTP_200_OK)
+async def stream_stock_prices():
+    """
+    Live stock prices as Server-Sent Events
+
+    Sends one ``tick`` event per price update, holding only the prices that
+    changed. Fetch ``/v1/stocks`` once for the starting quotes. Clients that
+    fall too far behind are disconnected and should reconnect.
+    """
+    return StreamingResponse(
+        _sse_ticks(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/stream/ws")
+async def stream_stock_prices_ws(websocket: WebSocket):
+    """
+    Live stock prices over a WebSocket
+
+    Sends the same JSON tick messages as ``/stream``; a client that falls
+    too far behind is closed with code 1013 (try again later).
+    """
+    await websocket.accept()
+    queue = price_broadcaster.subscribe()
+    try:
+        while True:
+            message = await queue.get()
+            if message is None:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(message.text)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        price_broadcaster.unsubscribe(queue)
+
+
+@router.get("/{stock_id}", response_model=StockResponse, status_code=status.HTTP_200_OK,
+             dependencies=[Depends(price_tick_etag)])
 async def get_stock_by_id(
     stock_id: int,
     db: AsyncSession = Depends(get_db)
@@ -56,6 +350,10 @@ async def get_stock_by_id(
     Returns stock details including current price
     """
     try:
+        cached = price_cache.get_stock(stock_id)
+        if cached is not None:
+            return cached
+
         result = await db.execute(select(Stock).where(Stock.id == stock_id))
         stock = result.scalar_one_or_none()
 
@@ -77,10 +375,12 @@ async def get_stock_by_id(
         )
 
 
-@router.get("/{stock_id}/history", response_model=StockHistoryListResponse, status_code=status.HTTP_200_OK)
+@router.get("/{stock_id}/history", response_model=StockHistoryListResponse, status_code=status.HTTP_200_OK,
+             dependencies=[Depends(price_tick_etag)])
 async def get_stock_price_history(
     stock_id: int,
     time_range: Optional[str] = Query("24h", regex="^(1h|24h|7d|30d)$"),
+    max_points: Optional[int] = Query(None, ge=2, le=5000),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -88,8 +388,25 @@ async def get_stock_price_history(
 
     - **stock_id**: ID of the stock
     - **time_range**: Time range for history (1h, 24h, 7d, 30d). Default: 24h
+    - **max_points**: Point budget; when set, at most this many OHLC candles
+      (5m, 1h or 1d, LTTB-downsampled) are returned instead of raw ticks
+
+    Raw history within the in-memory ring buffer is served without queries.
     """
     try:
+        start_time = datetime.now() - HISTORY_RANGES[time_range]
+
+        if max_points is not None:
+            cache_key = stock_history_cache.key(stock_id, time_range, max_points)
+            cached = stock_history_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        else:
+            quote = price_cache.get_stock(stock_id)
+            recent = price_cache.get_history(stock_id, start_time) if quote is not None else None
+            if recent is not None:
+                return StockHistoryListResponse(stock_id=stock_id, symbol=quote.symbol, history=recent)
+
         # Fetch stock
         stock_result = await db.execute(select(Stock).where(Stock.id == stock_id))
         stock = stock_result.scalar_one_or_none()
@@ -100,15 +417,29 @@ async def get_stock_price_history(
                 detail=f"Stock with id {stock_id} not found"
             )
 
-        # Calculate time range
-        time_delta_map = {
-            "1h": timedelta(hours=1),
-            "24h": timedelta(hours=24),
-            "7d": timedelta(days=7),
-            "30d": timedelta(days=30)
-        }
-
-        start_time = datetime.now() - time_delta_map[time_range]
+        if max_points is not None:
+            resolution = candle_rollup.choose_resolution(HISTORY_RANGES[time_range], max_points)
+            candles = await candle_rollup.fetch(db, stock_id, resolution, start_time)
+            candles = candle_rollup.downsample(candles, max_points)
+            history = StockHistoryListResponse(
+                stock_id=stock.id,
+                symbol=stock.symbol,
+                resolution=resolution,
+                history=[
+                    StockPriceHistoryResponse(
+                        id=c.id,
+                        stock_id=c.stock_id,
+                        price=c.close,
+                        timestamp=c.bucket_start,
+                        open=c.open,
+                        high=c.high,
+                        low=c.low
+                    )
+                    for c in candles
+                ]
+            )
+            stock_history_cache.put(cache_key, history)
+            return history
 
         # Fetch price history
         history_result = await db.execute(
@@ -135,3 +466,25 @@ async def get_stock_price_history(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while fetching stock price history"
         )
+
+
+@router.get("/{stock_id}/depth", response_model=OrderBookDepthResponse, status_code=status.HTTP_200_OK)
+async def get_stock_order_book_depth(
+    stock_id: int,
+    levels: int = Query(10, ge=1, le=100)
+):
+    """
+    Get aggregated limit order book depth for a stock
+
+    Served from the in-memory order book without touching the database.
+
+    - **stock_id**: ID of the stock
+    - **levels**: Number of price levels per side (1-100). Default: 10
+    """
+    bids, asks = order_book.depth(stock_id, levels)
+
+    return OrderBookDepthResponse(
+        stock_id=stock_id,
+        bids=[DepthLevel(**level) for level in bids],
+        asks=[DepthLevel(**level) for level in asks]
+    )
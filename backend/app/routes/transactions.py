@@ -1,27 +1,87 @@
 """
 Transaction routes for stock trading operations
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import binascii
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from decimal import Decimal
+from sqlalchemy import select, tuple_, literal, case, func, type_coerce, String
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Optional
 
-from app.db.database import get_db
-from app.db.models import User, Stock, Transaction, Wallet, TransactionType
+from app.db.database import get_db, AsyncSessionLocal
+from app.db.models import User, Transaction, TransactionType
 from app.schemas.transaction import (
     BuyTransactionRequest,
     SellTransactionRequest,
-    TransactionResponse
+    TransactionResponse,
+    BatchModeEnum,
+    BatchTransactionRequest,
+    BatchTransactionResponse,
+    CountModeEnum,
+    TransactionDetail,
+    TransactionHistoryResponse,
+    TransactionTypeEnum
 )
+from app.services.idempotency import idempotency_store, request_fingerprint
+from app.services.trade_executor import trade_executor
+from app.services.trade_journal import trade_journal
+from app.services.trade_locks import trade_locks
+from app.services.trade_versions import user_trade_versions
+from app.services.transaction_counts import transaction_counter
 from app.utils.logger import setup_logger
 
 router = APIRouter(prefix="/v1/transactions", tags=["transactions"])
 logger = setup_logger(__name__)
 
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ["id", "user_id", "stock_id", "type", "amount", "quantity", "price_per_unit", "timestamp"]
+
+
+async def _run_trade(db: AsyncSession, scope: str, request, idempotency_key: Optional[str], execute):
+    """
+    Run a single-user trade under the user's trade lock, honouring Idempotency-Key
+
+    In journal mode the journal writer commits and takes the trade locks
+    itself, so the request neither locks nor has anything to commit.
+    """
+    journaled = trade_journal.is_running
+    lock = nullcontext() if journaled else trade_locks.hold(db, request.user_id)
+    executed = False
+
+    async def operation():
+        nonlocal executed
+        executed = True
+        return await execute()
+
+    async with lock:
+        if idempotency_key:
+            response = await idempotency_store.execute(
+                db,
+                f"{scope}:{request.user_id}:{idempotency_key}",
+                request_fingerprint(request),
+                operation
+            )
+        else:
+            response = await operation()
+            if not journaled:
+                await db.commit()
+
+    # A replayed response changed nothing, so the user's caches stay valid
+    if executed:
+        user_trade_versions.bump(request.user_id)
+    return response
+
 
 @router.post("/buy", response_model=TransactionResponse, status_code=status.HTTP_200_OK)
 async def buy_stock(
     request: BuyTransactionRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -32,90 +92,26 @@ async def buy_stock(
     - Creates transaction record
     - Updates wallet
     - Deducts balance
-    """
-    try:
-        # Fetch user
-        user_result = await db.execute(select(User).where(User.id == request.user_id))
-        user = user_result.scalar_one_or_none()
-
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {request.user_id} not found"
-            )
-
-        # Fetch stock
-        stock_result = await db.execute(select(Stock).where(Stock.id == request.stock_id))
-        stock = stock_result.scalar_one_or_none()
 
-        if not stock:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Stock with id {request.stock_id} not found"
-            )
+    The balance check and debit run as one conditional UPDATE, so
+    concurrent trades cannot overdraw or lose updates.
 
-        # Validate sufficient balance
-        if user.balance < request.amount:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient balance. Available: ${user.balance}, Required: ${request.amount}"
-            )
-
-        # Calculate quantity
-        quantity = request.amount / stock.current_price
-        quantity = Decimal(str(quantity)).quantize(Decimal('0.000001'))
-
-        # Create transaction
-        transaction = Transaction(
-            user_id=user.id,
-            stock_id=stock.id,
-            type=TransactionType.BUY,
-            amount=request.amount,
-            quantity=quantity,
-            price_per_unit=stock.current_price
-        )
-        db.add(transaction)
-
-        # Update or create wallet entry
-        wallet_result = await db.execute(
-            select(Wallet).where(
-                Wallet.user_id == user.id,
-                Wallet.stock_id == stock.id
-            )
-        )
-        wallet = wallet_result.scalar_one_or_none()
-
-        if wallet:
-            wallet.quantity += quantity
-        else:
-            wallet = Wallet(
-                user_id=user.id,
-                stock_id=stock.id,
-                quantity=quantity
-            )
-            db.add(wallet)
-
-        # Update user balance
-        user.balance -= request.amount
-
-        # Commit transaction
-        await db.commit()
-        await db.refresh(transaction)
-
-        logger.info(
-            f"User {user.id} bought {quantity} shares of {stock.symbol} "
-            f"for ${request.amount}"
+    Retries carrying the same **Idempotency-Key** header return the
+    original response without trading again. With TRADE_JOURNAL_ENABLED
+    the trade is group-committed with other concurrent trades.
+    """
+    async def execute():
+        if trade_journal.is_running:
+            return await trade_journal.buy(request.user_id, request.stock_id, request.amount)
+        return await trade_executor.buy(
+            db, request.user_id, request.stock_id, request.amount
         )
 
-        return TransactionResponse(
-            transaction_id=transaction.id,
-            status="success",
-            message=f"Successfully bought {quantity} shares of {stock.symbol}",
-            quantity=quantity,
-            new_balance=user.balance
-        )
+    try:
+        return await _run_trade(db, "buy", request, idempotency_key, execute)
 
     except HTTPException:
+        await db.rollback()
         raise
     except Exception as e:
         await db.rollback()
@@ -129,6 +125,7 @@ async def buy_stock(
 @router.post("/sell", response_model=TransactionResponse, status_code=status.HTTP_200_OK)
 async def sell_stock(
     request: SellTransactionRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -139,94 +136,298 @@ async def sell_stock(
     - Creates transaction record
     - Updates wallet
     - Credits balance
+
+    The quantity check and decrement run as one conditional UPDATE, so
+    concurrent sells cannot oversell the wallet.
+
+    Retries carrying the same **Idempotency-Key** header return the
+    original response without trading again. With TRADE_JOURNAL_ENABLED
+    the trade is group-committed with other concurrent trades.
     """
+    async def execute():
+        if trade_journal.is_running:
+            return await trade_journal.sell(request.user_id, request.stock_id, request.quantity)
+        return await trade_executor.sell(
+            db, request.user_id, request.stock_id, request.quantity
+        )
+
     try:
-        # Fetch user
-        user_result = await db.execute(select(User).where(User.id == request.user_id))
-        user = user_result.scalar_one_or_none()
-
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {request.user_id} not found"
-            )
+        return await _run_trade(db, "sell", request, idempotency_key, execute)
 
-        # Fetch stock
-        stock_result = await db.execute(select(Stock).where(Stock.id == request.stock_id))
-        stock = stock_result.scalar_one_or_none()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error processing sell transaction: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while processing the transaction"
+        )
 
-        if not stock:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Stock with id {request.stock_id} not found"
-            )
 
-        # Fetch wallet entry
-        wallet_result = await db.execute(
-            select(Wallet).where(
-                Wallet.user_id == user.id,
-                Wallet.stock_id == stock.id
-            )
+@router.post("/batch", response_model=BatchTransactionResponse, status_code=status.HTTP_200_OK)
+async def batch_transactions(
+    request: BatchTransactionRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Execute many buy/sell legs in a single database transaction
+
+    - Legs may span many users and stocks and run in request order
+    - **atomic** mode: any failing leg rolls back the whole batch
+    - **best_effort** mode: failing legs are skipped, the rest commit
+    - Returns a result per leg
+    """
+    atomic = request.mode == BatchModeEnum.ATOMIC
+    try:
+        async with trade_locks.hold(db, *(leg.user_id for leg in request.legs)):
+            results = await trade_executor.execute_batch(db, request.legs, atomic=atomic)
+            await db.commit()
+
+        user_trade_versions.bump(*(
+            leg.user_id for leg, result in zip(request.legs, results)
+            if result.status == "success"
+        ))
+
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error processing batch transaction: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while processing the batch"
         )
-        wallet = wallet_result.scalar_one_or_none()
-
-        # Validate sufficient stock quantity
-        if not wallet or wallet.quantity < request.quantity:
-            available = wallet.quantity if wallet else Decimal("0")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock quantity. Available: {available}, Required: {request.quantity}"
-            )
 
-        # Calculate proceeds
-        proceeds = request.quantity * stock.current_price
-        proceeds = Decimal(str(proceeds)).quantize(Decimal('0.01'))
-
-        # Create transaction
-        transaction = Transaction(
-            user_id=user.id,
-            stock_id=stock.id,
-            type=TransactionType.SELL,
-            amount=proceeds,
-            quantity=request.quantity,
-            price_per_unit=stock.current_price
+    succeeded = sum(1 for r in results if r.status == "success")
+    failed = sum(1 for r in results if r.status == "failed")
+    if failed == 0:
+        batch_status = "success"
+    elif succeeded == 0:
+        batch_status = "failed"
+    else:
+        batch_status = "partial"
+
+    return BatchTransactionResponse(
+        status=batch_status,
+        mode=request.mode,
+        succeeded=succeeded,
+        failed=failed,
+        results=results
+    )
+
+
+def _encode_cursor(timestamp: datetime, transaction_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, transaction_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(transaction_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
-        db.add(transaction)
 
-        # Update wallet
-        wallet.quantity -= request.quantity
 
-        # If quantity becomes 0, optionally delete wallet entry
-        if wallet.quantity == 0:
-            await db.delete(wallet)
+def _is_sqlite(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
 
-        # Update user balance
-        user.balance += proceeds
 
-        # Commit transaction
-        await db.commit()
-        await db.refresh(transaction)
+def _timestamp_key(db: AsyncSession):
+    """
+    ``Transaction.timestamp`` as keyset pagination orders and compares it
 
-        logger.info(
-            f"User {user.id} sold {request.quantity} shares of {stock.symbol} "
-            f"for ${proceeds}"
+    SQLite stores DATETIME as text: rows defaulted by CURRENT_TIMESTAMP
+    carry no fractional seconds while rows written by SQLAlchemy carry six
+    digits, so both are padded to the latter before comparing.
+    """
+    if not _is_sqlite(db):
+        return Transaction.timestamp
+    text = type_coerce(Transaction.timestamp, String)
+    return case((func.length(text) == 19, text + ".000000"), else_=text)
+
+
+def _cursor_timestamp(db: AsyncSession, timestamp: datetime):
+    """The cursor's timestamp in the form ``_timestamp_key`` compares against"""
+    if _is_sqlite(db):
+        return literal(timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"), String)
+    return timestamp
+
+
+def _history_query(
+    user_id: int,
+    stock_id: Optional[int],
+    transaction_type: Optional[TransactionTypeEnum],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+):
+    query = select(Transaction).where(Transaction.user_id == user_id)
+    if stock_id is not None:
+        query = query.where(Transaction.stock_id == stock_id)
+    if transaction_type is not None:
+        query = query.where(Transaction.type == TransactionType(transaction_type.value))
+    if start_date is not None:
+        query = query.where(Transaction.timestamp >= start_date)
+    if end_date is not None:
+        query = query.where(Transaction.timestamp < end_date)
+    return query
+
+
+@router.get("/{user_id}", response_model=TransactionHistoryResponse, status_code=status.HTTP_200_OK)
+async def get_transaction_history(
+    user_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    stock_id: Optional[int] = Query(None, gt=0),
+    transaction_type: Optional[TransactionTypeEnum] = Query(None, alias="type"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    count: CountModeEnum = Query(CountModeEnum.CACHED, description="How total_count is computed"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get a user's transaction history, newest first
+
+    Pages with a keyset cursor on (timestamp, id) backed by the
+    ``(user_id, timestamp, id)`` index, so deep pages cost the same as the first.
+
+    - **cursor**: Opaque cursor returned as ``next_cursor``
+    - **limit**: Page size (1-500). Default: 50
+    - **stock_id** / **type** / **start_date** / **end_date**: Optional filters
+    - **count**: ``cached`` (default, exact until the user trades again),
+      ``estimate`` (planner estimate on PostgreSQL) or ``exact``
+    """
+    try:
+        query = _history_query(user_id, stock_id, transaction_type, start_date, end_date)
+
+        page_query = query
+        timestamp_key = _timestamp_key(db)
+        if cursor:
+            cursor_timestamp, cursor_id = _decode_cursor(cursor)
+            page_query = page_query.where(
+                tuple_(timestamp_key, Transaction.id)
+                < tuple_(_cursor_timestamp(db, cursor_timestamp), cursor_id)
+            )
+
+        result = await db.execute(
+            page_query
+            .order_by(timestamp_key.desc(), Transaction.id.desc())
+            .limit(limit + 1)
         )
+        rows = result.scalars().all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+
+        filters = (stock_id, transaction_type, start_date, end_date)
+        total_count = await transaction_counter.count(db, user_id, filters, query, count.value)
 
-        return TransactionResponse(
-            transaction_id=transaction.id,
-            status="success",
-            message=f"Successfully sold {request.quantity} shares of {stock.symbol}",
-            quantity=request.quantity,
-            new_balance=user.balance,
-            proceeds=proceeds
+        return TransactionHistoryResponse(
+            transactions=[TransactionDetail.model_validate(t) for t in rows],
+            total_count=total_count,
+            next_cursor=next_cursor,
+            has_more=has_more
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        await db.rollback()
-        logger.error(f"Error processing sell transaction: {str(e)}")
+        logger.error(f"Error fetching transaction history for user {user_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while processing the transaction"
+            detail="An error occurred while fetching transaction history"
+        )
+
+
+def _export_row(transaction: Transaction) -> list:
+    return [
+        transaction.id,
+        transaction.user_id,
+        transaction.stock_id,
+        transaction.type.value,
+        str(transaction.amount),
+        str(transaction.quantity),
+        str(transaction.price_per_unit),
+        transaction.timestamp.isoformat() if transaction.timestamp else None,
+    ]
+
+
+async def _stream_export(query, export_format: str):
+    """
+    Yield the export in chunks of EXPORT_BATCH_SIZE rows
+
+    Runs in its own session because the request's session is closed
+    before a streaming response body is sent. Rows are read through a
+    server-side cursor, so memory stays flat regardless of history length.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(EXPORT_COLUMNS)
+
+    async with AsyncSessionLocal() as session:
+        rows = await session.stream_scalars(
+            query
+            .order_by(Transaction.timestamp.asc(), Transaction.id.asc())
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
         )
+        async for partition in rows.partitions():
+            for transaction in partition:
+                row = _export_row(transaction)
+                if export_format == "csv":
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            session.expunge_all()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/{user_id}/export", status_code=status.HTTP_200_OK)
+async def export_transactions(
+    user_id: int,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    stock_id: Optional[int] = Query(None, gt=0),
+    transaction_type: Optional[TransactionTypeEnum] = Query(None, alias="type"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream a user's full transaction history, oldest first
+
+    - **format**: ``csv`` (default) or ``ndjson``
+    - **stock_id** / **type** / **start_date** / **end_date**: Optional filters
+
+    Rows are streamed from a server-side cursor and never held in memory
+    all at once.
+    """
+    user_result = await db.execute(select(User.id).where(User.id == user_id))
+    if user_result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    query = _history_query(user_id, stock_id, transaction_type, start_date, end_date)
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+
+    logger.info(f"Streaming {export_format} transaction export for user {user_id}")
+
+    return StreamingResponse(
+        _stream_export(query, export_format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="transactions_{user_id}.{export_format}"'
+        }
+    )
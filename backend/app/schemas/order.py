@@ -0,0 +1,77 @@
+"""
+Pydantic schemas for limit orders and order book depth
+"""
+
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Optional
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+
+from app.schemas.transaction import TransactionTypeEnum
+
+
+class OrderStatusEnum(str, Enum):
+    """Limit order status enum for validation"""
+
+    OPEN = "OPEN"
+    FILLED = "FILLED"
+    CANCELLED = "CANCELLED"
+    REJECTED = "REJECTED"
+
+
+class LimitOrderCreate(BaseModel):
+    """Schema for placing a limit order"""
+
+    user_id: int = Field(..., gt=0)
+    stock_id: int = Field(..., gt=0)
+    side: TransactionTypeEnum
+    limit_price: Decimal = Field(..., gt=0, decimal_places=2)
+    amount: Optional[Decimal] = Field(
+        None, gt=0, decimal_places=2, description="Cash to spend (BUY orders)"
+    )
+    quantity: Optional[Decimal] = Field(
+        None, gt=0, decimal_places=6, description="Quantity to sell (SELL orders)"
+    )
+
+    @model_validator(mode="after")
+    def validate_order(self):
+        if self.side == TransactionTypeEnum.BUY and self.amount is None:
+            raise ValueError("BUY orders require an amount")
+        if self.side == TransactionTypeEnum.SELL and self.quantity is None:
+            raise ValueError("SELL orders require a quantity")
+        return self
+
+
+class LimitOrderResponse(BaseModel):
+    """Schema for limit order response"""
+
+    id: int
+    user_id: int
+    stock_id: int
+    side: TransactionTypeEnum
+    limit_price: Decimal
+    amount: Optional[Decimal] = None
+    quantity: Optional[Decimal] = None
+    status: OrderStatusEnum
+    transaction_id: Optional[int] = None
+    created_at: datetime
+    filled_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class DepthLevel(BaseModel):
+    """Schema for one aggregated price level of the order book"""
+
+    price: Decimal
+    quantity: Decimal
+    orders: int
+
+
+class OrderBookDepthResponse(BaseModel):
+    """Schema for order book depth"""
+
+    stock_id: int
+    bids: list[DepthLevel]
+    asks: list[DepthLevel]
@@ -1,8 +1,9 @@
 """
 Pydantic schemas for portfolio operations
 """
-from pydantic import BaseModel, ConfigDict
-from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+from datetime import datetime
 from decimal import Decimal
 
 
@@ -46,3 +47,82 @@ class WalletResponse(BaseModel):
     current_price: Decimal
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class PortfolioBatchRequest(BaseModel):
+    """Schema for a bulk portfolio valuation request"""
+    user_ids: Optional[List[int]] = Field(
+        None,
+        max_length=100000,
+        description="Users to value; omit to value every user"
+    )
+
+
+class PortfolioValuation(BaseModel):
+    """Schema for one user's line in a bulk portfolio valuation"""
+    user_id: int
+    cash_balance: Decimal
+    total_invested: Decimal
+    current_value: Decimal
+    gain_loss_amount: Decimal
+    gain_loss_percentage: Decimal
+    holdings_count: int
+
+
+class PortfolioHistoryPoint(BaseModel):
+    """Schema for one point of a portfolio value time series"""
+    timestamp: datetime
+    holdings_value: Decimal
+    cash_balance: Decimal
+    total_value: Decimal
+
+
+class PortfolioHistoryResponse(BaseModel):
+    """Schema for a portfolio value time series"""
+    user_id: int
+    range: str
+    points: List[PortfolioHistoryPoint]
+
+
+class LeaderboardEntry(BaseModel):
+    """Schema for one ranked user on the leaderboard"""
+    rank: int
+    user_id: int
+    username: str
+    current_value: Decimal
+    total_invested: Decimal
+    gain_loss_amount: Decimal
+    gain_loss_percentage: Decimal
+
+
+class LeaderboardResponse(BaseModel):
+    """Schema for the gain/loss leaderboard"""
+    order: str
+    total_ranked: int
+    entries: List[LeaderboardEntry]
+
+
+class HoldingRisk(BaseModel):
+    """Schema for the risk metrics of one holding"""
+    stock_id: int
+    stock_symbol: str
+    weight: float
+    volatility: float
+    beta: float
+    max_drawdown: float
+    value_at_risk: float
+
+
+class PortfolioRiskResponse(BaseModel):
+    """Schema for portfolio risk metrics"""
+    user_id: int
+    range: str
+    confidence: float
+    observations: int
+    portfolio_value: Decimal
+    volatility: float
+    beta: float
+    max_drawdown: float
+    value_at_risk: float
+    value_at_risk_amount: Decimal
+    holdings: List[HoldingRisk]
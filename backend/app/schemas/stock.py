@@ -40,11 +40,14 @@ class StockListResponse(BaseModel):
 
 
 class StockPriceHistoryResponse(BaseModel):
-    """Schema for stock price history"""
+    """Schema for stock price history (price is the candle close when rolled up)"""
     id: int
     stock_id: int
     price: Decimal
     timestamp: datetime
+    open: Optional[Decimal] = None
+    high: Optional[Decimal] = None
+    low: Optional[Decimal] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -53,4 +56,35 @@ class StockHistoryListResponse(BaseModel):
     """Schema for stock price history list"""
     stock_id: int
     symbol: str
+    resolution: str = "raw"
     history: list[StockPriceHistoryResponse]
+
+
+class StockHistorySeries(BaseModel):
+    """Columnar price series of one stock (timestamps[i] pairs with prices[i])"""
+    stock_id: int
+    symbol: str
+    current_price: Decimal
+    timestamps: list[datetime]
+    prices: list[Decimal]
+
+
+class StockHistoryBatchResponse(BaseModel):
+    """Schema for the price series of several stocks"""
+    range: str
+    resolution: str
+    series: list[StockHistorySeries]
+
+
+class StockPriceChange(BaseModel):
+    """New price of one stock"""
+    stock_id: int
+    current_price: Decimal
+
+
+class StockChangesResponse(BaseModel):
+    """Schema for prices changed since a tick version"""
+    epoch: str  # Server process the version belongs to; echo it back with the version
+    version: int
+    reset: bool = False
+    changes: list[StockPriceChange]
@@ -1,7 +1,7 @@
 """
 Pydantic schemas for transaction operations
 """
-from pydantic import BaseModel, Field, ConfigDict, field_validator
+from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator
 from typing import Optional
 from datetime import datetime
 from decimal import Decimal
@@ -68,7 +68,67 @@ class TransactionDetail(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CountModeEnum(str, Enum):
+    """How total_count is computed for transaction history"""
+    EXACT = "exact"
+    CACHED = "cached"
+    ESTIMATE = "estimate"
+
+
 class TransactionHistoryResponse(BaseModel):
     """Schema for transaction history"""
     transactions: list[TransactionDetail]
     total_count: int
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
+class BatchModeEnum(str, Enum):
+    """Failure handling mode for batch transactions"""
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+
+
+class BatchTransactionLeg(BaseModel):
+    """Schema for a single buy or sell leg of a batch request"""
+    type: TransactionTypeEnum
+    user_id: int = Field(..., gt=0)
+    stock_id: int = Field(..., gt=0)
+    amount: Optional[Decimal] = Field(None, gt=0, decimal_places=2, description="Cash to spend (BUY legs)")
+    quantity: Optional[Decimal] = Field(None, gt=0, decimal_places=6, description="Quantity to sell (SELL legs)")
+
+    @model_validator(mode='after')
+    def validate_leg(self):
+        if self.type == TransactionTypeEnum.BUY and self.amount is None:
+            raise ValueError('BUY legs require an amount')
+        if self.type == TransactionTypeEnum.SELL and self.quantity is None:
+            raise ValueError('SELL legs require a quantity')
+        return self
+
+
+class BatchTransactionRequest(BaseModel):
+    """Schema for batch transaction request"""
+    legs: list[BatchTransactionLeg] = Field(..., min_length=1, max_length=1000)
+    mode: BatchModeEnum = BatchModeEnum.ATOMIC
+
+
+class BatchLegResult(BaseModel):
+    """Schema for the outcome of a single batch leg"""
+    index: int
+    status: str  # "success", "failed" or "rolled_back"
+    stock_symbol: Optional[str] = None
+    transaction_id: Optional[int] = None
+    quantity: Optional[Decimal] = None
+    new_balance: Optional[Decimal] = None
+    proceeds: Optional[Decimal] = None
+    error: Optional[str] = None
+    error_code: Optional[int] = None  # HTTP status the leg would fail with on its own
+
+
+class BatchTransactionResponse(BaseModel):
+    """Schema for batch transaction response"""
+    status: str  # "success", "partial" or "failed"
+    mode: BatchModeEnum
+    succeeded: int
+    failed: int
+    results: list[BatchLegResult]
@@ -0,0 +1,198 @@
+"""
+Price Candle Service
+Maintains 5m / 1h / 1d OHLC rollups of stock prices and serves them to history queries
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional
+import numpy as np
+from sqlalchemy import select, delete, insert, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import dialect_insert
+from app.db.models import PriceCandle, StockPriceHistory
+from app.utils.logger import setup_logger
+from app.utils.lttb import lttb_indices
+
+logger = setup_logger(__name__)
+
+# Finest first
+RESOLUTIONS = {
+    "5m": timedelta(minutes=5),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Start of the ``resolution`` bucket containing ``timestamp``"""
+    if resolution == "1d":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "1h":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(
+        minute=timestamp.minute - timestamp.minute % 5, second=0, microsecond=0
+    )
+
+
+class CandleRollup:
+    """
+    Incrementally maintained OHLC candles
+
+    The price updater calls ``record`` with every tick inside its own
+    transaction: one executemany upsert per tick extends the current 5m,
+    1h and 1d candle of every stock (high/low widened, close replaced).
+    History reads pick the coarsest resolution that still has at least the
+    caller's point budget of buckets, so query time depends on the range,
+    not on how much raw history has accumulated.
+    """
+
+    async def record(self, db: AsyncSession, ticks: Iterable[tuple[int, Decimal, datetime]]):
+        """
+        Fold price ticks into their candles (not committed here)
+
+        Args:
+            db: Session the ticks are written in
+            ticks: ``(stock_id, price, timestamp)`` per tick
+        """
+        rows = [
+            {
+                "stock_id": stock_id,
+                "resolution": resolution,
+                "bucket_start": bucket_start(timestamp, resolution),
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+            }
+            for stock_id, price, timestamp in ticks
+            for resolution in RESOLUTIONS
+        ]
+        if not rows:
+            return
+
+        table = PriceCandle.__table__
+        upsert = dialect_insert(db)(table)
+        await db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[table.c.stock_id, table.c.resolution, table.c.bucket_start],
+                set_={
+                    "high": case(
+                        (upsert.excluded.high > table.c.high, upsert.excluded.high),
+                        else_=table.c.high,
+                    ),
+                    "low": case(
+                        (upsert.excluded.low < table.c.low, upsert.excluded.low), else_=table.c.low
+                    ),
+                    "close": upsert.excluded.close,
+                },
+            ),
+            rows,
+        )
+
+    async def backfill(self, db: AsyncSession, batch_size: int = 5000) -> int:
+        """
+        Rebuild every candle from the raw price history (not committed here)
+
+        Returns:
+            Number of candles written
+        """
+        await db.execute(delete(PriceCandle))
+
+        candles: dict[tuple[int, str, datetime], list[Decimal]] = {}
+        history = await db.stream(
+            select(StockPriceHistory.stock_id, StockPriceHistory.price, StockPriceHistory.timestamp)
+            .order_by(StockPriceHistory.stock_id, StockPriceHistory.timestamp, StockPriceHistory.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for stock_id, price, timestamp in history:
+            for resolution in RESOLUTIONS:
+                key = (stock_id, resolution, bucket_start(timestamp, resolution))
+                candle = candles.get(key)
+                if candle is None:
+                    candles[key] = [price, price, price, price]
+                else:
+                    candle[1] = max(candle[1], price)
+                    candle[2] = min(candle[2], price)
+                    candle[3] = price
+
+        rows = [
+            {
+                "stock_id": stock_id,
+                "resolution": resolution,
+                "bucket_start": start,
+                "open": o,
+                "high": h,
+                "low": low,
+                "close": c,
+            }
+            for (stock_id, resolution, start), (o, h, low, c) in candles.items()
+        ]
+        for offset in range(0, len(rows), batch_size):
+            await db.execute(insert(PriceCandle.__table__), rows[offset : offset + batch_size])
+
+        logger.info(f"Backfilled {len(rows)} price candles")
+        return len(rows)
+
+    @staticmethod
+    def choose_resolution(span: timedelta, max_points: int) -> str:
+        """
+        Coarsest resolution with at least ``max_points`` buckets in ``span``
+        (else the finest), leaving enough detail to downsample from
+        """
+        for resolution, width in reversed(RESOLUTIONS.items()):
+            if span / width >= max_points:
+                return resolution
+        return next(iter(RESOLUTIONS))
+
+    async def fetch(
+        self,
+        db: AsyncSession,
+        stock_id: int,
+        resolution: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+    ) -> list[PriceCandle]:
+        """Candles of one stock whose buckets overlap ``[start, end]``, oldest first"""
+        query = select(PriceCandle).where(
+            PriceCandle.stock_id == stock_id,
+            PriceCandle.resolution == resolution,
+            PriceCandle.bucket_start >= bucket_start(start, resolution),
+        )
+        if end is not None:
+            query = query.where(PriceCandle.bucket_start <= end)
+        result = await db.execute(query.order_by(PriceCandle.bucket_start.asc()))
+        return list(result.scalars().all())
+
+    async def close_series(
+        self, db: AsyncSession, stock_ids: list[int], resolution: str, start: datetime
+    ):
+        """``(stock_id, timestamp, price)`` close rows of several stocks, ordered by stock then time"""
+        result = await db.execute(
+            select(
+                PriceCandle.stock_id,
+                PriceCandle.bucket_start.label("timestamp"),
+                PriceCandle.close.label("price"),
+            )
+            .where(
+                PriceCandle.stock_id.in_(stock_ids),
+                PriceCandle.resolution == resolution,
+                PriceCandle.bucket_start >= bucket_start(start, resolution),
+            )
+            .order_by(PriceCandle.stock_id, PriceCandle.bucket_start)
+        )
+        return result.all()
+
+    @staticmethod
+    def downsample(candles: list[PriceCandle], max_points: int) -> list[PriceCandle]:
+        """Keep at most ``max_points`` candles, chosen by LTTB on the close price"""
+        if len(candles) <= max_points:
+            return candles
+        x = np.array([c.bucket_start.timestamp() for c in candles])
+        y = np.array([float(c.close) for c in candles])
+        return [candles[i] for i in lttb_indices(x, y, max_points)]
+
+
+# Singleton instance
+candle_rollup = CandleRollup()
@@ -0,0 +1,38 @@
+"""
+Stock History Cache Service
+LRU cache of downsampled stock price histories keyed by price tick version
+"""
+
+from app.config import get_settings
+from app.schemas.stock import StockHistoryListResponse
+from app.services.price_ticks import price_ticks
+from app.services.versioned_cache import VersionedLRUCache
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+HistoryKey = tuple[int, str, int, int]
+
+
+class StockHistoryCache(VersionedLRUCache[StockHistoryListResponse]):
+    """
+    Bounded LRU cache of chart-sized price histories
+
+    Entries are keyed by ``(stock_id, time_range, max_points,
+    price_tick_version)``. Candles only change when prices tick, so every
+    chart asking for the same stock, range and point budget between two
+    ticks is served the same response from memory.
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        super().__init__(max_entries)
+
+    @staticmethod
+    def key(stock_id: int, time_range: str, max_points: int) -> HistoryKey:
+        """Return the cache key of a history request at the current price tick"""
+        return (stock_id, time_range, max_points, price_ticks.version)
+
+
+# Singleton instance
+stock_history_cache = StockHistoryCache(max_entries=settings.STOCK_HISTORY_CACHE_MAX_ENTRIES)
@@ -0,0 +1,208 @@
+"""
+Idempotency Service
+Replays stored trade responses for retried requests carrying an Idempotency-Key
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, select, update
+
+from app.config import get_settings
+from app.db.database import AsyncSessionLocal, dialect_insert
+from app.db.models import IdempotencyKey
+from app.schemas.transaction import TransactionResponse
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+Operation = Callable[[], Awaitable[TransactionResponse]]
+
+
+def request_fingerprint(request: BaseModel) -> str:
+    """Hash a request body so a reused key with a different payload is detected"""
+    return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+
+def _key_reused() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Idempotency-Key was already used with a different request",
+    )
+
+
+class InMemoryIdempotencyStore:
+    """
+    Bounded TTL/LRU store of trade responses, local to this process
+
+    A request arriving while the first request with the same key is still
+    running awaits that request's outcome instead of executing again.
+    Failed requests are not stored, so a client may retry them.
+    """
+
+    def __init__(self, max_keys: int = 10000, ttl_seconds: int = 86400):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, fingerprint, response)
+        self._entries: OrderedDict[str, tuple[float, str, TransactionResponse]] = OrderedDict()
+        # key -> (fingerprint, future resolving to the response)
+        self._in_flight: dict[str, tuple[str, asyncio.Future]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def execute(
+        self, db: AsyncSession, key: str, fingerprint: str, operation: Operation
+    ) -> TransactionResponse:
+        """
+        Run ``operation`` and commit ``db`` once per key
+
+        Args:
+            db: Session the operation writes through
+            key: Scoped idempotency key
+            fingerprint: Hash of the request body
+            operation: Coroutine function performing the (uncommitted) trade
+
+        Returns:
+            The stored response on replay, otherwise the operation's response
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, stored_fingerprint, response = entry
+            if expires_at > time.monotonic():
+                if stored_fingerprint != fingerprint:
+                    raise _key_reused()
+                self._entries.move_to_end(key)
+                logger.info(f"Replaying stored response for idempotency key {key}")
+                return response
+            del self._entries[key]
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            pending_fingerprint, future = pending
+            if pending_fingerprint != fingerprint:
+                raise _key_reused()
+            logger.info(f"Waiting on in-flight request for idempotency key {key}")
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (fingerprint, future)
+        try:
+            response = await operation()
+            await db.commit()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unobserved failure is not logged by asyncio
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, fingerprint, response)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+        future.set_result(response)
+        return response
+
+
+class DatabaseIdempotencyStore:
+    """
+    Idempotency store backed by the ``idempotency_keys`` table
+
+    The key row is inserted in the same transaction as the trade and the
+    response is written before commit, so a key is recorded if and only
+    if its trade is. On PostgreSQL a concurrent request with the same key
+    blocks on the unique index until the first transaction finishes, which
+    makes waiting on an in-flight request work across workers. Expired rows
+    are reclaimed when their key is reused and deleted by ``purge_expired``,
+    which the scheduler runs periodically.
+    """
+
+    def __init__(self, ttl_seconds: int = 86400):
+        self.ttl_seconds = ttl_seconds
+
+    async def execute(
+        self, db: AsyncSession, key: str, fingerprint: str, operation: Operation
+    ) -> TransactionResponse:
+        """Run ``operation`` and commit ``db`` once per key (see InMemoryIdempotencyStore)"""
+        claim = await db.execute(
+            dialect_insert(db)(IdempotencyKey)
+            .values(key=key, request_hash=fingerprint, created_at=datetime.now())
+            .on_conflict_do_nothing(index_elements=[IdempotencyKey.key])
+            .returning(IdempotencyKey.key)
+        )
+
+        if claim.scalar_one_or_none() is None:
+            result = await db.execute(
+                select(IdempotencyKey).where(IdempotencyKey.key == key).with_for_update()
+            )
+            row = result.scalar_one()
+            expired = row.created_at < datetime.now() - timedelta(seconds=self.ttl_seconds)
+
+            if not expired:
+                if row.request_hash != fingerprint:
+                    raise _key_reused()
+                if row.response is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="A request with this Idempotency-Key is still being processed",
+                    )
+                response = TransactionResponse.model_validate(row.response)
+                await db.rollback()
+                logger.info(f"Replaying stored response for idempotency key {key}")
+                return response
+
+            # Expired keys are reclaimed in place
+            await db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(request_hash=fingerprint, response=None, created_at=datetime.now())
+            )
+
+        response = await operation()
+        await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(response=response.model_dump(mode="json"))
+        )
+        await db.commit()
+        return response
+
+    async def purge_expired(self, db: Optional[AsyncSession] = None) -> int:
+        """
+        Delete keys older than the TTL
+
+        Returns:
+            Number of keys deleted
+        """
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await self.purge_expired(session)
+
+        cutoff = datetime.now() - timedelta(seconds=self.ttl_seconds)
+        result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+        await db.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired idempotency keys")
+        return result.rowcount
+
+
+def create_idempotency_store():
+    """Build the store selected by ``IDEMPOTENCY_BACKEND``"""
+    if settings.IDEMPOTENCY_BACKEND == "database":
+        return DatabaseIdempotencyStore(ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    return InMemoryIdempotencyStore(
+        max_keys=settings.IDEMPOTENCY_MAX_KEYS, ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS
+    )
+
+
+# Singleton instance
+idempotency_store = create_idempotency_store()
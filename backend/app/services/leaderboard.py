@@ -0,0 +1,187 @@
+"""
+Leaderboard Service
+Incrementally maintained ranking of users by portfolio gain percentage
+"""
+
+import asyncio
+from bisect import bisect_left, insort
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User, Stock, Wallet
+from app.schemas.portfolio import LeaderboardEntry
+from app.services.trade_versions import user_trade_versions
+from app.utils.fixed_point import from_cents, percentage, round_to_cents, to_cents
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class Leaderboard:
+    """
+    In-memory gain/loss leaderboard
+
+    Every user with an open position is scored by gain percentage and kept
+    in a bisect-sorted ``(-gain_pct, user_id)`` list, so the top and bottom
+    N are list slices. Scores are updated incrementally:
+
+    - a price tick re-scores only the holders of the stocks whose price
+      changed, found through a stock -> holders index
+    - a trade marks the user dirty (via the trade version listener); dirty
+      users' wallets are reloaded in one query before the next read
+
+    The full state is loaded from the database once, on first use. Totals
+    are integer cents with each position rounded to the cent, as in the
+    portfolio summary.
+    """
+
+    def __init__(self):
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._prices: dict[int, float] = {}
+        # user -> stock -> (quantity, total cost in cents)
+        self._positions: dict[int, dict[int, tuple[float, int]]] = {}
+        self._holders: dict[int, set[int]] = {}
+        self._usernames: dict[int, str] = {}
+        self._scores: dict[int, tuple[float, int]] = {}
+        self._ranking: list[tuple[float, int]] = []
+        self._dirty: set[int] = set()
+        user_trade_versions.add_listener(self.mark_dirty)
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    def mark_dirty(self, user_ids: set[int]):
+        """Queue users whose wallets changed for a reload"""
+        self._dirty.update(user_ids)
+
+    def update_prices(self, prices: dict[int, Decimal]):
+        """Apply new stock prices and re-score only the affected holders"""
+        if not self._loaded:
+            return
+        affected: set[int] = set()
+        for stock_id, price in prices.items():
+            self._prices[stock_id] = float(price)
+            affected |= self._holders.get(stock_id, set())
+        for user_id in affected:
+            self._rescore(user_id)
+
+    async def top(
+        self, db: AsyncSession, limit: int, losers: bool = False
+    ) -> list[LeaderboardEntry]:
+        """
+        Return the best (or worst) ``limit`` users by gain percentage
+
+        Args:
+            db: Session used to load state and reload users who traded
+            limit: Number of entries
+            losers: Rank from the largest loss instead of the largest gain
+        """
+        async with self._lock:
+            if not self._loaded:
+                await self._load(db)
+            elif self._dirty:
+                await self._reload_users(db)
+
+        ranked = self._ranking[-limit:][::-1] if losers else self._ranking[:limit]
+        start_rank = len(self._ranking) if losers else 1
+        step = -1 if losers else 1
+        return [
+            self._entry(start_rank + step * i, user_id) for i, (_, user_id) in enumerate(ranked)
+        ]
+
+    def _entry(self, rank: int, user_id: int) -> LeaderboardEntry:
+        value, invested = self._totals(user_id)
+        gain = value - invested
+        return LeaderboardEntry(
+            rank=rank,
+            user_id=user_id,
+            username=self._usernames.get(user_id, ""),
+            current_value=from_cents(value),
+            total_invested=from_cents(invested),
+            gain_loss_amount=from_cents(gain),
+            gain_loss_percentage=percentage(gain, invested),
+        )
+
+    def _totals(self, user_id: int) -> tuple[int, int]:
+        """Current value and invested amount of a user, in cents"""
+        value = invested = 0
+        for stock_id, (quantity, cost) in self._positions.get(user_id, {}).items():
+            value += int(round_to_cents(quantity * self._prices.get(stock_id, 0.0)))
+            invested += cost
+        return value, invested
+
+    def _rescore(self, user_id: int):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            del self._ranking[bisect_left(self._ranking, old)]
+
+        value, invested = self._totals(user_id)
+        if invested <= 0:
+            return
+        score = (-(value - invested) / invested * 100, user_id)
+        self._scores[user_id] = score
+        insort(self._ranking, score)
+
+    def _set_positions(self, user_id: int, positions: dict[int, tuple[float, int]]):
+        for stock_id in self._positions.pop(user_id, {}):
+            self._holders.get(stock_id, set()).discard(user_id)
+        if positions:
+            self._positions[user_id] = positions
+            for stock_id in positions:
+                self._holders.setdefault(stock_id, set()).add(user_id)
+
+    async def _wallet_rows(self, db: AsyncSession, user_ids: Optional[set[int]] = None):
+        query = (
+            select(
+                Wallet.user_id, Wallet.stock_id, Wallet.quantity, Wallet.total_cost, User.username
+            )
+            .join(User, Wallet.user_id == User.id)
+            .where(Wallet.quantity > 0)
+        )
+        if user_ids is not None:
+            query = query.where(Wallet.user_id.in_(user_ids))
+        result = await db.execute(query)
+        positions: dict[int, dict[int, tuple[float, int]]] = {}
+        for row in result:
+            positions.setdefault(row.user_id, {})[row.stock_id] = (
+                float(row.quantity),
+                to_cents(row.total_cost),
+            )
+            self._usernames[row.user_id] = row.username
+        return positions
+
+    async def _load(self, db: AsyncSession):
+        self._dirty.clear()
+        price_result = await db.execute(select(Stock.id, Stock.current_price))
+        self._prices = {row.id: float(row.current_price) for row in price_result}
+        for user_id, positions in (await self._wallet_rows(db)).items():
+            self._set_positions(user_id, positions)
+            self._rescore(user_id)
+        self._loaded = True
+        logger.info(f"Leaderboard loaded with {len(self._ranking)} ranked users")
+
+    async def _reload_users(self, db: AsyncSession):
+        dirty, self._dirty = self._dirty, set()
+        try:
+            positions = await self._wallet_rows(db, dirty)
+
+            missing = {sid for p in positions.values() for sid in p} - self._prices.keys()
+            if missing:
+                price_result = await db.execute(
+                    select(Stock.id, Stock.current_price).where(Stock.id.in_(missing))
+                )
+                self._prices.update({row.id: float(row.current_price) for row in price_result})
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+        for user_id in dirty:
+            self._set_positions(user_id, positions.get(user_id, {}))
+            self._rescore(user_id)
+
+
+# Singleton instance
+leaderboard = Leaderboard()
@@ -0,0 +1,139 @@
+"""
+In-memory Order Book
+Per-stock price-sorted arrays of resting limit orders
+"""
+
+import math
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from app.db.models import TransactionType
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+QUANTITY_STEP = Decimal("0.000001")
+
+
+class BookOrder(NamedTuple):
+    """Resting limit order as held by the book"""
+
+    order_id: int
+    user_id: int
+    stock_id: int
+    side: TransactionType
+    limit_price: Decimal
+    amount: Optional[Decimal] = None  # BUY orders
+    quantity: Optional[Decimal] = None  # SELL orders
+
+
+class OrderBook:
+    """
+    Mirror of the open rows in ``limit_orders``, indexed for matching
+
+    Each side of each stock is a bisect-maintained list of
+    ``(sort_price, order_id)`` keys ordered best-first: bids by descending
+    limit (stored negated), asks by ascending limit, ties by order id.
+    Orders crossed by a new price are therefore always a prefix of the
+    list, so matching a tick costs O(log n + k) for k fills rather than a
+    scan of every open order.
+
+    The book lives in process memory; the database remains the source of
+    truth and the book is rebuilt from it at startup.
+    """
+
+    def __init__(self):
+        self._bids: dict[int, list[tuple[Decimal, int]]] = {}
+        self._asks: dict[int, list[tuple[Decimal, int]]] = {}
+        self._orders: dict[int, BookOrder] = {}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def _side(self, order: BookOrder):
+        if order.side == TransactionType.BUY:
+            return self._bids.setdefault(order.stock_id, []), (-order.limit_price, order.order_id)
+        return self._asks.setdefault(order.stock_id, []), (order.limit_price, order.order_id)
+
+    def add(self, order: BookOrder):
+        """Insert a resting order (no-op if it is already in the book)"""
+        if order.order_id in self._orders:
+            return
+        levels, key = self._side(order)
+        insort(levels, key)
+        self._orders[order.order_id] = order
+
+    def remove(self, order_id: int) -> Optional[BookOrder]:
+        """Remove an order by id, returning it if it was in the book"""
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return None
+        levels, key = self._side(order)
+        index = bisect_left(levels, key)
+        if index < len(levels) and levels[index] == key:
+            del levels[index]
+        return order
+
+    def pop_crossed(self, stock_id: int, price: Decimal) -> list[BookOrder]:
+        """
+        Remove and return every order on ``stock_id`` crossed by ``price``
+
+        Buy orders cross when price <= limit, sell orders when
+        price >= limit. Orders are returned best price first.
+        """
+        crossed: list[BookOrder] = []
+
+        bids = self._bids.get(stock_id)
+        if bids:
+            end = bisect_right(bids, (-price, math.inf))
+            crossed.extend(self._orders.pop(order_id) for _, order_id in bids[:end])
+            del bids[:end]
+
+        asks = self._asks.get(stock_id)
+        if asks:
+            end = bisect_right(asks, (price, math.inf))
+            crossed.extend(self._orders.pop(order_id) for _, order_id in asks[:end])
+            del asks[:end]
+
+        return crossed
+
+    def depth(self, stock_id: int, levels: int = 10) -> tuple[list[dict], list[dict]]:
+        """
+        Aggregate the best ``levels`` price levels of each side
+
+        Bid sizes are the share quantity the order's cash buys at its limit.
+
+        Returns:
+            Tuple of (bids, asks), each a list of
+            ``{"price", "quantity", "orders"}`` dicts best-first
+        """
+        return (
+            self._aggregate(self._bids.get(stock_id, []), levels),
+            self._aggregate(self._asks.get(stock_id, []), levels),
+        )
+
+    def _aggregate(self, keys: list[tuple[Decimal, int]], levels: int) -> list[dict]:
+        result: list[dict] = []
+        for _, order_id in keys:
+            order = self._orders[order_id]
+            if order.side == TransactionType.BUY:
+                size = (order.amount / order.limit_price).quantize(QUANTITY_STEP)
+            else:
+                size = order.quantity
+
+            if result and result[-1]["price"] == order.limit_price:
+                result[-1]["quantity"] += size
+                result[-1]["orders"] += 1
+                continue
+            if len(result) == levels:
+                break
+            result.append({"price": order.limit_price, "quantity": size, "orders": 1})
+        return result
+
+
+# Singleton instance
+order_book = OrderBook()
@@ -0,0 +1,173 @@
+"""
+Limit Order Matching Service
+Fills resting limit orders whose limits are crossed by a new price tick
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, update, bindparam
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import LimitOrder, OrderStatus
+from app.schemas.transaction import BatchTransactionLeg, TransactionTypeEnum
+from app.services.order_book import BookOrder, order_book
+from app.services.trade_executor import trade_executor
+from app.services.trade_locks import trade_locks
+from app.services.trade_versions import user_trade_versions
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def book_order_from_row(order: LimitOrder) -> BookOrder:
+    """Build the in-memory representation of a ``limit_orders`` row"""
+    return BookOrder(
+        order_id=order.id,
+        user_id=order.user_id,
+        stock_id=order.stock_id,
+        side=order.side,
+        limit_price=order.limit_price,
+        amount=order.amount,
+        quantity=order.quantity,
+    )
+
+
+class OrderMatcher:
+    """Service matching the in-memory order book against new prices"""
+
+    def __init__(self, batch_size: int = 500):
+        self.book = order_book
+        self.batch_size = batch_size
+        logger.info("OrderMatcher initialized")
+
+    async def load_open_orders(self):
+        """Rebuild the order book from the open rows in ``limit_orders``"""
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(LimitOrder).where(LimitOrder.status == OrderStatus.OPEN)
+                )
+                for order in result.scalars():
+                    self.book.add(book_order_from_row(order))
+
+            logger.info(f"Loaded {len(self.book)} open limit orders into the order book")
+
+        except Exception as e:
+            logger.error(f"Error loading open limit orders: {str(e)}")
+            raise
+
+    async def match_orders(self, prices: dict[int, Decimal]) -> int:
+        """
+        Fill every resting order crossed by the given prices
+
+        Only the crossed prefix of each stock's book is touched. Crossed
+        orders are filled through the batch trade path, ``batch_size``
+        orders per database transaction, at the committed stock price.
+
+        Args:
+            prices: New price per stock id
+
+        Returns:
+            Number of orders filled
+        """
+        crossed: list[BookOrder] = []
+        for stock_id, price in prices.items():
+            crossed.extend(self.book.pop_crossed(stock_id, price))
+
+        if not crossed:
+            return 0
+
+        filled = 0
+        for start in range(0, len(crossed), self.batch_size):
+            filled += await self._fill_batch(crossed[start : start + self.batch_size])
+
+        logger.info(f"Matched {len(crossed)} limit orders, {filled} filled")
+        return filled
+
+    async def _fill_batch(self, orders: list[BookOrder]) -> int:
+        try:
+            async with AsyncSessionLocal() as session:
+                async with trade_locks.hold(session, *(o.user_id for o in orders)):
+                    # Claim the orders with a conditional UPDATE before trading:
+                    # an order cancelled or filled meanwhile matches no row and
+                    # is skipped. Unlike a SELECT ... FOR UPDATE, this also holds
+                    # on SQLite, which has no row locks.
+                    table = LimitOrder.__table__
+                    claim_result = await session.execute(
+                        update(table)
+                        .where(
+                            table.c.id.in_([o.order_id for o in orders]),
+                            table.c.status == OrderStatus.OPEN,
+                        )
+                        .values(status=OrderStatus.FILLED)
+                        .returning(table.c.id)
+                    )
+                    claimed = set(claim_result.scalars().all())
+                    live = [o for o in orders if o.order_id in claimed]
+                    if not live:
+                        return 0
+
+                    legs = [
+                        BatchTransactionLeg(
+                            type=TransactionTypeEnum(o.side.value),
+                            user_id=o.user_id,
+                            stock_id=o.stock_id,
+                            amount=o.amount,
+                            quantity=o.quantity,
+                        )
+                        for o in live
+                    ]
+                    results = await trade_executor.execute_batch(session, legs, atomic=False)
+
+                    now = datetime.now()
+                    updates = []
+                    for order, result in zip(live, results):
+                        if result.status == "success":
+                            updates.append(
+                                {
+                                    "o_id": order.order_id,
+                                    "o_status": OrderStatus.FILLED,
+                                    "o_transaction_id": result.transaction_id,
+                                    "o_filled_at": now,
+                                }
+                            )
+                        else:
+                            logger.warning(f"Rejected limit order {order.order_id}: {result.error}")
+                            updates.append(
+                                {
+                                    "o_id": order.order_id,
+                                    "o_status": OrderStatus.REJECTED,
+                                    "o_transaction_id": None,
+                                    "o_filled_at": None,
+                                }
+                            )
+
+                    await session.execute(
+                        update(table)
+                        .where(
+                            table.c.id == bindparam("o_id"),
+                            table.c.status == OrderStatus.FILLED,
+                        )
+                        .values(
+                            status=bindparam("o_status"),
+                            transaction_id=bindparam("o_transaction_id"),
+                            filled_at=bindparam("o_filled_at"),
+                        ),
+                        updates,
+                    )
+                    await session.commit()
+
+                    filled = [o for o, r in zip(live, results) if r.status == "success"]
+                    user_trade_versions.bump(*(o.user_id for o in filled))
+                    return len(filled)
+
+        except Exception as e:
+            # Nothing was committed; keep the orders resting for the next tick
+            logger.error(f"Error filling limit orders: {str(e)}")
+            for order in orders:
+                self.book.add(order)
+            return 0
+
+
+# Singleton instance
+order_matcher = OrderMatcher()
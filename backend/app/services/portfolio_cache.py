@@ -0,0 +1,37 @@
+"""
+Portfolio Cache Service
+LRU cache of portfolio summaries keyed by price tick and user trade versions
+"""
+
+from app.config import get_settings
+from app.schemas.portfolio import PortfolioSummaryResponse
+from app.services.price_ticks import price_ticks
+from app.services.trade_versions import user_trade_versions
+from app.services.versioned_cache import VersionedLRUCache
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+
+class PortfolioSummaryCache(VersionedLRUCache[PortfolioSummaryResponse]):
+    """
+    Bounded LRU cache of portfolio summaries
+
+    Entries are keyed by ``(user_id, price_tick_version, user_trade_version)``.
+    A summary only changes when prices tick or the user trades, and both
+    advance a version, so a cached summary is served until one of them
+    moves and is then aged out by LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        super().__init__(max_entries)
+
+    @staticmethod
+    def key(user_id: int) -> tuple[int, int, int]:
+        """Return the cache key of the user's summary at the current versions"""
+        return (user_id, price_ticks.version, user_trade_versions.get(user_id))
+
+
+# Singleton instance
+portfolio_cache = PortfolioSummaryCache(max_entries=settings.PORTFOLIO_CACHE_MAX_ENTRIES)
@@ -0,0 +1,186 @@
+"""
+Portfolio History Service
+Rebuilds a user's portfolio value over time by replaying trades against price history
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import numpy as np
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Stock, StockPriceHistory, Transaction, TransactionType
+from app.schemas.portfolio import PortfolioHistoryPoint
+from app.utils.fixed_point import from_cents, round_to_cents, to_cents
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+RANGE_HOURS = {"7d": 7 * 24, "30d": 30 * 24}
+
+
+async def price_matrix(
+    db: AsyncSession, stock_ids: list[int], grid: np.ndarray, start: datetime
+) -> np.ndarray:
+    """
+    Forward-filled price of every stock at every grid point
+
+    Each grid point gets the last recorded price at or before it; points
+    before a stock's first recorded price fall back to its current price.
+    """
+    # Last price before the range opens, so the first points are not empty
+    before = (
+        select(StockPriceHistory.stock_id, func.max(StockPriceHistory.timestamp).label("timestamp"))
+        .where(StockPriceHistory.stock_id.in_(stock_ids), StockPriceHistory.timestamp < start)
+        .group_by(StockPriceHistory.stock_id)
+        .subquery()
+    )
+    opening_result = await db.execute(
+        select(
+            StockPriceHistory.stock_id, StockPriceHistory.price, StockPriceHistory.timestamp
+        ).join(
+            before,
+            and_(
+                StockPriceHistory.stock_id == before.c.stock_id,
+                StockPriceHistory.timestamp == before.c.timestamp,
+            ),
+        )
+    )
+    range_result = await db.execute(
+        select(
+            StockPriceHistory.stock_id, StockPriceHistory.price, StockPriceHistory.timestamp
+        ).where(StockPriceHistory.stock_id.in_(stock_ids), StockPriceHistory.timestamp >= start)
+    )
+    ticks = sorted(opening_result.all() + range_result.all(), key=lambda t: t.timestamp)
+
+    current_result = await db.execute(
+        select(Stock.id, Stock.current_price).where(Stock.id.in_(stock_ids))
+    )
+    current = {row.id: float(row.current_price) for row in current_result}
+    column = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+    rows, cols = len(grid), len(stock_ids)
+
+    prices = np.full((rows, cols), np.nan)
+    if ticks:
+        tick_times = np.array([t.timestamp for t in ticks], dtype="datetime64[us]")
+        tick_rows = np.minimum(np.searchsorted(grid, tick_times, side="left"), rows - 1)
+        tick_cols = np.array([column[t.stock_id] for t in ticks], dtype=np.intp)
+        tick_prices = np.array([float(t.price) for t in ticks])
+
+        # A tick belongs to the first grid point at or after it; keep the
+        # latest tick per cell (first occurrence in reversed time order)
+        cells = tick_rows * cols + tick_cols
+        _, latest = np.unique(cells[::-1], return_index=True)
+        latest = len(cells) - 1 - latest
+        prices.flat[cells[latest]] = tick_prices[latest]
+
+        # Forward-fill each column with its last known price
+        filled = np.where(np.isnan(prices), 0, np.arange(rows)[:, None])
+        np.maximum.accumulate(filled, axis=0, out=filled)
+        prices = prices[filled, np.arange(cols)]
+
+    fallback = np.array([current.get(stock_id, 0.0) for stock_id in stock_ids])
+    return np.where(np.isnan(prices), fallback, prices)
+
+
+class PortfolioHistoryBuilder:
+    """
+    Vectorized portfolio value replay
+
+    The range is sampled on an hourly grid ending now. Every array below
+    has one row per grid point and one column per stock the user ever
+    traded:
+
+    - holdings: signed trade quantities are scattered onto the first grid
+      point at or after each trade and cumulatively summed down the grid
+    - prices: the last recorded price at or before each grid point,
+      forward-filled, falling back to the current price before any history
+    - value: the row-wise sum of holdings times prices, each position
+      rounded to cents first as in the portfolio summary
+
+    Cash is replayed the same way, in integer cents, backwards from the
+    current balance.
+    """
+
+    async def build(
+        self, db: AsyncSession, user_id: int, balance: Decimal, time_range: str
+    ) -> list[PortfolioHistoryPoint]:
+        """
+        Replay the user's trades over ``time_range``
+
+        Args:
+            db: Session to read with
+            user_id: User to replay
+            balance: The user's current cash balance
+            time_range: ``7d`` or ``30d``
+        """
+        hours = RANGE_HOURS[time_range]
+        now = datetime.now()
+        start = now - timedelta(hours=hours)
+        grid = np.datetime64(now, "us") - np.arange(hours, -1, -1) * np.timedelta64(1, "h")
+
+        trades_result = await db.execute(
+            select(
+                Transaction.stock_id,
+                Transaction.type,
+                Transaction.amount,
+                Transaction.quantity,
+                Transaction.timestamp,
+            )
+            .where(Transaction.user_id == user_id)
+            .order_by(Transaction.timestamp.asc(), Transaction.id.asc())
+        )
+        trades = trades_result.all()
+
+        if not trades:
+            cash = from_cents(to_cents(balance))
+            return [
+                PortfolioHistoryPoint(
+                    timestamp=t.item(),
+                    holdings_value=Decimal("0.00"),
+                    cash_balance=cash,
+                    total_value=cash,
+                )
+                for t in grid
+            ]
+
+        stock_ids = sorted({t.stock_id for t in trades})
+        column = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+        rows, cols = len(grid), len(stock_ids)
+
+        # Holdings step function: scatter signed quantities, then cumsum down the grid
+        is_buy = np.array([t.type == TransactionType.BUY for t in trades])
+        sign = np.where(is_buy, 1.0, -1.0)
+        trade_times = np.array([t.timestamp for t in trades], dtype="datetime64[us]")
+        trade_rows = np.searchsorted(grid, trade_times, side="left")
+        trade_cols = np.array([column[t.stock_id] for t in trades], dtype=np.intp)
+        quantities = np.array([float(t.quantity) for t in trades]) * sign
+
+        deltas = np.zeros((rows + 1, cols))
+        np.add.at(deltas, (trade_rows, trade_cols), quantities)
+        holdings = np.cumsum(deltas, axis=0)[:rows]
+
+        # Cash (cents): current balance minus the cash flows of trades after each point
+        flows = np.array([to_cents(t.amount) for t in trades], dtype=np.int64) * -sign.astype(
+            np.int64
+        )
+        flows_through = np.concatenate(([0], np.cumsum(flows)))
+        trades_through = np.searchsorted(trade_times, grid, side="right")
+        cash = to_cents(balance) - (flows_through[-1] - flows_through[trades_through])
+
+        prices = await price_matrix(db, stock_ids, grid, start)
+        values = round_to_cents(holdings * prices).sum(axis=1)
+
+        return [
+            PortfolioHistoryPoint(
+                timestamp=grid[i].item(),
+                holdings_value=from_cents(int(values[i])),
+                cash_balance=from_cents(int(cash[i])),
+                total_value=from_cents(int(values[i] + cash[i])),
+            )
+            for i in range(rows)
+        ]
+
+
+# Singleton instance
+portfolio_history_builder = PortfolioHistoryBuilder()
@@ -0,0 +1,127 @@
+"""
+Portfolio Snapshot Service
+Writes a portfolio_snapshots row per holder after each price tick, in the background
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import get_settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import PortfolioSnapshot
+from app.services.portfolio_valuation import PortfolioValuator
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+
+class PortfolioSnapshotWriter:
+    """
+    Materializes portfolio valuations after each price tick
+
+    ``schedule`` starts the write as a background task and returns
+    immediately, so the price updater never waits on it. Users holding at
+    least one position are valued in chunks by ``PortfolioValuator``, and
+    each chunk is written with one bulk insert and committed. A tick that
+    arrives while the previous snapshot is still being written is skipped
+    rather than queued behind it. Rows older than ``retention_days`` are
+    deleted after each snapshot, so the table stays bounded.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        chunk_size: int = 1000,
+        retention_days: int = 30,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+    ):
+        self.enabled = enabled
+        self.valuator = PortfolioValuator(chunk_size=chunk_size)
+        self.retention_days = retention_days
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self.snapshots_written = 0
+        self.ticks_skipped = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, taken_at: datetime) -> Optional[asyncio.Task]:
+        """Start writing snapshots for the tick committed at ``taken_at``"""
+        if not self.enabled:
+            return None
+        if self.is_running:
+            self.ticks_skipped += 1
+            logger.warning(
+                f"Skipping portfolio snapshot for {taken_at}: previous snapshot still running"
+            )
+            return None
+        self._task = asyncio.create_task(self._run(taken_at), name="portfolio-snapshot-writer")
+        return self._task
+
+    async def shutdown(self):
+        """Wait for an in-flight snapshot to finish"""
+        if self.is_running:
+            await asyncio.wait([self._task])
+
+    async def write_snapshots(self, taken_at: datetime) -> int:
+        """
+        Value every holder, insert their snapshot rows and prune expired ones
+
+        Args:
+            taken_at: Timestamp stored on every row of this snapshot
+
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        async with self.session_factory() as session:
+            async for chunk in self.valuator.value_users(session, holders_only=True):
+                await session.execute(
+                    insert(PortfolioSnapshot.__table__),
+                    [
+                        {
+                            "user_id": v.user_id,
+                            "current_value": v.current_value,
+                            "total_invested": v.total_invested,
+                            "gain_loss_amount": v.gain_loss_amount,
+                            "gain_loss_percentage": v.gain_loss_percentage,
+                            "cash_balance": v.cash_balance,
+                            "timestamp": taken_at,
+                        }
+                        for v in chunk
+                    ],
+                )
+                await session.commit()
+                written += len(chunk)
+
+            if self.retention_days > 0:
+                cutoff = taken_at - timedelta(days=self.retention_days)
+                result = await session.execute(
+                    delete(PortfolioSnapshot).where(PortfolioSnapshot.timestamp < cutoff)
+                )
+                await session.commit()
+                if result.rowcount:
+                    logger.info(f"Pruned {result.rowcount} portfolio snapshots older than {cutoff}")
+        return written
+
+    async def _run(self, taken_at: datetime):
+        try:
+            written = await self.write_snapshots(taken_at)
+            self.snapshots_written += written
+            logger.info(f"Wrote {written} portfolio snapshots for {taken_at}")
+        except Exception as e:
+            logger.error(f"Error writing portfolio snapshots: {str(e)}")
+
+
+# Singleton instance
+portfolio_snapshot_writer = PortfolioSnapshotWriter(
+    enabled=settings.PORTFOLIO_SNAPSHOTS_ENABLED,
+    chunk_size=settings.PORTFOLIO_SNAPSHOT_CHUNK_SIZE,
+    retention_days=settings.PORTFOLIO_SNAPSHOT_RETENTION_DAYS,
+)
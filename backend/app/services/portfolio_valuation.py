@@ -0,0 +1,130 @@
+"""
+Portfolio Valuation Service
+Values many users' portfolios at once with set-based queries and NumPy
+"""
+
+from typing import AsyncIterator, Optional, Sequence
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User, Stock, Wallet
+from app.schemas.portfolio import PortfolioValuation
+from app.utils.fixed_point import from_cents, percentage, round_to_cents
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PortfolioValuator:
+    """
+    Bulk portfolio valuation
+
+    Stock prices are read once per run into an array, so every user is
+    valued against the same price snapshot. Users are then processed in
+    chunks of ``chunk_size``: one query for their balances, one for their
+    open wallet rows. Position values are ``quantity * prices[stock]`` over
+    the whole chunk and are summed per user with ``np.bincount``. No Python
+    loop runs per holding.
+
+    Each position value is rounded to cents before it is summed, exactly
+    as the single-user portfolio summary does, and totals, gains and
+    percentages are then computed on integer cents, so both agree.
+    """
+
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        logger.info("PortfolioValuator initialized")
+
+    async def value_users(
+        self, db: AsyncSession, user_ids: Optional[Sequence[int]] = None, holders_only: bool = False
+    ) -> AsyncIterator[list[PortfolioValuation]]:
+        """
+        Yield valuations chunk by chunk, ordered by user id
+
+        Args:
+            db: Session to read with
+            user_ids: Users to value (unknown ids are skipped); ``None`` values every user
+            holders_only: Skip users without an open position
+        """
+        stock_result = await db.execute(select(Stock.id, Stock.current_price))
+        stock_rows = stock_result.all()
+        stock_index = {row.id: i for i, row in enumerate(stock_rows)}
+        prices = np.array([float(row.current_price) for row in stock_rows], dtype=np.float64)
+
+        users_query = select(User.id, User.balance)
+        if holders_only:
+            users_query = users_query.where(
+                User.id.in_(select(Wallet.user_id).where(Wallet.quantity > 0))
+            )
+
+        async for users in self._user_chunks(db, users_query, user_ids):
+            yield await self._value_chunk(db, users, stock_index, prices)
+
+    async def _user_chunks(self, db: AsyncSession, users_query, user_ids: Optional[Sequence[int]]):
+        if user_ids is not None:
+            ids = sorted(set(user_ids))
+            for start in range(0, len(ids), self.chunk_size):
+                result = await db.execute(
+                    users_query.where(User.id.in_(ids[start : start + self.chunk_size])).order_by(
+                        User.id
+                    )
+                )
+                users = result.all()
+                if users:
+                    yield users
+            return
+
+        last_id = 0
+        while True:
+            result = await db.execute(
+                users_query.where(User.id > last_id).order_by(User.id).limit(self.chunk_size)
+            )
+            users = result.all()
+            if not users:
+                return
+            yield users
+            last_id = users[-1].id
+
+    async def _value_chunk(
+        self, db: AsyncSession, users: list, stock_index: dict[int, int], prices: np.ndarray
+    ) -> list[PortfolioValuation]:
+        positions = {row.id: i for i, row in enumerate(users)}
+        wallet_result = await db.execute(
+            select(Wallet.user_id, Wallet.stock_id, Wallet.quantity, Wallet.total_cost).where(
+                Wallet.user_id.in_(positions), Wallet.quantity > 0
+            )
+        )
+        wallets = wallet_result.all()
+
+        n = len(users)
+        count = len(wallets)
+        owner = np.fromiter((positions[w.user_id] for w in wallets), dtype=np.intp, count=count)
+        stock = np.fromiter((stock_index[w.stock_id] for w in wallets), dtype=np.intp, count=count)
+        quantity = np.fromiter((float(w.quantity) for w in wallets), dtype=np.float64, count=count)
+        cost = np.fromiter((float(w.total_cost) for w in wallets), dtype=np.float64, count=count)
+
+        # Integer cents from here on; the per-user sums stay exact in float64
+        value = np.bincount(
+            owner, weights=round_to_cents(quantity * prices[stock]), minlength=n
+        ).astype(np.int64)
+        invested = np.bincount(owner, weights=round_to_cents(cost), minlength=n).astype(np.int64)
+        holdings = np.bincount(owner, minlength=n)
+        gain = value - invested
+
+        return [
+            PortfolioValuation(
+                user_id=user.id,
+                cash_balance=user.balance,
+                total_invested=from_cents(int(invested[i])),
+                current_value=from_cents(int(value[i])),
+                gain_loss_amount=from_cents(int(gain[i])),
+                gain_loss_percentage=percentage(int(gain[i]), int(invested[i])),
+                holdings_count=int(holdings[i]),
+            )
+            for i, user in enumerate(users)
+        ]
+
+
+# Singleton instance
+portfolio_valuator = PortfolioValuator()
@@ -0,0 +1,193 @@
+"""
+Price Cache Service
+In-process stock quotes and ring buffers of recent price history
+"""
+
+from datetime import datetime
+from typing import Iterable, Optional
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import Stock, StockPriceHistory
+from app.schemas.stock import StockResponse, StockPriceHistoryResponse
+from app.utils.fixed_point import to_cents, from_cents
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+
+class PriceRing:
+    """
+    Fixed-size ring buffer of one stock's most recent price history rows
+
+    Ids, timestamps and prices (integer cents) live in preallocated NumPy
+    arrays; appending overwrites the oldest row once the buffer is full.
+    ``complete`` means the buffer holds the stock's entire history, which
+    is true when it was warmed with fewer rows than its capacity.
+    """
+
+    def __init__(self, capacity: int, complete: bool = False):
+        self.capacity = capacity
+        self.complete = complete
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._timestamps = np.zeros(capacity, dtype="datetime64[us]")
+        self._cents = np.zeros(capacity, dtype=np.int64)
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, history_id: int, timestamp: datetime, cents: int):
+        self._ids[self._head] = history_id
+        self._timestamps[self._head] = np.datetime64(timestamp, "us")
+        self._cents[self._head] = cents
+        self._head = (self._head + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self.complete = False
+
+    def _ordered(self, values: np.ndarray) -> np.ndarray:
+        if self._size < self.capacity:
+            return values[: self._size]
+        return np.concatenate((values[self._head :], values[: self._head]))
+
+    def covers(self, start: datetime) -> bool:
+        """Whether every stored row at or after ``start`` is in the buffer"""
+        if self.complete:
+            return True
+        return self._size > 0 and bool(
+            self._ordered(self._timestamps)[0] <= np.datetime64(start, "us")
+        )
+
+    def since(self, start: datetime) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ids, timestamps and cents of the rows at or after ``start``, oldest first"""
+        timestamps = self._ordered(self._timestamps)
+        first = int(np.searchsorted(timestamps, np.datetime64(start, "us"), side="left"))
+        return (
+            self._ordered(self._ids)[first:],
+            timestamps[first:],
+            self._ordered(self._cents)[first:],
+        )
+
+
+class PriceCache:
+    """
+    Current quotes and recent history of every stock, kept in memory
+
+    Prices only change when the price updater ticks, so after the cache is
+    warmed from ``stocks`` / ``stock_price_history`` at startup, the
+    updater pushes each committed tick into it and the stock routes serve
+    quotes and short-range history without touching the database. Stocks
+    added outside the updater are picked up on its next full tick; until
+    then ``get_stock`` misses and callers fall back to the database.
+
+    Like the price tick version, the cache is process-local.
+    """
+
+    def __init__(self, history_size: int = 300):
+        self.history_size = history_size
+        self.ready = False
+        self._quotes: dict[int, StockResponse] = {}
+        self._quote_list: list[StockResponse] = []
+        self._rings: dict[int, PriceRing] = {}
+
+    async def warm(self, db: Optional[AsyncSession] = None):
+        """Load every stock and the latest ``history_size`` history rows of each"""
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await self.warm(session)
+
+        stocks_result = await db.execute(select(Stock))
+        stocks = stocks_result.scalars().all()
+
+        recent = select(
+            StockPriceHistory.id,
+            StockPriceHistory.stock_id,
+            StockPriceHistory.price,
+            StockPriceHistory.timestamp,
+            func.row_number()
+            .over(
+                partition_by=StockPriceHistory.stock_id,
+                order_by=(StockPriceHistory.timestamp.desc(), StockPriceHistory.id.desc()),
+            )
+            .label("age"),
+        ).subquery()
+        history_result = await db.execute(
+            select(recent.c.id, recent.c.stock_id, recent.c.price, recent.c.timestamp)
+            .where(recent.c.age <= self.history_size)
+            .order_by(recent.c.stock_id, recent.c.timestamp, recent.c.id)
+        )
+
+        rings: dict[int, list] = {stock.id: [] for stock in stocks}
+        for row in history_result:
+            rings.setdefault(row.stock_id, []).append(row)
+
+        self._rings = {}
+        for stock_id, rows in rings.items():
+            ring = PriceRing(self.history_size, complete=len(rows) < self.history_size)
+            for row in rows:
+                ring.append(row.id, row.timestamp, to_cents(row.price))
+            self._rings[stock_id] = ring
+
+        self._set_quotes(stocks, replace=True)
+        self.ready = True
+        logger.info(f"Price cache warmed with {len(self._quotes)} stocks")
+
+    def record_tick(self, stocks: Iterable[Stock], history: Iterable[StockPriceHistory]):
+        """Apply a committed tick: refresh the stocks' quotes and append their new history rows"""
+        if not self.ready:
+            return
+        self._set_quotes(stocks)
+        for row in history:
+            ring = self._rings.get(row.stock_id)
+            if ring is None:
+                ring = self._rings[row.stock_id] = PriceRing(self.history_size)
+            ring.append(row.id, row.timestamp, to_cents(row.price))
+
+    def _set_quotes(self, stocks: Iterable[Stock], replace: bool = False):
+        quotes = {} if replace else dict(self._quotes)
+        for stock in stocks:
+            quotes[stock.id] = StockResponse.model_validate(stock)
+        self._quotes = quotes
+        self._quote_list = [quotes[stock_id] for stock_id in sorted(quotes)]
+
+    def list_stocks(self) -> list[StockResponse]:
+        """Every cached quote, ordered by stock id"""
+        return self._quote_list
+
+    def get_stock(self, stock_id: int) -> Optional[StockResponse]:
+        return self._quotes.get(stock_id)
+
+    def get_history(
+        self, stock_id: int, start: datetime
+    ) -> Optional[list[StockPriceHistoryResponse]]:
+        """History rows at or after ``start``, or None when the buffer does not reach back that far"""
+        ring = self._rings.get(stock_id)
+        if ring is None or not ring.covers(start):
+            return None
+        ids, timestamps, cents = ring.since(start)
+        return [
+            StockPriceHistoryResponse(
+                id=int(ids[i]),
+                stock_id=stock_id,
+                price=from_cents(int(cents[i])),
+                timestamp=timestamps[i].item(),
+            )
+            for i in range(len(ids))
+        ]
+
+    def clear(self):
+        self.ready = False
+        self._quotes = {}
+        self._quote_list = []
+        self._rings = {}
+
+
+# Singleton instance
+price_cache = PriceCache(history_size=settings.PRICE_CACHE_HISTORY_SIZE)
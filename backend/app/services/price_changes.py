@@ -0,0 +1,78 @@
+"""
+Price Change Log Service
+Bounded in-memory log of the prices each tick changed, for delta polling
+"""
+
+from collections import deque
+from decimal import Decimal
+from typing import Optional
+
+from app.config import get_settings
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+
+class PriceChangeLog:
+    """
+    The changed prices of the most recent ticks, newest last
+
+    Each committed tick appends ``(price_tick_version, {stock_id: price})``.
+    A poller that last saw version ``v`` gets every stock changed after
+    ``v`` by merging the newer entries, newest first, so its cost grows
+    with what changed rather than with the number of stocks. Versions older
+    than the retained window cannot be answered and return None; the caller
+    must resync with the full list. Versions restart at 0 with the process,
+    so the log cannot recognize a version from before a restart: callers
+    must check the client's epoch (``etag.BOOT_ID``) before asking.
+    """
+
+    def __init__(self, max_entries: int = 288):
+        self._entries: deque[tuple[int, dict[int, Decimal]]] = deque(maxlen=max_entries)
+
+    @property
+    def version(self) -> int:
+        """Version of the newest logged tick (0 when empty)"""
+        return self._entries[-1][0] if self._entries else 0
+
+    def record(self, version: int, prices: dict[int, Decimal]):
+        """Append the prices changed by the tick that produced ``version``"""
+        self._entries.append((version, dict(prices)))
+
+    def since(self, version: int, current_version: int) -> Optional[dict[int, Decimal]]:
+        """
+        Latest price of every stock changed after ``version``
+
+        Args:
+            version: Last version the client has seen
+            current_version: The current price tick version
+
+        Returns:
+            Changed prices by stock id, or None when the log cannot tell
+        """
+        if version > current_version:
+            return None
+        if version == current_version:
+            return {}
+        if (
+            not self._entries
+            or self._entries[0][0] > version + 1
+            or self.version != current_version
+        ):
+            return None
+
+        changes: dict[int, Decimal] = {}
+        for entry_version, prices in reversed(self._entries):
+            if entry_version <= version:
+                break
+            for stock_id, price in prices.items():
+                changes.setdefault(stock_id, price)
+        return changes
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Singleton instance
+price_change_log = PriceChangeLog(max_entries=settings.PRICE_CHANGE_LOG_SIZE)
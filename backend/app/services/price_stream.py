@@ -0,0 +1,119 @@
+"""
+Price Stream Service
+Fans each committed price tick out to SSE and WebSocket subscribers
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from app.config import get_settings
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+
+class StreamMessage(NamedTuple):
+    """One tick, serialized once for every subscriber"""
+
+    version: int
+    text: str  # JSON body, sent as-is over WebSockets
+    sse: str  # The same body framed as a Server-Sent Event
+
+
+class PriceBroadcaster:
+    """
+    Fan-out of price ticks to live subscribers
+
+    Every subscriber owns a bounded queue. ``publish`` is synchronous and
+    never waits: the tick is serialized once and put on each queue without
+    blocking. A subscriber whose queue is full has fallen behind; it is
+    dropped, its queue is emptied and a ``None`` sentinel tells its reader
+    to disconnect, so one slow client can never delay a tick.
+
+    Messages carry only the stocks that changed in the tick::
+
+        {"type": "tick", "version": 42, "timestamp": "...", "prices": {"1": "150.25"}}
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber and return the queue its messages arrive on"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(
+        self, prices: dict[int, Decimal], timestamp: datetime, version: int
+    ) -> Optional[StreamMessage]:
+        """
+        Send the changed prices of a committed tick to every subscriber
+
+        Args:
+            prices: New price per stock id
+            timestamp: Tick time
+            version: Price tick version after the tick
+        """
+        if not self._subscribers:
+            return None
+
+        text = json.dumps(
+            {
+                "type": "tick",
+                "version": version,
+                "timestamp": timestamp.isoformat(),
+                "prices": {str(stock_id): str(price) for stock_id, price in prices.items()},
+            },
+            separators=(",", ":"),
+        )
+        message = StreamMessage(
+            version=version, text=text, sse=f"id: {version}\nevent: tick\ndata: {text}\n\n"
+        )
+
+        slow = []
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                slow.append(queue)
+
+        for queue in slow:
+            self._drop(queue)
+
+        self.published += 1
+        return message
+
+    def _drop(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+        self.dropped += 1
+        logger.warning("Dropped a price stream subscriber that fell behind")
+
+    def get_metrics(self) -> dict:
+        """Subscriber count and publish/drop counters"""
+        return {
+            "subscribers": len(self._subscribers),
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+# Singleton instance
+price_broadcaster = PriceBroadcaster(queue_size=settings.PRICE_STREAM_QUEUE_SIZE)
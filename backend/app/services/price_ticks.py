@@ -0,0 +1,64 @@
+"""
+Price Tick Service
+Process-wide counter advanced after every committed stock price update
+"""
+
+import asyncio
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PriceTickVersion:
+    """
+    Monotonic price tick counter
+
+    Anything derived from stock prices (portfolio valuations, price history
+    views) can be cached under the current tick version; the price updater
+    bumps it after each committed tick, so stale entries are never looked
+    up again. Like user trade versions it is process-local.
+
+    Coroutines can also park until the next tick with ``wait``; each waiter
+    is a future created on the running loop and resolved by the next bump.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._waiters: set[asyncio.Future] = set()
+
+    def bump(self) -> int:
+        """Advance the tick version, wake every waiter and return the new value"""
+        self.version += 1
+        waiters, self._waiters = self._waiters, set()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(self.version)
+        return self.version
+
+    async def wait(self, after: int, timeout: float) -> int:
+        """
+        Wait until the version moves past ``after`` or ``timeout`` seconds pass
+
+        Returns:
+            The current version (still ``after`` on timeout)
+        """
+        if self.version != after:
+            return self.version
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+        return self.version
+
+    def waiting(self) -> int:
+        """Number of coroutines parked in ``wait``"""
+        return len(self._waiters)
+
+
+# Singleton instance
+price_ticks = PriceTickVersion()
@@ -0,0 +1,195 @@
+"""
+Risk Metrics Service
+Volatility, beta, drawdown and historical VaR of holdings, vectorized over all held stocks
+"""
+
+import asyncio
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from decimal import Decimal
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Stock, Wallet
+from app.schemas.portfolio import HoldingRisk, PortfolioRiskResponse
+from app.services.portfolio_history import RANGE_HOURS, price_matrix
+from app.services.price_ticks import price_ticks
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Returns are hourly; the market trades around the clock
+PERIODS_PER_YEAR = 24 * 365
+VAR_CONFIDENCE = 0.95
+
+
+def _ratio(value: float) -> float:
+    return round(float(value), 6)
+
+
+class RiskAnalyzer:
+    """
+    Risk metrics computed from hourly StockPriceHistory returns
+
+    Prices are sampled on an hourly grid ending at the last full hour.
+    Each stock's price and return columns are cached under
+    ``(stock_id, range, price_tick_version, grid_end)``, so every user
+    holding a stock shares one load until the next tick or the next hour.
+    Misses for a request are loaded together in one pass, outside the
+    cache lock; two requests missing the same column may both load it.
+
+    Per request, the held stocks' columns form a ``T x k`` return matrix.
+    All metrics come from matrix operations on it, with no per-holding
+    loop:
+
+    - volatility: annualized standard deviation of returns
+    - beta: covariance with the equal-weight index of all stocks over the
+      index variance
+    - max drawdown: worst fall from a running peak
+    - VaR: one-hour historical value at risk at 95%
+
+    Portfolio figures weight the holdings by current market value.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._columns: OrderedDict[tuple, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def _market_columns(
+        self, db: AsyncSession, stock_ids: list[int], time_range: str
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ``(T+1) x k`` price and ``T x k`` return matrices of ``stock_ids``"""
+        hours = RANGE_HOURS[time_range]
+        grid_end = datetime.now().replace(minute=0, second=0, microsecond=0)
+        version = price_ticks.version
+        keys = [(stock_id, time_range, version, grid_end) for stock_id in stock_ids]
+
+        # The lock only guards the shared cache; the load runs outside it so
+        # concurrent requests never queue behind each other's queries
+        found: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        async with self._lock:
+            for stock_id, key in zip(stock_ids, keys):
+                if key in self._columns:
+                    self._columns.move_to_end(key)
+                    found[stock_id] = self._columns[key]
+        missing = [stock_id for stock_id in stock_ids if stock_id not in found]
+        self.misses += len(missing)
+        self.hits += len(stock_ids) - len(missing)
+
+        if missing:
+            grid = np.datetime64(grid_end, "us") - np.arange(hours, -1, -1) * np.timedelta64(1, "h")
+            prices = await price_matrix(db, missing, grid, grid_end - timedelta(hours=hours))
+            returns = prices[1:] / prices[:-1] - 1
+            loaded = {stock_id: (prices[:, i], returns[:, i]) for i, stock_id in enumerate(missing)}
+            found.update(loaded)
+
+            async with self._lock:
+                for stock_id, column in loaded.items():
+                    self._columns[(stock_id, time_range, version, grid_end)] = column
+                while len(self._columns) > self.max_entries:
+                    self._columns.popitem(last=False)
+
+        columns = [found[stock_id] for stock_id in stock_ids]
+
+        return (np.column_stack([p for p, _ in columns]), np.column_stack([r for _, r in columns]))
+
+    async def analyze(
+        self, db: AsyncSession, user_id: int, time_range: str
+    ) -> PortfolioRiskResponse:
+        """
+        Compute the risk metrics of a user's current holdings
+
+        Args:
+            db: Session to read with
+            user_id: User whose holdings are analyzed
+            time_range: Lookback window, ``7d`` or ``30d``
+        """
+        holdings_result = await db.execute(
+            select(Wallet.stock_id, Wallet.quantity, Stock.symbol, Stock.current_price)
+            .join(Stock, Wallet.stock_id == Stock.id)
+            .where(Wallet.user_id == user_id, Wallet.quantity > 0)
+            .order_by(Wallet.stock_id)
+        )
+        holdings = holdings_result.all()
+
+        if not holdings:
+            return PortfolioRiskResponse(
+                user_id=user_id,
+                range=time_range,
+                confidence=VAR_CONFIDENCE,
+                observations=0,
+                portfolio_value=Decimal("0.00"),
+                volatility=0.0,
+                beta=0.0,
+                max_drawdown=0.0,
+                value_at_risk=0.0,
+                value_at_risk_amount=Decimal("0.00"),
+                holdings=[],
+            )
+
+        all_result = await db.execute(select(Stock.id).order_by(Stock.id))
+        all_ids = list(all_result.scalars().all())
+        held_ids = [h.stock_id for h in holdings]
+
+        all_prices, all_returns = await self._market_columns(db, all_ids, time_range)
+        column = {stock_id: i for i, stock_id in enumerate(all_ids)}
+        held = [column[stock_id] for stock_id in held_ids]
+        prices, returns = all_prices[:, held], all_returns[:, held]
+        index = all_returns.mean(axis=1)
+
+        quantities = np.array([float(h.quantity) for h in holdings])
+        values = quantities * np.array([float(h.current_price) for h in holdings])
+        total = values.sum()
+        weights = values / total
+
+        # Per holding, all columns at once
+        centered = returns - returns.mean(axis=0)
+        index_centered = index - index.mean()
+        index_variance = index_centered @ index_centered
+        betas = (
+            centered.T @ index_centered / index_variance
+            if index_variance > 0
+            else np.zeros(len(holdings))
+        )
+        volatility = returns.std(axis=0, ddof=1) * math.sqrt(PERIODS_PER_YEAR)
+        drawdown = (prices / np.maximum.accumulate(prices, axis=0) - 1).min(axis=0)
+        var = -np.percentile(returns, (1 - VAR_CONFIDENCE) * 100, axis=0)
+
+        # Portfolio: value-weighted returns and the value path of current quantities
+        portfolio_returns = returns @ weights
+        portfolio_path = prices @ quantities
+        portfolio_var = -np.percentile(portfolio_returns, (1 - VAR_CONFIDENCE) * 100)
+
+        return PortfolioRiskResponse(
+            user_id=user_id,
+            range=time_range,
+            confidence=VAR_CONFIDENCE,
+            observations=len(returns),
+            portfolio_value=Decimal(f"{total:.2f}"),
+            volatility=_ratio(portfolio_returns.std(ddof=1) * math.sqrt(PERIODS_PER_YEAR)),
+            beta=_ratio(weights @ betas),
+            max_drawdown=_ratio((portfolio_path / np.maximum.accumulate(portfolio_path) - 1).min()),
+            value_at_risk=_ratio(portfolio_var),
+            value_at_risk_amount=Decimal(f"{portfolio_var * total:.2f}"),
+            holdings=[
+                HoldingRisk(
+                    stock_id=h.stock_id,
+                    stock_symbol=h.symbol,
+                    weight=_ratio(weights[i]),
+                    volatility=_ratio(volatility[i]),
+                    beta=_ratio(betas[i]),
+                    max_drawdown=_ratio(drawdown[i]),
+                    value_at_risk=_ratio(var[i]),
+                )
+                for i, h in enumerate(holdings)
+            ],
+        )
+
+
+# Singleton instance
+risk_analyzer = RiskAnalyzer()
@@ -6,6 +6,7 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 
+from app.services.idempotency import DatabaseIdempotencyStore, idempotency_store
 from app.services.stock_price_updater import stock_price_updater
 from app.utils.logger import setup_logger
 
@@ -36,6 +37,17 @@ class BackgroundScheduler:
             max_instances=1  # Prevent overlapping runs
         )
 
+        # Expire stored idempotency keys hourly (the in-memory store evicts on its own)
+        if isinstance(idempotency_store, DatabaseIdempotencyStore):
+            self.scheduler.add_job(
+                func=idempotency_store.purge_expired,
+                trigger=IntervalTrigger(hours=1),
+                id='purge_idempotency_keys',
+                name='Purge expired idempotency keys',
+                replace_existing=True,
+                max_instances=1
+            )
+
         self.scheduler.start()
         self.is_running = True
 
@@ -10,10 +10,21 @@ from sqlalchemy import select
 
 from app.db.database import AsyncSessionLocal
 from app.db.models import Stock, StockPriceHistory
+from app.services.candles import candle_rollup
+from app.services.leaderboard import leaderboard
+from app.services.order_matcher import order_matcher
+from app.services.portfolio_snapshots import portfolio_snapshot_writer
+from app.services.price_cache import price_cache
+from app.services.price_changes import price_change_log
+from app.services.price_stream import price_broadcaster
+from app.services.price_ticks import price_ticks
+from app.utils.fixed_point import to_cents, from_cents
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+MIN_PRICE_CENTS = 100
+
 
 class StockPriceUpdater:
     """Service to update stock prices with random fluctuations"""
@@ -23,6 +34,11 @@ class StockPriceUpdater:
         self.max_change_percent = 10   # +10%
         logger.info("StockPriceUpdater initialized")
 
+    @staticmethod
+    def _next_price_cents(old_price: Decimal, change_percent: float) -> int:
+        """Apply a percentage change on integer cents, rounding half-even, floored at $1.00"""
+        return max(round(to_cents(old_price) * (1 + change_percent / 100)), MIN_PRICE_CENTS)
+
     async def update_all_stock_prices(self):
         """
         Update all stock prices with random fluctuation
@@ -33,6 +49,12 @@ class StockPriceUpdater:
         - Ensure price doesn't go below minimum threshold ($1.00)
         - Store new price in stock table
         - Record price in history table
+        - Extend the current OHLC candles
+        - Refresh the in-memory quotes and recent history
+        - Append the changed prices to the change log
+        - Push the new prices to live stream subscribers
+        - Fill limit orders crossed by the new prices
+        - Snapshot every holder's portfolio in the background
         """
         try:
             async with AsyncSessionLocal() as session:
@@ -45,6 +67,8 @@ class StockPriceUpdater:
                     return
 
                 updated_count = 0
+                new_prices = {}
+                history = []
 
                 for stock in stocks:
                     old_price = stock.current_price
@@ -55,15 +79,8 @@ class StockPriceUpdater:
                         self.max_change_percent
                     )
 
-                    # Calculate new price
-                    change_multiplier = Decimal(1 + (change_percent / 100))
-                    new_price = old_price * change_multiplier
-
-                    # Ensure minimum price of $1.00
-                    new_price = max(new_price, Decimal("1.00"))
-
-                    # Round to 2 decimal places
-                    new_price = new_price.quantize(Decimal('0.01'))
+                    # Calculate new price in integer cents (minimum $1.00)
+                    new_price = from_cents(self._next_price_cents(old_price, change_percent))
 
                     # Update stock price
                     stock.current_price = new_price
@@ -76,6 +93,8 @@ class StockPriceUpdater:
                         timestamp=datetime.now()
                     )
                     session.add(price_history)
+                    new_prices[stock.id] = new_price
+                    history.append(price_history)
 
                     updated_count += 1
 
@@ -85,14 +104,25 @@ class StockPriceUpdater:
                         f"({change_direction} {abs(change_percent):.2f}%)"
                     )
 
+                await candle_rollup.record(session, [(h.stock_id, h.price, h.timestamp) for h in history])
+
                 # Commit all changes
                 await session.commit()
+                version = price_ticks.bump()
+                price_change_log.record(version, new_prices)
+                price_cache.record_tick(stocks, history)
+                leaderboard.update_prices(new_prices)
+                tick_time = datetime.now()
+                price_broadcaster.publish(new_prices, tick_time, version)
 
                 logger.info(
                     f"Successfully updated {updated_count} stock prices at "
-                    f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                    f"{tick_time.strftime('%Y-%m-%d %H:%M:%S')}"
                 )
 
+            await order_matcher.match_orders(new_prices)
+            portfolio_snapshot_writer.schedule(tick_time)
+
         except Exception as e:
             logger.error(f"Error updating stock prices: {str(e)}")
             raise
@@ -123,9 +153,7 @@ class StockPriceUpdater:
                     self.max_change_percent
                 )
 
-                change_multiplier = Decimal(1 + (change_percent / 100))
-                new_price = max(old_price * change_multiplier, Decimal("1.00"))
-                new_price = new_price.quantize(Decimal('0.01'))
+                new_price = from_cents(self._next_price_cents(old_price, change_percent))
 
                 stock.current_price = new_price
                 stock.updated_at = datetime.now()
@@ -137,14 +165,22 @@ class StockPriceUpdater:
                     timestamp=datetime.now()
                 )
                 session.add(price_history)
+                await candle_rollup.record(session, [(stock.id, new_price, price_history.timestamp)])
 
                 await session.commit()
+                version = price_ticks.bump()
+                price_change_log.record(version, {stock_id: new_price})
+                price_cache.record_tick([stock], [price_history])
+                leaderboard.update_prices({stock_id: new_price})
+                price_broadcaster.publish({stock_id: new_price}, stock.updated_at, version)
 
                 logger.info(
                     f"Updated {stock.symbol}: ${old_price} → ${new_price} "
                     f"({change_percent:+.2f}%)"
                 )
 
+            await order_matcher.match_orders({stock_id: new_price})
+
         except Exception as e:
             logger.error(f"Error updating stock {stock_id}: {str(e)}")
             raise
@@ -0,0 +1,528 @@
+"""
+Trade Execution Service
+Executes market buy/sell orders as conditional UPDATE / upsert statements
+"""
+
+from decimal import Decimal
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, insert, func, bindparam, case, type_coerce
+
+from app.db.database import dialect_insert
+from app.db.models import User, Stock, Transaction, Wallet, TransactionType
+from app.schemas.transaction import (
+    TransactionResponse,
+    TransactionTypeEnum,
+    BatchTransactionLeg,
+    BatchLegResult,
+)
+from app.utils.fixed_point import (
+    Cents,
+    MicroUnits,
+    QUANTITY_SCALE,
+    to_cents,
+    from_cents,
+    to_micros,
+    from_micros,
+    div_round,
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+QUANTITY_STEP = Decimal("0.000001")
+MONEY_STEP = Decimal("0.01")
+
+
+def _money(expression):
+    """
+    Round a SQL money expression to the column scale
+
+    SQLite evaluates NUMERIC arithmetic in floating point, so every
+    computed balance, cost and quantity (and every guard comparing one) is
+    rounded back to its scale; on PostgreSQL this is a no-op.
+    """
+    return func.round(expression, 2, type_=User.balance.type)
+
+
+def _quantity(expression):
+    """Round a SQL stock quantity expression to the column scale (see ``_money``)"""
+    return func.round(expression, 6, type_=Wallet.quantity.type)
+
+
+def _wallet_upsert(db: AsyncSession):
+    """
+    INSERT ... ON CONFLICT for wallets taking quantity and cost deltas
+
+    New rows are inserted as given; existing rows add the deltas and
+    re-derive the average buy price from the new totals.
+    """
+    table = Wallet.__table__
+    upsert = dialect_insert(db)(table)
+    new_quantity = _quantity(table.c.quantity + upsert.excluded.quantity)
+    new_cost = _money(table.c.total_cost + upsert.excluded.total_cost)
+    return upsert.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.stock_id],
+        set_={
+            "quantity": new_quantity,
+            "total_cost": new_cost,
+            "avg_buy_price": case(
+                (new_quantity > 0, new_cost / new_quantity), else_=table.c.avg_buy_price
+            ),
+            "updated_at": func.now(),
+        },
+    )
+
+
+def _released_cost(cost: int, quantity: int, held: int) -> int:
+    """
+    Cost basis in cents released by selling ``quantity`` of ``held`` micro-units
+
+    Average cost method: the sold share of the total cost, rounded half-up
+    like the SQL ``ROUND`` that ``sell`` applies to the same formula, so
+    single and batch sells leave identical cost bases.
+    """
+    return (2 * quantity * cost + held) // (2 * held)
+
+
+def _average(cost: Decimal, quantity: Decimal, fallback: Decimal) -> Decimal:
+    return (cost / quantity).quantize(QUANTITY_STEP) if quantity > 0 else fallback
+
+
+class TradeExecutor:
+    """
+    Service executing market orders against the current stock price
+
+    The balance check and debit (and the wallet check and decrement on
+    sells) are a single conditional UPDATE, so the database row lock is
+    what serializes concurrent trades - there is no read-modify-write in
+    Python that could lose an update. Callers own the session and decide
+    whether to commit or roll back.
+    """
+
+    def __init__(self):
+        logger.info("TradeExecutor initialized")
+
+    async def _get_stock(self, db: AsyncSession, stock_id: int):
+        result = await db.execute(
+            select(Stock.id, Stock.symbol, Stock.current_price).where(Stock.id == stock_id)
+        )
+        return result.one_or_none()
+
+    async def _raise_user_not_found_if_missing(self, db: AsyncSession, user_id: int):
+        result = await db.execute(select(User.id).where(User.id == user_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id {user_id} not found"
+            )
+
+    async def _raise_stock_not_found(self, db: AsyncSession, user_id: int, stock_id: int):
+        # Unknown users are reported before unknown stocks
+        await self._raise_user_not_found_if_missing(db, user_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Stock with id {stock_id} not found"
+        )
+
+    async def buy(
+        self, db: AsyncSession, user_id: int, stock_id: int, amount: Decimal
+    ) -> TransactionResponse:
+        """
+        Buy stock for a cash amount
+
+        Args:
+            db: Session the trade runs in (not committed here)
+            user_id: ID of the buying user
+            stock_id: ID of the stock to buy
+            amount: Cash amount to spend
+
+        Raises:
+            HTTPException: 404 for unknown user/stock, 400 on insufficient balance
+        """
+        stock = await self._get_stock(db, stock_id)
+        if stock is None:
+            await self._raise_stock_not_found(db, user_id, stock_id)
+
+        quantity = (amount / stock.current_price).quantize(QUANTITY_STEP)
+
+        # Check-and-debit in one statement
+        balance_result = await db.execute(
+            update(User)
+            .where(User.id == user_id, _money(User.balance - amount) >= 0)
+            .values(balance=_money(User.balance - amount))
+            .returning(User.balance)
+        )
+        new_balance = balance_result.scalar_one_or_none()
+
+        if new_balance is None:
+            user_result = await db.execute(select(User.balance).where(User.id == user_id))
+            balance = user_result.scalar_one_or_none()
+            if balance is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"User with id {user_id} not found",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient balance. Available: ${balance}, Required: ${amount}",
+            )
+
+        # Credit the wallet and its cost basis, creating it on first purchase
+        await db.execute(
+            _wallet_upsert(db),
+            {
+                "user_id": user_id,
+                "stock_id": stock_id,
+                "quantity": quantity,
+                "total_cost": amount,
+                "avg_buy_price": _average(amount, quantity, stock.current_price),
+            },
+        )
+
+        transaction_result = await db.execute(
+            insert(Transaction)
+            .values(
+                user_id=user_id,
+                stock_id=stock_id,
+                type=TransactionType.BUY,
+                amount=amount,
+                quantity=quantity,
+                price_per_unit=stock.current_price,
+            )
+            .returning(Transaction.id)
+        )
+        transaction_id = transaction_result.scalar_one()
+
+        logger.info(f"User {user_id} bought {quantity} shares of {stock.symbol} " f"for ${amount}")
+
+        return TransactionResponse(
+            transaction_id=transaction_id,
+            status="success",
+            message=f"Successfully bought {quantity} shares of {stock.symbol}",
+            quantity=quantity,
+            new_balance=new_balance,
+        )
+
+    async def sell(
+        self, db: AsyncSession, user_id: int, stock_id: int, quantity: Decimal
+    ) -> TransactionResponse:
+        """
+        Sell a quantity of stock from the user's wallet
+
+        Args:
+            db: Session the trade runs in (not committed here)
+            user_id: ID of the selling user
+            stock_id: ID of the stock to sell
+            quantity: Quantity of stock to sell
+
+        Raises:
+            HTTPException: 404 for unknown user/stock, 400 on insufficient quantity
+        """
+        stock = await self._get_stock(db, stock_id)
+        if stock is None:
+            await self._raise_stock_not_found(db, user_id, stock_id)
+
+        proceeds = (quantity * stock.current_price).quantize(MONEY_STEP)
+
+        # Check-and-decrement in one statement; the cost basis shrinks by the
+        # sold share of it (see _released_cost) and the average is re-derived
+        new_quantity = _quantity(Wallet.quantity - quantity)
+        new_cost = _money(
+            Wallet.total_cost - _money(Wallet.total_cost * quantity / Wallet.quantity)
+        )
+        wallet_result = await db.execute(
+            update(Wallet)
+            .where(
+                Wallet.user_id == user_id,
+                Wallet.stock_id == stock_id,
+                new_quantity >= 0,
+            )
+            .values(
+                quantity=new_quantity,
+                total_cost=new_cost,
+                avg_buy_price=case(
+                    (new_quantity > 0, new_cost / new_quantity), else_=Wallet.avg_buy_price
+                ),
+            )
+            .returning(Wallet.id, Wallet.quantity)
+        )
+        wallet = wallet_result.one_or_none()
+
+        if wallet is None:
+            await self._raise_user_not_found_if_missing(db, user_id)
+            available_result = await db.execute(
+                select(Wallet.quantity).where(
+                    Wallet.user_id == user_id, Wallet.stock_id == stock_id
+                )
+            )
+            available = available_result.scalar_one_or_none() or Decimal("0")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient stock quantity. Available: {available}, Required: {quantity}",
+            )
+
+        # Drop emptied wallet entries
+        if wallet.quantity == 0:
+            await db.execute(delete(Wallet).where(Wallet.id == wallet.id, Wallet.quantity == 0))
+
+        balance_result = await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(balance=_money(User.balance + proceeds))
+            .returning(User.balance)
+        )
+        new_balance = balance_result.scalar_one()
+
+        transaction_result = await db.execute(
+            insert(Transaction)
+            .values(
+                user_id=user_id,
+                stock_id=stock_id,
+                type=TransactionType.SELL,
+                amount=proceeds,
+                quantity=quantity,
+                price_per_unit=stock.current_price,
+            )
+            .returning(Transaction.id)
+        )
+        transaction_id = transaction_result.scalar_one()
+
+        logger.info(f"User {user_id} sold {quantity} shares of {stock.symbol} " f"for ${proceeds}")
+
+        return TransactionResponse(
+            transaction_id=transaction_id,
+            status="success",
+            message=f"Successfully sold {quantity} shares of {stock.symbol}",
+            quantity=quantity,
+            new_balance=new_balance,
+            proceeds=proceeds,
+        )
+
+    async def execute_batch(
+        self, db: AsyncSession, legs: list[BatchTransactionLeg], atomic: bool = True
+    ) -> list[BatchLegResult]:
+        """
+        Execute many buy/sell legs in the caller's transaction
+
+        All users, stocks and wallets touched by the batch are loaded with
+        three set-based queries (users and wallets locked FOR UPDATE on
+        PostgreSQL), legs are applied in order against that snapshot, and
+        the outcome is written back with one bulk insert and executemany
+        delta updates.
+
+        Args:
+            db: Session the batch runs in (not committed here)
+            legs: Legs in execution order
+            atomic: When True nothing is written if any leg fails;
+                when False failing legs are skipped
+
+        Returns:
+            One result per leg, in request order
+        """
+        user_ids = sorted({leg.user_id for leg in legs})
+        stock_ids = sorted({leg.stock_id for leg in legs})
+
+        # Everything below runs on fixed-point integers: balances and costs
+        # in cents, quantities in micro-units, converted at the DB boundary
+        users_result = await db.execute(
+            select(User.id, type_coerce(User.balance, Cents).label("balance"))
+            .where(User.id.in_(user_ids))
+            .order_by(User.id)
+            .with_for_update()
+        )
+        balances = {row.id: row.balance for row in users_result}
+
+        stocks_result = await db.execute(
+            select(
+                Stock.id, Stock.symbol, type_coerce(Stock.current_price, Cents).label("price")
+            ).where(Stock.id.in_(stock_ids))
+        )
+        stocks = {row.id: row for row in stocks_result}
+
+        wallets_result = await db.execute(
+            select(
+                Wallet.user_id,
+                Wallet.stock_id,
+                type_coerce(Wallet.quantity, MicroUnits).label("quantity"),
+                type_coerce(Wallet.total_cost, Cents).label("total_cost"),
+            )
+            .where(Wallet.user_id.in_(user_ids), Wallet.stock_id.in_(stock_ids))
+            .order_by(Wallet.id)
+            .with_for_update()
+        )
+        holdings: dict[tuple[int, int], int] = {}
+        costs: dict[tuple[int, int], int] = {}
+        for row in wallets_result:
+            holdings[(row.user_id, row.stock_id)] = row.quantity
+            costs[(row.user_id, row.stock_id)] = row.total_cost
+
+        results: list[BatchLegResult] = []
+        transaction_rows = []
+        balance_deltas: dict[int, int] = {}
+        quantity_deltas: dict[tuple[int, int], int] = {}
+        cost_deltas: dict[tuple[int, int], int] = {}
+
+        for index, leg in enumerate(legs):
+            if leg.user_id not in balances:
+                results.append(
+                    BatchLegResult(
+                        index=index,
+                        status="failed",
+                        error_code=status.HTTP_404_NOT_FOUND,
+                        error=f"User with id {leg.user_id} not found",
+                    )
+                )
+                continue
+
+            stock = stocks.get(leg.stock_id)
+            if stock is None:
+                results.append(
+                    BatchLegResult(
+                        index=index,
+                        status="failed",
+                        error_code=status.HTTP_404_NOT_FOUND,
+                        error=f"Stock with id {leg.stock_id} not found",
+                    )
+                )
+                continue
+
+            key = (leg.user_id, leg.stock_id)
+            balance = balances[leg.user_id]
+            held = holdings.get(key, 0)
+            cost = costs.get(key, 0)
+
+            if leg.type == TransactionTypeEnum.BUY:
+                amount = to_cents(leg.amount)
+                if balance < amount:
+                    results.append(
+                        BatchLegResult(
+                            index=index,
+                            status="failed",
+                            stock_symbol=stock.symbol,
+                            error_code=status.HTTP_400_BAD_REQUEST,
+                            error=f"Insufficient balance. Available: ${from_cents(balance)}, Required: ${leg.amount}",
+                        )
+                    )
+                    continue
+                quantity = div_round(amount * QUANTITY_SCALE, stock.price)
+                cash, proceeds = -amount, None
+                cost_change = amount
+                holdings[key] = held + quantity
+                quantity_deltas[key] = quantity_deltas.get(key, 0) + quantity
+            else:
+                quantity = to_micros(leg.quantity)
+                if held < quantity:
+                    results.append(
+                        BatchLegResult(
+                            index=index,
+                            status="failed",
+                            stock_symbol=stock.symbol,
+                            error_code=status.HTTP_400_BAD_REQUEST,
+                            error=f"Insufficient stock quantity. Available: {from_micros(held)}, Required: {leg.quantity}",
+                        )
+                    )
+                    continue
+                amount = proceeds = div_round(quantity * stock.price, QUANTITY_SCALE)
+                cash = proceeds
+                cost_change = -_released_cost(cost, quantity, held)
+                holdings[key] = held - quantity
+                quantity_deltas[key] = quantity_deltas.get(key, 0) - quantity
+
+            costs[key] = cost + cost_change
+            cost_deltas[key] = cost_deltas.get(key, 0) + cost_change
+
+            balances[leg.user_id] = balance + cash
+            balance_deltas[leg.user_id] = balance_deltas.get(leg.user_id, 0) + cash
+
+            transaction_rows.append(
+                {
+                    "user_id": leg.user_id,
+                    "stock_id": leg.stock_id,
+                    "type": TransactionType(leg.type.value),
+                    "amount": from_cents(amount),
+                    "quantity": from_micros(quantity),
+                    "price_per_unit": from_cents(stock.price),
+                }
+            )
+            results.append(
+                BatchLegResult(
+                    index=index,
+                    status="success",
+                    stock_symbol=stock.symbol,
+                    quantity=from_micros(quantity),
+                    new_balance=from_cents(balances[leg.user_id]),
+                    proceeds=None if proceeds is None else from_cents(proceeds),
+                )
+            )
+
+        if atomic and any(r.status == "failed" for r in results):
+            for r in results:
+                if r.status == "success":
+                    r.status = "rolled_back"
+                    r.quantity = r.new_balance = r.proceeds = None
+            return results
+
+        if not transaction_rows:
+            return results
+
+        # Balances: one executemany of relative updates
+        await db.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == bindparam("b_user_id"))
+            .values(balance=_money(User.__table__.c.balance + bindparam("b_delta", type_=Cents))),
+            [{"b_user_id": uid, "b_delta": delta} for uid, delta in balance_deltas.items()],
+        )
+
+        # Wallets: one executemany upsert of net quantity and cost deltas
+        wallet_rows = [
+            {
+                "user_id": key[0],
+                "stock_id": key[1],
+                "quantity": from_micros(delta),
+                "total_cost": from_cents(cost_deltas[key]),
+                "avg_buy_price": _average(
+                    from_cents(costs[key]), from_micros(holdings[key]), Decimal("0")
+                ),
+            }
+            for key, delta in quantity_deltas.items()
+            if delta != 0 or cost_deltas[key] != 0
+        ]
+        if wallet_rows:
+            await db.execute(_wallet_upsert(db), wallet_rows)
+
+        emptied = [
+            {"e_user_id": uid, "e_stock_id": sid}
+            for (uid, sid) in quantity_deltas
+            if holdings[(uid, sid)] == 0
+        ]
+        if emptied:
+            await db.execute(
+                delete(Wallet.__table__).where(
+                    Wallet.__table__.c.user_id == bindparam("e_user_id"),
+                    Wallet.__table__.c.stock_id == bindparam("e_stock_id"),
+                    Wallet.__table__.c.quantity == 0,
+                ),
+                emptied,
+            )
+
+        # Transactions: one bulk insert, ids returned in parameter order
+        inserted = await db.execute(
+            insert(Transaction.__table__).returning(
+                Transaction.__table__.c.id, sort_by_parameter_order=True
+            ),
+            transaction_rows,
+        )
+        transaction_ids = iter(inserted.scalars().all())
+        for r in results:
+            if r.status == "success":
+                r.transaction_id = next(transaction_ids)
+
+        logger.info(
+            f"Executed batch of {len(legs)} legs: {len(transaction_rows)} filled, "
+            f"{len(legs) - len(transaction_rows)} failed"
+        )
+
+        return results
+
+
+# Singleton instance
+trade_executor = TradeExecutor()
@@ -0,0 +1,206 @@
+"""
+Trade Journal Service
+Group-commits queued trades in micro-batches from a single writer coroutine
+"""
+
+import asyncio
+from decimal import Decimal
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import get_settings
+from app.db.database import AsyncSessionLocal
+from app.schemas.transaction import (
+    BatchLegResult,
+    BatchTransactionLeg,
+    TransactionResponse,
+    TransactionTypeEnum,
+)
+from app.services.trade_executor import trade_executor
+from app.services.trade_locks import trade_locks
+from app.services.trade_versions import user_trade_versions
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(__name__)
+
+
+class TradeJournal:
+    """
+    Write-behind trade journal
+
+    Callers enqueue a trade and await a future. A single writer coroutine
+    collects queued trades until ``max_batch`` are waiting or
+    ``flush_interval_ms`` has passed since the first one, applies them with
+    the batch trade path in one transaction and resolves every caller's
+    future only after that transaction has committed. N concurrent trades
+    therefore cost one commit (one fsync on PostgreSQL, one write lock on
+    SQLite) instead of N.
+
+    Each trade is still validated individually; a failing trade fails only
+    its own caller.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        flush_interval_ms: int = 5,
+        max_batch: int = 200,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+    ):
+        self.enabled = enabled
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.batches_flushed = 0
+        self.trades_flushed = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    async def start(self):
+        """Start the writer coroutine on the running event loop"""
+        if self.is_running:
+            logger.warning("Trade journal is already running")
+            return
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._run(), name="trade-journal-writer")
+        logger.info(
+            f"Trade journal started (flush every {self.flush_interval * 1000:.0f} ms "
+            f"or {self.max_batch} trades)"
+        )
+
+    async def shutdown(self):
+        """Flush everything still queued, then stop the writer"""
+        if not self.is_running:
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        logger.info(
+            f"Trade journal stopped after {self.trades_flushed} trades "
+            f"in {self.batches_flushed} batches"
+        )
+
+    async def submit(self, leg: BatchTransactionLeg) -> BatchLegResult:
+        """Queue a trade and wait until its batch is durable"""
+        if not self.is_running:
+            raise RuntimeError("Trade journal is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((leg, future))
+        return await future
+
+    async def buy(self, user_id: int, stock_id: int, amount: Decimal) -> TransactionResponse:
+        """Journal a market buy (see TradeExecutor.buy)"""
+        result = await self.submit(
+            BatchTransactionLeg(
+                type=TransactionTypeEnum.BUY, user_id=user_id, stock_id=stock_id, amount=amount
+            )
+        )
+        self._raise_if_failed(result)
+        return TransactionResponse(
+            transaction_id=result.transaction_id,
+            status="success",
+            message=f"Successfully bought {result.quantity} shares of {result.stock_symbol}",
+            quantity=result.quantity,
+            new_balance=result.new_balance,
+        )
+
+    async def sell(self, user_id: int, stock_id: int, quantity: Decimal) -> TransactionResponse:
+        """Journal a market sell (see TradeExecutor.sell)"""
+        result = await self.submit(
+            BatchTransactionLeg(
+                type=TransactionTypeEnum.SELL, user_id=user_id, stock_id=stock_id, quantity=quantity
+            )
+        )
+        self._raise_if_failed(result)
+        return TransactionResponse(
+            transaction_id=result.transaction_id,
+            status="success",
+            message=f"Successfully sold {result.quantity} shares of {result.stock_symbol}",
+            quantity=result.quantity,
+            new_balance=result.new_balance,
+            proceeds=result.proceeds,
+        )
+
+    @staticmethod
+    def _raise_if_failed(result: BatchLegResult):
+        if result.status != "success":
+            raise HTTPException(
+                status_code=result.error_code or status.HTTP_400_BAD_REQUEST, detail=result.error
+            )
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[tuple[BatchTransactionLeg, asyncio.Future]]):
+        legs = [leg for leg, _ in batch]
+        try:
+            async with self.session_factory() as session:
+                async with trade_locks.hold(session, *(leg.user_id for leg in legs)):
+                    results = await trade_executor.execute_batch(session, legs, atomic=False)
+                    await session.commit()
+        except Exception as e:
+            logger.error(f"Error flushing trade journal batch of {len(batch)}: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_flushed += 1
+        self.trades_flushed += len(batch)
+        user_trade_versions.bump(
+            *(leg.user_id for leg, result in zip(legs, results) if result.status == "success")
+        )
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def create_trade_journal() -> TradeJournal:
+    """Build the journal configured by the TRADE_JOURNAL_* settings"""
+    enabled = settings.TRADE_JOURNAL_ENABLED
+    if enabled and settings.IDEMPOTENCY_BACKEND == "database":
+        # The database idempotency store must commit its key row together
+        # with the trade, which a separately committed journal batch cannot do
+        logger.warning("Trade journal disabled: incompatible with IDEMPOTENCY_BACKEND=database")
+        enabled = False
+    return TradeJournal(
+        enabled=enabled,
+        flush_interval_ms=settings.TRADE_JOURNAL_FLUSH_MS,
+        max_batch=settings.TRADE_JOURNAL_MAX_BATCH,
+    )
+
+
+# Singleton instance
+trade_journal = create_trade_journal()
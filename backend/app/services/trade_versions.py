@@ -0,0 +1,46 @@
+"""
+Trade Version Service
+Per-user counters bumped after every committed trade, used as cache keys
+"""
+
+from typing import Callable
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class UserTradeVersions:
+    """
+    Monotonic per-user trade counters
+
+    Anything derived from a user's trades (transaction counts, portfolio
+    valuations) can be cached under the user's current version; a trade
+    bumps the version, so stale entries are simply never looked up again.
+    Versions are process-local and must be bumped after the trade commits.
+    """
+
+    def __init__(self):
+        self._versions: dict[int, int] = {}
+        self._listeners: list[Callable[[set[int]], None]] = []
+
+    def get(self, user_id: int) -> int:
+        """Return the current trade version of a user"""
+        return self._versions.get(user_id, 0)
+
+    def bump(self, *user_ids: int):
+        """Advance the trade version of every given user"""
+        changed = set(user_ids)
+        for user_id in changed:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        if changed:
+            for listener in self._listeners:
+                listener(changed)
+
+    def add_listener(self, listener: Callable[[set[int]], None]):
+        """Call ``listener`` with the set of user ids on every bump"""
+        self._listeners.append(listener)
+
+
+# Singleton instance
+user_trade_versions = UserTradeVersions()
@@ -0,0 +1,83 @@
+"""
+Transaction Count Service
+Serves transaction history totals without a COUNT(*) on every page
+"""
+
+import json
+from collections import OrderedDict
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.services.trade_versions import user_trade_versions
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TransactionCounter:
+    """
+    Counts a user's (filtered) transactions in one of three modes
+
+    - ``exact``: ``COUNT(*)`` on every call
+    - ``cached``: ``COUNT(*)`` once, then served from an LRU cache keyed by
+      the user's trade version, so the count is exact until the next trade
+    - ``estimate``: the PostgreSQL planner's row estimate for the query
+      (no rows are read); other databases fall back to ``cached``
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._cache: OrderedDict[tuple, int] = OrderedDict()
+
+    async def count(
+        self, db: AsyncSession, user_id: int, filters: tuple, query: Select, mode: str = "cached"
+    ) -> int:
+        """
+        Count the rows matched by ``query``
+
+        Args:
+            db: Session to count with
+            user_id: Owner of the transactions (for cache invalidation)
+            filters: Hashable description of the filters applied to ``query``
+            query: Unpaginated, unordered transaction select
+            mode: ``exact``, ``cached`` or ``estimate``
+        """
+        if mode == "estimate" and db.get_bind().dialect.name == "postgresql":
+            try:
+                return await self._estimate(db, query)
+            except Exception as e:
+                logger.warning(f"Falling back to cached count, estimate failed: {str(e)}")
+
+        if mode == "exact":
+            return await self._exact(db, query)
+
+        key = (user_id, user_trade_versions.get(user_id), filters)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        total = await self._exact(db, query)
+        self._cache[key] = total
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return total
+
+    async def _exact(self, db: AsyncSession, query: Select) -> int:
+        result = await db.execute(select(func.count()).select_from(query.subquery()))
+        return result.scalar_one()
+
+    async def _estimate(self, db: AsyncSession, query: Select) -> int:
+        compiled = query.compile(
+            dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+        )
+        result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+# Singleton instance
+transaction_counter = TransactionCounter()
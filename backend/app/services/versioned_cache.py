@@ -0,0 +1,63 @@
+"""
+Versioned Cache Service
+Bounded LRU cache whose keys embed the versions their values were computed at
+"""
+
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+from app.services.price_ticks import price_ticks
+
+Value = TypeVar("Value")
+
+
+class VersionedLRUCache(Generic[Value]):
+    """
+    Bounded LRU cache keyed on versioned tuples
+
+    Subclasses build keys that include every version their value depends
+    on (the price tick, a user's trade version, ...). Moving a version
+    changes the key, so stale entries are never served and simply age out
+    through LRU eviction; no explicit invalidation is needed.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._cache: OrderedDict[Hashable, Value] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: Hashable) -> Optional[Value]:
+        """Return the cached value for ``key``, counting a hit or a miss"""
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Value):
+        """Store a value computed at the versions in ``key``"""
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_metrics(self) -> dict:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "price_tick_version": price_ticks.version,
+        }
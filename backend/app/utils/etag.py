@@ -0,0 +1,54 @@
+"""
+Conditional GET helpers
+
+Endpoints whose representation only changes with a process-local version
+(price tick, LMS config) get a strong ETag built from that version. The
+check runs as a route dependency, ahead of ``get_db``, so a matching
+``If-None-Match`` is answered with 304 before any database session exists.
+"""
+
+import uuid
+from typing import Callable
+
+from fastapi import HTTPException, Request, Response, status
+
+# Versions restart with the process; the boot id keeps tags from two
+# processes (or two runs of one) from colliding
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def version_etag(name: str, version: int) -> str:
+    """Strong ETag for ``version`` of the ``name`` counter in this process"""
+    return f'"{BOOT_ID}-{name}-{version}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """``If-None-Match`` comparison (weak, as RFC 9110 requires for this header)"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_get(name: str, current_version: Callable[[], int]):
+    """
+    Build a route dependency enforcing an ETag on ``current_version()``
+
+    A matching ``If-None-Match`` raises a bodyless 304; otherwise the ETag
+    is set on the response and the endpoint runs.
+    """
+
+    def dependency(request: Request, response: Response) -> str:
+        etag = version_etag(name, current_version())
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": "no-cache"},
+            )
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return etag
+
+    return dependency
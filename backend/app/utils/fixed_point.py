@@ -0,0 +1,103 @@
+"""
+Fixed-point money and quantity helpers
+
+Hot paths work on plain integers: money in cents and stock quantities in
+micro-units (millionths). Values are converted from and to ``Decimal``
+only at the API/DB boundary, either with the helpers below or by
+selecting a column through the ``Cents`` / ``MicroUnits`` types.
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Optional, Union
+import numpy as np
+from sqlalchemy import Numeric
+from sqlalchemy.types import TypeDecorator
+
+MONEY_SCALE = 100
+QUANTITY_SCALE = 1_000_000
+
+Number = Union[Decimal, int, float, str]
+
+
+def _scaled(value: Number, exponent: int) -> int:
+    if not isinstance(value, Decimal):
+        value = Decimal(repr(value) if isinstance(value, float) else value)
+    return int(value.scaleb(exponent).to_integral_value(ROUND_HALF_EVEN))
+
+
+def to_cents(value: Number) -> int:
+    """Convert an amount of money to integer cents (half-even rounding)"""
+    return _scaled(value, 2)
+
+
+def from_cents(cents: int) -> Decimal:
+    """Convert integer cents to a two-place ``Decimal``"""
+    return Decimal(cents).scaleb(-2)
+
+
+def to_micros(value: Number) -> int:
+    """Convert a stock quantity to integer micro-units (half-even rounding)"""
+    return _scaled(value, 6)
+
+
+def from_micros(micros: int) -> Decimal:
+    """Convert integer micro-units to a six-place ``Decimal``"""
+    return Decimal(micros).scaleb(-6)
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """
+    Integer division rounded half-even, matching ``Decimal.quantize``
+
+    ``denominator`` must be positive.
+    """
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def round_to_cents(amount):
+    """
+    Round float64 money (a scalar or a NumPy array) to integer cents
+
+    Rounds half away from zero like SQL ``ROUND``, so amounts computed in
+    NumPy land on the same cent as those the database rounds, e.g. the
+    position values of the portfolio summary.
+    """
+    cents = np.sign(amount) * np.floor(np.abs(amount) * MONEY_SCALE + 0.5)
+    return cents.astype(np.int64)
+
+
+def percentage(gain_cents: int, invested_cents: int) -> Decimal:
+    """Gain as a percentage of the invested amount, to two places"""
+    if invested_cents <= 0:
+        return Decimal("0.00")
+    return from_cents(div_round(gain_cents * 10000, invested_cents))
+
+
+class Cents(TypeDecorator):
+    """``Numeric(15, 2)`` column read and written as integer cents"""
+
+    impl = Numeric(precision=15, scale=2)
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[int], dialect) -> Optional[Decimal]:
+        return None if value is None else from_cents(value)
+
+    def process_result_value(self, value, dialect) -> Optional[int]:
+        return None if value is None else to_cents(value)
+
+
+class MicroUnits(TypeDecorator):
+    """``Numeric(15, 6)`` column read and written as integer micro-units"""
+
+    impl = Numeric(precision=15, scale=6)
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[int], dialect) -> Optional[Decimal]:
+        return None if value is None else from_micros(value)
+
+    def process_result_value(self, value, dialect) -> Optional[int]:
+        return None if value is None else to_micros(value)
@@ -0,0 +1,47 @@
+"""
+Largest-Triangle-Three-Buckets downsampling
+
+Reduces a time series to a point budget while keeping its visual shape:
+the first and last points are kept, the rest is split into equal buckets
+and each bucket keeps the point forming the largest triangle with the
+previously kept point and the average of the next bucket.
+"""
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Return the indices of the points LTTB keeps, in ascending order
+
+    Args:
+        x: Increasing x values (e.g. epoch seconds)
+        y: Values at ``x``
+        threshold: Number of points to keep (at least 2)
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold <= 2:
+        return np.array([0, n - 1])
+
+    # threshold - 2 buckets over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    widths = np.diff(edges)
+    interior_x, interior_y = x[1 : n - 1], y[1 : n - 1]
+
+    # Average of every bucket at once; the last bucket's successor is the last point
+    avg_x = np.append(np.add.reduceat(interior_x, edges[:-1] - 1) / widths, x[n - 1])
+    avg_y = np.append(np.add.reduceat(interior_y, edges[:-1] - 1) / widths, y[n - 1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
@@ -2,11 +2,20 @@ import typer
 import subprocess
 import os
 import asyncio
+import time
+from decimal import Decimal
 from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from app.config import get_settings
 from app.db import Base
-from app.db.database import AsyncSessionLocal
-from app.db.models import User
+from app.db.database import AsyncSessionLocal, create_engine_with_retry
+from app.db.models import User, Stock
+from app.services.candles import candle_rollup
+from app.services.portfolio_valuation import portfolio_valuator
+from app.services.trade_executor import trade_executor
+from app.services.trade_journal import TradeJournal
+from app.services.trade_locks import trade_locks
+from app.utils.fixed_point import QUANTITY_SCALE, to_cents, from_cents, div_round
 
 app = typer.Typer()
 settings = get_settings()
@@ -110,5 +119,207 @@ def createsuperuser(
         )
 
 
+def _latency_summary(mode: str, latencies: list, elapsed: float) -> str:
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return (
+        f"{mode:<8} {len(latencies) / elapsed:>10.1f} trades/s   "
+        f"p50 {p50:>8.2f} ms   p99 {p99:>8.2f} ms"
+    )
+
+
+async def _benchmark_trades_async(
+    database_url: str, trades: int, concurrency: int, users: int, flush_ms: int, max_batch: int
+):
+    """Async helper running the same buy workload in direct and journal mode."""
+    engine = create_engine_with_retry(database_url)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with session_factory() as session:
+        stock = Stock(symbol="BENCH", name="Benchmark Corp", current_price=Decimal("10.00"))
+        session.add(stock)
+        for i in range(users):
+            session.add(User(
+                email=f"bench{i}@example.com",
+                username=f"bench{i}",
+                hashed_password="-",
+                balance=Decimal("1000000.00"),
+            ))
+        await session.commit()
+        stock_id = stock.id
+        user_ids = list((await session.execute(select(User.id))).scalars().all())
+
+    async def direct(user_id: int):
+        async with session_factory() as session:
+            async with trade_locks.hold(session, user_id):
+                await trade_executor.buy(session, user_id, stock_id, Decimal("1.00"))
+                await session.commit()
+
+    journal = TradeJournal(
+        enabled=True, flush_interval_ms=flush_ms, max_batch=max_batch, session_factory=session_factory
+    )
+
+    async def journaled(user_id: int):
+        await journal.buy(user_id, stock_id, Decimal("1.00"))
+
+    async def run(trade) -> tuple[list, float]:
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                await trade(user_ids[i % len(user_ids)])
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(trades)))
+        return latencies, time.perf_counter() - start
+
+    typer.echo(f"{trades} buys, concurrency {concurrency}, {users} users, {database_url}")
+    latencies, elapsed = await run(direct)
+    typer.echo(_latency_summary("direct", latencies, elapsed))
+
+    await journal.start()
+    latencies, elapsed = await run(journaled)
+    await journal.shutdown()
+    typer.echo(_latency_summary("journal", latencies, elapsed))
+    typer.echo(
+        f"journal flushed {journal.trades_flushed} trades in {journal.batches_flushed} batches"
+    )
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@app.command()
+def benchmark_trades(
+    database_url: str = typer.Option(
+        "sqlite+aiosqlite:///./bench_trades.db",
+        help="Scratch database; all tables in it are dropped and recreated.",
+    ),
+    trades: int = typer.Option(2000, help="Number of buy trades per mode."),
+    concurrency: int = typer.Option(50, help="Concurrent in-flight trades."),
+    users: int = typer.Option(200, help="Number of distinct trading users."),
+    flush_ms: int = typer.Option(5, help="Journal flush interval in milliseconds."),
+    max_batch: int = typer.Option(200, help="Journal maximum trades per commit."),
+):
+    """Compare throughput and latency of per-trade commits vs the trade journal."""
+    asyncio.run(
+        _benchmark_trades_async(database_url, trades, concurrency, users, flush_ms, max_batch)
+    )
+
+
+async def _value_portfolios_async(output: str, chunk_size: int):
+    """Async helper streaming every user's valuation to an NDJSON file or stdout."""
+    portfolio_valuator.chunk_size = chunk_size
+    out = open(output, "w") if output != "-" else None
+    users = 0
+    start = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as session:
+            async for chunk in portfolio_valuator.value_users(session):
+                text = "".join(f"{valuation.model_dump_json()}\n" for valuation in chunk)
+                if out is None:
+                    typer.echo(text, nl=False)
+                else:
+                    out.write(text)
+                users += len(chunk)
+    finally:
+        if out is not None:
+            out.close()
+
+    typer.echo(
+        f"Valued {users} portfolios in {time.perf_counter() - start:.2f}s",
+        err=out is None
+    )
+
+
+@app.command()
+def value_portfolios(
+    output: str = typer.Option("-", help="NDJSON output file, or - for stdout."),
+    chunk_size: int = typer.Option(1000, help="Users valued per query round trip."),
+):
+    """Value every user's portfolio against the current stock prices."""
+    asyncio.run(_value_portfolios_async(output, chunk_size))
+
+
+async def _backfill_candles_async():
+    """Async helper rebuilding the OHLC candles from the raw price history."""
+    async with AsyncSessionLocal() as session:
+        count = await candle_rollup.backfill(session)
+        await session.commit()
+    typer.echo(f"Wrote {count} candles")
+
+
+@app.command()
+def backfill_candles():
+    """Rebuild the 5m / 1h / 1d price candles from the stored price history."""
+    asyncio.run(_backfill_candles_async())
+
+
+def _time_per_op(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) / rounds * 1e9
+
+
+@app.command()
+def benchmark_money(
+    rounds: int = typer.Option(200000, help="Operations per measurement."),
+):
+    """Compare Decimal and fixed-point integer arithmetic on the trade and price-tick hot paths."""
+    import random
+
+    rng = random.Random(42)
+    prices = [Decimal(f"{rng.uniform(1, 500):.2f}") for _ in range(rounds)]
+    amounts = [Decimal(f"{rng.uniform(1, 5000):.2f}") for _ in range(rounds)]
+    changes = [rng.uniform(-10, 10) for _ in range(rounds)]
+    price_cents = [to_cents(p) for p in prices]
+    amount_cents = [to_cents(a) for a in amounts]
+    cent, micro, floor = Decimal("0.01"), Decimal("0.000001"), Decimal("1.00")
+
+    def tick_decimal():
+        for price, change in zip(prices, changes):
+            max(price * Decimal(1 + change / 100), floor).quantize(cent)
+
+    def tick_fixed():
+        for cents, change in zip(price_cents, changes):
+            max(round(cents * (1 + change / 100)), 100)
+
+    def trade_decimal():
+        for amount, price in zip(amounts, prices):
+            quantity = (amount / price).quantize(micro)
+            (quantity * price).quantize(cent)
+
+    def trade_fixed():
+        for amount, price in zip(amount_cents, price_cents):
+            quantity = div_round(amount * QUANTITY_SCALE, price)
+            div_round(quantity * price, QUANTITY_SCALE)
+
+    def boundary():
+        for cents in price_cents:
+            to_cents(from_cents(cents))
+
+    typer.echo(f"{rounds} operations per measurement (ns/op)")
+    for name, decimal_fn, fixed_fn in (
+        ("price tick", tick_decimal, tick_fixed),
+        ("buy + sell", trade_decimal, trade_fixed),
+    ):
+        decimal_ns = _time_per_op(decimal_fn, rounds)
+        fixed_ns = _time_per_op(fixed_fn, rounds)
+        typer.echo(
+            f"{name:<12} decimal {decimal_ns:>8.1f}   fixed {fixed_ns:>8.1f}   "
+            f"speedup {decimal_ns / fixed_ns:>5.2f}x"
+        )
+    typer.echo(f"{'boundary':<12} Decimal <-> cents round trip {_time_per_op(boundary, rounds):>8.1f}")
+
+
 if __name__ == "__main__":
     app()
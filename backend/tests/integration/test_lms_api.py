@@ -18,3 +18,27 @@ async def test_get_lms_config(test_client: AsyncClient):
     assert "show_gain_loss" in data["portfolio_screen"]
     assert "card_layout" in data["dashboard_screen"]
 
+
+
+@pytest.mark.asyncio
+async def test_lms_config_etag_follows_config_version(test_client: AsyncClient):
+    first = await test_client.get("/api/v1/lms/config")
+    etag = first.headers["etag"]
+
+    unchanged = await test_client.get("/api/v1/lms/config", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["etag"] == etag
+
+    await test_client.post(
+        "/api/auth/register",
+        json={"email": "lmsetag@example.com", "username": "lmsetag", "password": "pass12345"}
+    )
+    login = await test_client.post("/api/auth/login", json={"email": "lmsetag@example.com", "password": "pass12345"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    put = await test_client.put("/api/v1/lms/global-config", headers=headers, json=first.json())
+    assert put.status_code == 200
+
+    changed = await test_client.get("/api/v1/lms/config", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
@@ -0,0 +1,135 @@
+import pytest
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User, Stock, Wallet, LimitOrder, OrderStatus
+from app.services.order_matcher import order_matcher
+from app.services.trade_executor import trade_executor
+
+
+async def _seed(session: AsyncSession, tag: str, balance: str, price: str):
+    user = User(email=f"{tag}@example.com", username=tag, balance=Decimal(balance))
+    user.set_password("Test123!")
+    stock = Stock(symbol=tag.upper()[:10], name=f"{tag} Corp", current_price=Decimal(price))
+    session.add_all([user, stock])
+    await session.commit()
+    await session.refresh(user)
+    await session.refresh(stock)
+    return user, stock
+
+
+@pytest.mark.asyncio
+async def test_limit_buy_rests_then_fills_on_cross(test_client: AsyncClient, db_session: AsyncSession):
+    user, stock = await _seed(db_session, "lob1", "1000.00", "100.00")
+
+    resp = await test_client.post("/api/v1/orders", json={
+        "user_id": user.id, "stock_id": stock.id, "side": "BUY",
+        "limit_price": "90.00", "amount": "180.00",
+    })
+    assert resp.status_code == 201
+    order = resp.json()
+    assert order["status"] == "OPEN"
+
+    depth = (await test_client.get(f"/api/v1/stocks/{stock.id}/depth")).json()
+    assert depth["asks"] == []
+    assert len(depth["bids"]) == 1
+    assert Decimal(str(depth["bids"][0]["price"])) == Decimal("90.00")
+    assert Decimal(str(depth["bids"][0]["quantity"])) == Decimal("2.000000")
+
+    # A tick that does not cross leaves the order resting
+    assert await order_matcher.match_orders({stock.id: Decimal("95.00")}) == 0
+
+    stock.current_price = Decimal("80.00")
+    await db_session.commit()
+    assert await order_matcher.match_orders({stock.id: Decimal("80.00")}) == 1
+
+    depth = (await test_client.get(f"/api/v1/stocks/{stock.id}/depth")).json()
+    assert depth["bids"] == []
+
+    orders = (await test_client.get(f"/api/v1/orders/user/{user.id}")).json()
+    assert orders[0]["status"] == "FILLED"
+    assert orders[0]["transaction_id"] is not None
+
+    await db_session.refresh(user)
+    assert user.balance == Decimal("820.00")
+
+
+@pytest.mark.asyncio
+async def test_marketable_limit_sell_fills_immediately(test_client: AsyncClient, db_session: AsyncSession):
+    user, stock = await _seed(db_session, "lob2", "0.00", "50.00")
+    db_session.add(Wallet(user_id=user.id, stock_id=stock.id, quantity=Decimal("4.000000")))
+    await db_session.commit()
+
+    resp = await test_client.post("/api/v1/orders", json={
+        "user_id": user.id, "stock_id": stock.id, "side": "SELL",
+        "limit_price": "45.00", "quantity": "1.000000",
+    })
+    assert resp.status_code == 201
+    assert resp.json()["status"] == "FILLED"
+
+    await db_session.refresh(user)
+    assert user.balance == Decimal("50.00")
+
+
+@pytest.mark.asyncio
+async def test_cancel_limit_order(test_client: AsyncClient, db_session: AsyncSession):
+    user, stock = await _seed(db_session, "lob3", "500.00", "10.00")
+
+    order = (await test_client.post("/api/v1/orders", json={
+        "user_id": user.id, "stock_id": stock.id, "side": "BUY",
+        "limit_price": "8.00", "amount": "80.00",
+    })).json()
+
+    resp = await test_client.delete(f"/api/v1/orders/{order['id']}")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "CANCELLED"
+
+    depth = (await test_client.get(f"/api/v1/stocks/{stock.id}/depth")).json()
+    assert depth["bids"] == []
+
+    again = await test_client.delete(f"/api/v1/orders/{order['id']}")
+    assert again.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_matcher_claims_orders_before_trading(test_client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    user, stock = await _seed(db_session, "lob4", "1000.00", "100.00")
+    order_ids = []
+    for _ in range(2):
+        resp = await test_client.post("/api/v1/orders", json={
+            "user_id": user.id, "stock_id": stock.id, "side": "BUY",
+            "limit_price": "90.00", "amount": "180.00",
+        })
+        order_ids.append(resp.json()["id"])
+    live_id, cancelled_id = order_ids
+
+    # Cancelled after the matcher booked it (still in the in-memory book)
+    await db_session.execute(
+        update(LimitOrder).where(LimitOrder.id == cancelled_id).values(status=OrderStatus.CANCELLED)
+    )
+    await db_session.commit()
+
+    seen = {}
+    execute_batch = trade_executor.execute_batch
+
+    async def spy(session, legs, atomic=True):
+        result = await session.execute(select(LimitOrder.id, LimitOrder.status).where(LimitOrder.id.in_(order_ids)))
+        seen.update(dict(result.all()))
+        seen["legs"] = len(legs)
+        return await execute_batch(session, legs, atomic)
+
+    monkeypatch.setattr(trade_executor, "execute_batch", spy)
+    stock.current_price = Decimal("80.00")
+    await db_session.commit()
+    assert await order_matcher.match_orders({stock.id: Decimal("80.00")}) == 1
+
+    # The live order was already claimed when the trade ran, so a cancel could not slip in
+    assert seen == {live_id: OrderStatus.FILLED, cancelled_id: OrderStatus.CANCELLED, "legs": 1}
+
+    cancel = await test_client.delete(f"/api/v1/orders/{live_id}")
+    assert cancel.status_code == 400
+
+    await db_session.refresh(user)
+    assert user.balance == Decimal("820.00")
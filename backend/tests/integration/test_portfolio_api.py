@@ -1,10 +1,21 @@
+import json
 import pytest
+from datetime import datetime, timedelta
 from decimal import Decimal
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.db.models import User, Stock, Transaction, Wallet, TransactionType
+from app.db.models import (
+    User, Stock, StockPriceHistory, Transaction, Wallet, TransactionType, PortfolioSnapshot
+)
+from app.services.leaderboard import leaderboard
+from app.services.portfolio_cache import portfolio_cache
+from app.services.portfolio_snapshots import portfolio_snapshot_writer
+from app.services.portfolio_valuation import portfolio_valuator
+from app.services.price_ticks import price_ticks
+from app.services.risk_metrics import risk_analyzer
+from app.services.auth import create_access_token
 
 
 async def _seed_portfolio(session: AsyncSession):
@@ -28,7 +39,13 @@ async def _seed_portfolio(session: AsyncSession):
     )
     session.add(t)
 
-    wallet = Wallet(user_id=user.id, stock_id=stock.id, quantity=Decimal("10.000000"))
+    wallet = Wallet(
+        user_id=user.id,
+        stock_id=stock.id,
+        quantity=Decimal("10.000000"),
+        total_cost=Decimal("800.00"),
+        avg_buy_price=Decimal("80.000000"),
+    )
     session.add(wallet)
 
     await session.commit()
@@ -53,6 +70,42 @@ async def test_get_portfolio_summary_success(test_client: AsyncClient, db_sessio
     assert len(data["holdings"]) == 1
     holding = data["holdings"][0]
     assert holding["stock_symbol"] == stock.symbol
+    assert Decimal(holding["average_buy_price"]) == Decimal("80")
+    assert Decimal(data["total_invested"]) == Decimal("800.00")
+    assert Decimal(data["current_value"]) == Decimal("1000.00")
+
+
+@pytest.mark.asyncio
+async def test_portfolio_cost_basis_follows_trades(test_client: AsyncClient, db_session: AsyncSession):
+    user = User(email="basis@example.com", username="basisuser", balance=Decimal("10000.00"))
+    user.set_password("Test123!")
+    stock = Stock(symbol="CBS", name="Cost Basis Stock", current_price=Decimal("50.00"))
+    db_session.add_all([user, stock])
+    await db_session.commit()
+    user_id, stock_id = user.id, stock.id
+
+    # 10 shares at 50, then 10 at 100: 20 shares at an average of 75
+    await test_client.post("/api/v1/transactions/buy", json={"user_id": user_id, "stock_id": stock_id, "amount": 500})
+    stock.current_price = Decimal("100.00")
+    await db_session.commit()
+    await test_client.post("/api/v1/transactions/buy", json={"user_id": user_id, "stock_id": stock_id, "amount": 1000})
+
+    # Selling releases cost at the average price and leaves it unchanged
+    resp = await test_client.post("/api/v1/transactions/sell", json={"user_id": user_id, "stock_id": stock_id, "quantity": 5})
+    assert resp.status_code == 200
+
+    wallet = (await db_session.execute(
+        select(Wallet).where(Wallet.user_id == user_id, Wallet.stock_id == stock_id)
+    )).scalar_one()
+    await db_session.refresh(wallet)
+    assert wallet.quantity == Decimal("15")
+    assert wallet.avg_buy_price == Decimal("75")
+    assert wallet.total_cost == Decimal("1125.00")
+
+    resp = await test_client.get(f"/api/v1/portfolio/{user_id}")
+    data = resp.json()
+    assert Decimal(data["total_invested"]) == Decimal("1125.00")
+    assert Decimal(data["holdings"][0]["average_buy_price"]) == Decimal("75")
 
 
 @pytest.mark.asyncio
@@ -60,3 +113,302 @@ async def test_get_portfolio_user_not_found(test_client: AsyncClient):
     resp = await test_client.get("/api/v1/portfolio/999999")
     assert resp.status_code == 404
 
+
+
+@pytest.mark.asyncio
+async def test_portfolio_without_holdings(test_client: AsyncClient, db_session: AsyncSession):
+    user = User(email="empty@example.com", username="emptyuser", balance=Decimal("2500.00"))
+    user.set_password("Test123!")
+    db_session.add(user)
+    await db_session.commit()
+
+    resp = await test_client.get(f"/api/v1/portfolio/{user.id}")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["holdings"] == []
+    assert Decimal(data["total_invested"]) == Decimal("0")
+    assert Decimal(data["current_value"]) == Decimal("0")
+    assert Decimal(data["cash_balance"]) == Decimal("2500.00")
+
+
+@pytest.mark.asyncio
+async def test_portfolio_totals_match_rounded_holdings(test_client: AsyncClient, db_session: AsyncSession):
+    user = User(email="cents@example.com", username="centsuser", balance=Decimal("0.00"))
+    user.set_password("Test123!")
+    stocks = [
+        Stock(symbol=f"CNT{i}", name=f"Cents {i}", current_price=Decimal("0.01")) for i in range(3)
+    ]
+    db_session.add_all([user, *stocks])
+    await db_session.flush()
+    # Each position is worth $0.004: nothing per holding, but a cent unrounded in total
+    for stock in stocks:
+        db_session.add(Wallet(
+            user_id=user.id, stock_id=stock.id, quantity=Decimal("0.400000"),
+            total_cost=Decimal("0.00"), avg_buy_price=Decimal("0")
+        ))
+    await db_session.commit()
+
+    resp = await test_client.get(f"/api/v1/portfolio/{user.id}")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["holdings"]) == 3
+    assert Decimal(data["current_value"]) == sum(Decimal(h["current_value"]) for h in data["holdings"])
+    assert Decimal(data["gain_loss_amount"]) == sum(Decimal(h["gain_loss"]) for h in data["holdings"])
+
+    # Bulk valuation rounds the same way
+    valued = [v async for chunk in portfolio_valuator.value_users(db_session, [user.id]) for v in chunk]
+    assert valued[0].current_value == Decimal(data["current_value"])
+
+
+@pytest.mark.asyncio
+async def test_portfolio_summary_cached_until_tick_or_trade(test_client: AsyncClient, db_session: AsyncSession):
+    user = User(email="cache@example.com", username="cacheuser", balance=Decimal("5000.00"))
+    user.set_password("Test123!")
+    stock = Stock(symbol="PCC", name="Portfolio Cache Co", current_price=Decimal("10.00"))
+    db_session.add_all([user, stock])
+    await db_session.commit()
+    user_id, stock_id = user.id, stock.id
+
+    first = await test_client.get(f"/api/v1/portfolio/{user_id}")
+    hits, misses = portfolio_cache.hits, portfolio_cache.misses
+
+    # Repeat reads are served from the cache
+    second = await test_client.get(f"/api/v1/portfolio/{user_id}")
+    assert second.json() == first.json()
+    assert (portfolio_cache.hits, portfolio_cache.misses) == (hits + 1, misses)
+
+    # A trade moves the user's version
+    await test_client.post("/api/v1/transactions/buy", json={"user_id": user_id, "stock_id": stock_id, "amount": 100})
+    resp = await test_client.get(f"/api/v1/portfolio/{user_id}")
+    assert len(resp.json()["holdings"]) == 1
+    assert portfolio_cache.misses == misses + 1
+
+    # A price tick moves every user's version
+    stock.current_price = Decimal("20.00")
+    await db_session.commit()
+    price_ticks.bump()
+    resp = await test_client.get(f"/api/v1/portfolio/{user_id}")
+    assert Decimal(resp.json()["current_value"]) == Decimal("200.00")
+    assert portfolio_cache.misses == misses + 2
+
+    metrics = (await test_client.get("/api/health/portfolio-cache")).json()
+    assert metrics["hits"] == portfolio_cache.hits
+
+
+@pytest.mark.asyncio
+async def test_batch_valuation_streams_ndjson(test_client: AsyncClient, db_session: AsyncSession):
+    admin = User(email="valadmin@example.com", username="valadmin", role="admin")
+    holder = User(email="valholder@example.com", username="valholder", balance=Decimal("100.00"))
+    idle = User(email="validle@example.com", username="validle", balance=Decimal("50.00"))
+    for user in (admin, holder, idle):
+        user.set_password("Test123!")
+    a = Stock(symbol="VALA", name="Valuation A", current_price=Decimal("12.50"))
+    b = Stock(symbol="VALB", name="Valuation B", current_price=Decimal("3.00"))
+    db_session.add_all([admin, holder, idle, a, b])
+    await db_session.flush()
+    db_session.add_all([
+        Wallet(user_id=holder.id, stock_id=a.id, quantity=Decimal("4"), total_cost=Decimal("40.00"), avg_buy_price=Decimal("10")),
+        Wallet(user_id=holder.id, stock_id=b.id, quantity=Decimal("10"), total_cost=Decimal("40.00"), avg_buy_price=Decimal("4")),
+    ])
+    await db_session.commit()
+    holder_id, idle_id = holder.id, idle.id
+
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': admin.email})}"}
+    resp = await test_client.post(
+        "/api/v1/portfolio/batch",
+        json={"user_ids": [idle_id, holder_id, 999999]},
+        headers=headers
+    )
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["user_id"] for line in lines] == sorted([holder_id, idle_id])
+
+    valued = {line["user_id"]: line for line in lines}
+    assert Decimal(valued[holder_id]["current_value"]) == Decimal("80.00")
+    assert Decimal(valued[holder_id]["total_invested"]) == Decimal("80.00")
+    assert valued[holder_id]["holdings_count"] == 2
+    assert Decimal(valued[idle_id]["current_value"]) == Decimal("0")
+    assert Decimal(valued[idle_id]["cash_balance"]) == Decimal("50.00")
+
+    holder_headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'valholder@example.com'})}"}
+    resp = await test_client.post("/api/v1/portfolio/batch", json={}, headers=holder_headers)
+    assert resp.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_portfolio_history_replays_trades(test_client: AsyncClient, db_session: AsyncSession):
+    now = datetime.now()
+    user = User(email="hist@example.com", username="histuser", balance=Decimal("990.00"))
+    user.set_password("Test123!")
+    stock = Stock(symbol="PHS", name="Portfolio History Stock", current_price=Decimal("20.00"))
+    db_session.add_all([user, stock])
+    await db_session.flush()
+    db_session.add_all([
+        StockPriceHistory(stock_id=stock.id, price=Decimal("10.00"), timestamp=now - timedelta(days=3)),
+        StockPriceHistory(stock_id=stock.id, price=Decimal("20.00"), timestamp=now - timedelta(days=1)),
+        Transaction(
+            user_id=user.id, stock_id=stock.id, type=TransactionType.BUY, amount=Decimal("50.00"),
+            quantity=Decimal("5"), price_per_unit=Decimal("10.00"), timestamp=now - timedelta(days=2)
+        ),
+        Transaction(
+            user_id=user.id, stock_id=stock.id, type=TransactionType.SELL, amount=Decimal("40.00"),
+            quantity=Decimal("2"), price_per_unit=Decimal("20.00"), timestamp=now - timedelta(hours=12)
+        ),
+    ])
+    await db_session.commit()
+
+    resp = await test_client.get(f"/api/v1/portfolio/{user.id}/history", params={"range": "7d"})
+    assert resp.status_code == 200
+    points = resp.json()["points"]
+    assert len(points) == 7 * 24 + 1
+
+    def totals(point):
+        return tuple(Decimal(point[k]) for k in ("holdings_value", "cash_balance", "total_value"))
+
+    # Before the buy: all cash
+    assert totals(points[0]) == (Decimal("0"), Decimal("1000"), Decimal("1000"))
+    # After the buy, before the price move: 5 shares at 10
+    assert totals(points[-37]) == (Decimal("50"), Decimal("950"), Decimal("1000"))
+    # Now: 3 shares at 20
+    assert totals(points[-1]) == (Decimal("60"), Decimal("990"), Decimal("1050"))
+
+    resp = await test_client.get(f"/api/v1/portfolio/{user.id}/history", params={"range": "1y"})
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_portfolio_snapshots_written_for_holders(db_session: AsyncSession):
+    holder = User(email="snap@example.com", username="snapuser", balance=Decimal("300.00"))
+    idle = User(email="snapidle@example.com", username="snapidle", balance=Decimal("300.00"))
+    for user in (holder, idle):
+        user.set_password("Test123!")
+    stock = Stock(symbol="SNP", name="Snapshot Stock", current_price=Decimal("7.00"))
+    db_session.add_all([holder, idle, stock])
+    await db_session.flush()
+    db_session.add(Wallet(
+        user_id=holder.id, stock_id=stock.id, quantity=Decimal("10"),
+        total_cost=Decimal("50.00"), avg_buy_price=Decimal("5")
+    ))
+    await db_session.commit()
+    holder_id, idle_id = holder.id, idle.id
+
+    taken_at = datetime.now().replace(microsecond=0)
+    expired_at = taken_at - timedelta(days=portfolio_snapshot_writer.retention_days + 1)
+    db_session.add(PortfolioSnapshot(
+        user_id=holder_id, current_value=Decimal("1.00"), total_invested=Decimal("1.00"),
+        gain_loss_amount=Decimal("0.00"), gain_loss_percentage=Decimal("0.00"),
+        cash_balance=Decimal("0.00"), timestamp=expired_at
+    ))
+    await db_session.commit()
+
+    task = portfolio_snapshot_writer.schedule(taken_at)
+    assert task is not None
+    await task
+
+    rows = (await db_session.execute(
+        select(PortfolioSnapshot).where(
+            PortfolioSnapshot.user_id.in_([holder_id, idle_id]),
+            PortfolioSnapshot.timestamp == taken_at
+        )
+    )).scalars().all()
+    assert [row.user_id for row in rows] == [holder_id]
+    assert rows[0].current_value == Decimal("70.00")
+    assert rows[0].gain_loss_amount == Decimal("20.00")
+    assert rows[0].gain_loss_percentage == Decimal("40.00")
+
+    expired = await db_session.execute(
+        select(PortfolioSnapshot).where(PortfolioSnapshot.timestamp == expired_at)
+    )
+    assert expired.scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_leaderboard_tracks_ticks_and_trades(test_client: AsyncClient, db_session: AsyncSession):
+    users = [
+        User(email=f"lb{i}@example.com", username=f"lbuser{i}", balance=Decimal("5000.00"))
+        for i in range(3)
+    ]
+    for user in users:
+        user.set_password("Test123!")
+    up = Stock(symbol="LBUP", name="Leaderboard Up", current_price=Decimal("10.00"))
+    down = Stock(symbol="LBDN", name="Leaderboard Down", current_price=Decimal("10.00"))
+    db_session.add_all(users + [up, down])
+    await db_session.commit()
+    a, b, c = (user.id for user in users)
+    up_id, down_id = up.id, down.id
+
+    # Make sure the board is loaded before the trades so they arrive incrementally
+    await test_client.get("/api/v1/portfolio/leaderboard")
+
+    for user_id, stock_id, amount in ((a, up_id, 1000), (b, down_id, 1000), (c, up_id, 500), (c, down_id, 500)):
+        resp = await test_client.post(
+            "/api/v1/transactions/buy",
+            json={"user_id": user_id, "stock_id": stock_id, "amount": amount}
+        )
+        assert resp.status_code == 200
+
+    leaderboard.update_prices({up_id: Decimal("15.00"), down_id: Decimal("5.00")})
+
+    resp = await test_client.get("/api/v1/portfolio/leaderboard", params={"limit": 100})
+    assert resp.status_code == 200
+    ranked = [e for e in resp.json()["entries"] if e["user_id"] in (a, b, c)]
+    assert [e["user_id"] for e in ranked] == [a, c, b]
+    assert [Decimal(e["gain_loss_percentage"]) for e in ranked] == [Decimal("50"), Decimal("0"), Decimal("-50")]
+    assert ranked[0]["username"] == "lbuser0"
+
+    resp = await test_client.get("/api/v1/portfolio/leaderboard", params={"limit": 100, "order": "losers"})
+    losers = [e["user_id"] for e in resp.json()["entries"] if e["user_id"] in (a, b, c)]
+    assert losers == [b, c, a]
+
+    # Selling out removes the user from the ranking
+    await test_client.post("/api/v1/transactions/sell", json={"user_id": b, "stock_id": down_id, "quantity": 100})
+    resp = await test_client.get("/api/v1/portfolio/leaderboard", params={"limit": 100})
+    assert b not in [e["user_id"] for e in resp.json()["entries"]]
+
+
+@pytest.mark.asyncio
+async def test_portfolio_risk_metrics(test_client: AsyncClient, db_session: AsyncSession):
+    user = User(email="risk@example.com", username="riskuser", balance=Decimal("0.00"))
+    user.set_password("Test123!")
+    stock = Stock(symbol="RSK", name="Risky Stock", current_price=Decimal("100.00"))
+    db_session.add_all([user, stock])
+    await db_session.flush()
+
+    # Hourly prices alternating 100 / 90 over the whole window
+    last_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    db_session.add_all([
+        StockPriceHistory(
+            stock_id=stock.id,
+            price=Decimal("100.00") if k % 2 == 0 else Decimal("90.00"),
+            timestamp=last_hour - timedelta(hours=k)
+        )
+        for k in range(7 * 24 + 1)
+    ])
+    db_session.add(Wallet(
+        user_id=user.id, stock_id=stock.id, quantity=Decimal("2"),
+        total_cost=Decimal("180.00"), avg_buy_price=Decimal("90")
+    ))
+    await db_session.commit()
+    user_id = user.id
+
+    resp = await test_client.get(f"/api/v1/portfolio/{user_id}/risk", params={"range": "7d"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["observations"] == 7 * 24
+    assert Decimal(data["portfolio_value"]) == Decimal("200.00")
+    assert data["max_drawdown"] == pytest.approx(-0.1)
+    assert data["value_at_risk"] == pytest.approx(0.1)
+    assert Decimal(data["value_at_risk_amount"]) == Decimal("20.00")
+    assert data["volatility"] > 0
+    assert data["beta"] > 0
+
+    holding = data["holdings"][0]
+    assert holding["stock_symbol"] == "RSK"
+    assert holding["weight"] == 1.0
+    assert holding["max_drawdown"] == pytest.approx(-0.1)
+
+    # A second read within the same tick is served from the return cache
+    misses = risk_analyzer.misses
+    resp = await test_client.get(f"/api/v1/portfolio/{user_id}/risk", params={"range": "7d"})
+    assert resp.json() == data
+    assert risk_analyzer.misses == misses
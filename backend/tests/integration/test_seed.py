@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import PriceCandle, Stock, StockPriceHistory
+from app.db.seed import INITIAL_STOCKS, create_stocks
+
+
+@pytest.mark.asyncio
+async def test_create_stocks_backfills_candles(db_session: AsyncSession):
+    # Same session options as AsyncSessionLocal, which the seed script runs with
+    session_factory = async_sessionmaker(
+        db_session.bind, class_=AsyncSession, expire_on_commit=False, autoflush=False
+    )
+    async with session_factory() as session:
+        stocks = await create_stocks(session)
+        stock_ids = [stock.id for stock in stocks.values()]
+
+        try:
+            assert len(stock_ids) == len(INITIAL_STOCKS)
+            for resolution in ("5m", "1h", "1d"):
+                result = await session.execute(
+                    select(PriceCandle.stock_id, func.count())
+                    .where(PriceCandle.stock_id.in_(stock_ids), PriceCandle.resolution == resolution)
+                    .group_by(PriceCandle.stock_id)
+                )
+                counts = dict(result.all())
+                assert set(counts) == set(stock_ids)
+                # 30 days of hourly points plus the current price
+                if resolution == "1d":
+                    assert all(30 <= n <= 32 for n in counts.values())
+                else:
+                    assert all(n >= 30 * 24 for n in counts.values())
+        finally:
+            await session.execute(delete(PriceCandle).where(PriceCandle.stock_id.in_(stock_ids)))
+            await session.execute(
+                delete(StockPriceHistory).where(StockPriceHistory.stock_id.in_(stock_ids))
+            )
+            await session.execute(delete(Stock).where(Stock.id.in_(stock_ids)))
+            await session.commit()
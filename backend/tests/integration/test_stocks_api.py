@@ -1,9 +1,21 @@
+import asyncio
+import json
 import pytest
 from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi.testclient import TestClient
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.websockets import WebSocketDisconnect
 
 from app.db.models import Stock, StockPriceHistory
+from app.main import app
+from app.routes import stocks as stocks_routes
+from app.services.candles import candle_rollup
+from app.services.price_cache import price_cache
+from app.services.price_changes import price_change_log
+from app.services.price_stream import price_broadcaster
+from app.services.price_ticks import price_ticks
 
 
 async def _create_stock(session: AsyncSession, symbol: str, name: str, price: float) -> Stock:
@@ -76,3 +88,307 @@ async def test_stock_history_ranges(test_client: AsyncClient, db_session: AsyncS
     bad = await test_client.get(f"/api/v1/stocks/{s.id}/history", params={"time_range": "bad"})
     assert bad.status_code == 422
 
+
+
+@pytest.mark.asyncio
+async def test_stock_history_max_points_serves_candles(test_client: AsyncClient, db_session: AsyncSession):
+    s = await _create_stock(db_session, "STOCK_CDL", "Candle Corp", 100.00)
+    tick_time = datetime.now() - timedelta(minutes=20)
+    for price in ("100.00", "104.50", "97.25", "101.10"):
+        await candle_rollup.record(db_session, [(s.id, Decimal(price), tick_time)])
+    await db_session.commit()
+
+    r = await test_client.get(
+        f"/api/v1/stocks/{s.id}/history", params={"time_range": "24h", "max_points": 24}
+    )
+    assert r.status_code == 200
+    data = r.json()
+    assert data["resolution"] == "1h"
+    assert len(data["history"]) == 1
+    candle = data["history"][0]
+    assert Decimal(candle["open"]) == Decimal("100.00")
+    assert Decimal(candle["high"]) == Decimal("104.50")
+    assert Decimal(candle["low"]) == Decimal("97.25")
+    assert Decimal(candle["price"]) == Decimal("101.10")
+
+    fine = await test_client.get(
+        f"/api/v1/stocks/{s.id}/history", params={"time_range": "1h", "max_points": 12}
+    )
+    assert fine.json()["resolution"] == "5m"
+
+    raw = await test_client.get(f"/api/v1/stocks/{s.id}/history", params={"time_range": "24h"})
+    assert raw.json()["resolution"] == "raw"
+
+
+@pytest.mark.asyncio
+async def test_stock_history_max_points_downsamples_and_caches(
+    test_client: AsyncClient, db_session: AsyncSession
+):
+    s = await _create_stock(db_session, "STOCK_LTTB", "Downsample Ltd", 50.00)
+    now = datetime.now()
+    ticks = [
+        (s.id, Decimal(50 + (k % 7)), now - timedelta(minutes=5 * k))
+        for k in range(60, 0, -1)
+    ]
+    await candle_rollup.record(db_session, ticks)
+    await db_session.commit()
+
+    params = {"time_range": "24h", "max_points": 30}
+    r = await test_client.get(f"/api/v1/stocks/{s.id}/history", params=params)
+    assert r.status_code == 200
+    data = r.json()
+    assert data["resolution"] == "5m"
+    assert len(data["history"]) == 30
+    timestamps = [point["timestamp"] for point in data["history"]]
+    assert timestamps == sorted(timestamps)
+
+    hits_before = (await test_client.get("/api/health/stock-history-cache")).json()["hits"]
+    again = await test_client.get(f"/api/v1/stocks/{s.id}/history", params=params)
+    assert again.json() == data
+    hits_after = (await test_client.get("/api/health/stock-history-cache")).json()["hits"]
+    assert hits_after == hits_before + 1
+
+
+@pytest.mark.asyncio
+async def test_batch_stock_history_is_columnar(test_client: AsyncClient, db_session: AsyncSession):
+    a = await _create_stock(db_session, "STOCK_BA", "Batch A", 10.00)
+    b = await _create_stock(db_session, "STOCK_BB", "Batch B", 20.00)
+    await _add_history_points(db_session, a.id)
+    now = datetime.now()
+    await candle_rollup.record(db_session, [
+        (b.id, Decimal(20 + k), now - timedelta(minutes=5 * k)) for k in range(40, 0, -1)
+    ])
+    await db_session.commit()
+
+    raw = await test_client.get(
+        "/api/v1/stocks/history", params={"ids": f"{b.id},{a.id},999999", "range": "24h"}
+    )
+    assert raw.status_code == 200
+    data = raw.json()
+    assert data["resolution"] == "raw"
+    assert [s["stock_id"] for s in data["series"]] == [b.id, a.id]
+    series_a = data["series"][1]
+    assert series_a["symbol"] == "STOCK_BA"
+    assert len(series_a["timestamps"]) == len(series_a["prices"]) == 3
+    assert [Decimal(p) for p in series_a["prices"]] == [
+        Decimal("151.55"), Decimal("152.75"), Decimal("153.33")
+    ]
+    assert data["series"][0]["prices"] == []
+
+    sampled = await test_client.get(
+        "/api/v1/stocks/history", params={"ids": f"{a.id},{b.id}", "range": "24h", "max_points": 25}
+    )
+    assert sampled.status_code == 200
+    sampled_data = sampled.json()
+    assert sampled_data["resolution"] == "5m"
+    series_b = sampled_data["series"][1]
+    assert len(series_b["prices"]) == 25
+    assert series_b["timestamps"] == sorted(series_b["timestamps"])
+
+    bad = await test_client.get("/api/v1/stocks/history", params={"ids": "1,x"})
+    assert bad.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_stock_routes_serve_from_warm_price_cache(test_client: AsyncClient, db_session: AsyncSession):
+    s = await _create_stock(db_session, "STOCK_MEM", "Memory Corp", 42.00)
+    await _add_history_points(db_session, s.id)
+
+    await price_cache.warm(db_session)
+    try:
+        # Changes made behind the cache's back are not visible: no queries are made
+        s.current_price = Decimal("99.99")
+        db_session.add(StockPriceHistory(stock_id=s.id, price=Decimal("99.99"), timestamp=datetime.now()))
+        await db_session.commit()
+
+        listed = await test_client.get("/api/v1/stocks")
+        quote = next(q for q in listed.json()["stocks"] if q["id"] == s.id)
+        assert Decimal(quote["current_price"]) == Decimal("42.00")
+
+        single = await test_client.get(f"/api/v1/stocks/{s.id}")
+        assert Decimal(single.json()["current_price"]) == Decimal("42.00")
+
+        history = await test_client.get(f"/api/v1/stocks/{s.id}/history", params={"time_range": "24h"})
+        assert [Decimal(p["price"]) for p in history.json()["history"]] == [
+            Decimal("151.55"), Decimal("152.75"), Decimal("153.33")
+        ]
+
+        # A committed tick pushed by the updater is visible immediately
+        tick = StockPriceHistory(stock_id=s.id, price=Decimal("43.10"), timestamp=datetime.now())
+        db_session.add(tick)
+        s.current_price = Decimal("43.10")
+        await db_session.commit()
+        await db_session.refresh(s)
+        await db_session.refresh(tick)
+        price_cache.record_tick([s], [tick])
+
+        single = await test_client.get(f"/api/v1/stocks/{s.id}")
+        assert Decimal(single.json()["current_price"]) == Decimal("43.10")
+        history = await test_client.get(f"/api/v1/stocks/{s.id}/history", params={"time_range": "1h"})
+        assert [Decimal(p["price"]) for p in history.json()["history"]] == [
+            Decimal("152.75"), Decimal("153.33"), Decimal("43.10")
+        ]
+    finally:
+        price_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_stock_endpoints_answer_304_between_ticks(test_client: AsyncClient, db_session: AsyncSession):
+    s = await _create_stock(db_session, "STOCK_ETAG", "Etag Corp", 12.00)
+    paths = ["/api/v1/stocks", f"/api/v1/stocks/{s.id}", f"/api/v1/stocks/{s.id}/history"]
+
+    etags = {}
+    for path in paths:
+        r = await test_client.get(path)
+        assert r.status_code == 200
+        etags[path] = r.headers["etag"]
+        cached = await test_client.get(path, headers={"If-None-Match": etags[path]})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    price_ticks.bump()
+    for path in paths:
+        r = await test_client.get(path, headers={"If-None-Match": etags[path]})
+        assert r.status_code == 200
+        assert r.headers["etag"] != etags[path]
+
+
+@pytest.mark.asyncio
+async def test_stock_price_changes_since_version(test_client: AsyncClient, db_session: AsyncSession):
+    s = await _create_stock(db_session, "STOCK_CHG", "Changes Corp", 30.00)
+
+    full = await test_client.get("/api/v1/stocks/changes", params={"since": 0})
+    assert full.status_code == 200
+    data = full.json()
+    assert data["reset"] is True
+    assert s.id in [c["stock_id"] for c in data["changes"]]
+    epoch = data["epoch"]
+
+    version = price_ticks.bump()
+    price_change_log.record(version, {s.id: Decimal("31.50")})
+    delta = await test_client.get("/api/v1/stocks/changes", params={"since": version - 1, "epoch": epoch})
+    assert delta.json() == {
+        "epoch": epoch,
+        "version": version,
+        "reset": False,
+        "changes": [{"stock_id": s.id, "current_price": "31.50"}],
+    }
+
+    caught_up = await test_client.get("/api/v1/stocks/changes", params={"since": version, "epoch": epoch})
+    assert caught_up.json()["changes"] == []
+
+    future = await test_client.get("/api/v1/stocks/changes", params={"since": version + 5, "epoch": epoch})
+    assert future.json()["reset"] is True
+
+    # A version from an earlier run of the server may collide with this one's
+    for params in ({"since": version - 1}, {"since": version - 1, "epoch": "stale"}):
+        restarted = await test_client.get("/api/v1/stocks/changes", params=params)
+        assert restarted.json()["reset"] is True
+
+
+@pytest.mark.asyncio
+async def test_next_tick_long_poll_wakes_on_tick(test_client: AsyncClient, db_session: AsyncSession):
+    s = await _create_stock(db_session, "STOCK_LP", "Long Poll Corp", 60.00)
+    after = price_ticks.version
+    epoch = (await test_client.get("/api/v1/stocks/changes", params={"since": 0})).json()["epoch"]
+    params = {"after": after, "epoch": epoch}
+
+    timed_out = await test_client.get("/api/v1/stocks/next-tick", params={**params, "timeout": 0.05})
+    assert timed_out.status_code == 200
+    assert timed_out.json() == {"epoch": epoch, "version": after, "reset": False, "changes": []}
+
+    stale = await test_client.get("/api/v1/stocks/next-tick", params={"after": after + 1, "epoch": "stale"})
+    assert stale.json()["reset"] is True
+    assert stale.json()["version"] == after
+
+    poll = asyncio.create_task(
+        test_client.get("/api/v1/stocks/next-tick", params={**params, "timeout": 5})
+    )
+    while price_ticks.waiting() == 0:
+        await asyncio.sleep(0.01)
+
+    version = price_ticks.bump()
+    price_change_log.record(version, {s.id: Decimal("61.25")})
+
+    woken = await asyncio.wait_for(poll, 2)
+    assert woken.json() == {
+        "epoch": epoch,
+        "version": version,
+        "reset": False,
+        "changes": [{"stock_id": s.id, "current_price": "61.25"}],
+    }
+    assert price_ticks.waiting() == 0
+
+
+async def _wait_for_subscriber(known: set) -> asyncio.Queue:
+    while not price_broadcaster._subscribers - known:
+        await asyncio.sleep(0.01)
+    return next(iter(price_broadcaster._subscribers - known))
+
+
+def _overflow(version: int):
+    """Publish enough ticks to drop every subscriber that is not reading"""
+    for offset in range(price_broadcaster.queue_size + 1):
+        price_broadcaster.publish({1: Decimal("1.00")}, datetime.now(), version + offset)
+
+
+@pytest.mark.asyncio
+async def test_price_stream_sse_frames_ticks_and_unsubscribes(test_client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(stocks_routes.settings, "PRICE_STREAM_KEEPALIVE_SECONDS", 0.01)
+    known = set(price_broadcaster._subscribers)
+
+    request = asyncio.create_task(test_client.get("/api/v1/stocks/stream"))
+    queue = await _wait_for_subscriber(known)
+
+    message = price_broadcaster.publish({7: Decimal("12.34")}, datetime(2026, 1, 1, 9, 30), version=41)
+    while not queue.empty():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.03)  # let a keepalive through
+
+    # Falling behind ends the stream, which is how this request completes
+    _overflow(42)
+    resp = await asyncio.wait_for(request, 2)
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert resp.headers["cache-control"] == "no-cache"
+    assert resp.text.startswith("retry: 5000\n\n")
+    assert ": keepalive\n\n" in resp.text
+    assert f"id: 41\nevent: tick\ndata: {message.text}\n\n" in resp.text
+    assert json.loads(message.text)["prices"] == {"7": "12.34"}
+    assert price_broadcaster._subscribers == known
+
+
+def test_price_stream_websocket_sends_ticks_and_unsubscribes():
+    client = TestClient(app)
+    subscribers = len(price_broadcaster)
+
+    with client.websocket_connect("/api/v1/stocks/stream/ws") as ws:
+        while ws.portal.call(len, price_broadcaster) == subscribers:
+            pass
+        ws.portal.call(price_broadcaster.publish, {3: Decimal("99.50")}, datetime(2026, 1, 1), 5)
+        assert json.loads(ws.receive_text()) == {
+            "type": "tick",
+            "version": 5,
+            "timestamp": "2026-01-01T00:00:00",
+            "prices": {"3": "99.50"},
+        }
+
+    # Closing the socket unsubscribes it
+    assert len(price_broadcaster) == subscribers
+
+
+def test_price_stream_websocket_closes_slow_clients():
+    client = TestClient(app)
+    subscribers = len(price_broadcaster)
+
+    with client.websocket_connect("/api/v1/stocks/stream/ws") as ws:
+        while ws.portal.call(len, price_broadcaster) == subscribers:
+            pass
+        ws.portal.call(_overflow, 1)
+        with pytest.raises(WebSocketDisconnect) as closed:
+            while True:
+                ws.receive_text()
+        assert closed.value.code == 1013
+
+    assert len(price_broadcaster) == subscribers
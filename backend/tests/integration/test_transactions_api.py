@@ -1,9 +1,13 @@
+import json
 import pytest
+from datetime import datetime, timedelta
 from decimal import Decimal
 from httpx import AsyncClient
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import User, Stock, Wallet
+from app.db.models import IdempotencyKey, User, Stock, Transaction, TransactionType, Wallet
+from app.services.trade_versions import user_trade_versions
 
 
 async def _create_user(session: AsyncSession, email: str, username: str, balance: float) -> User:
@@ -94,3 +98,361 @@ async def test_sell_insufficient_quantity(test_client: AsyncClient, db_session:
     assert resp.status_code == 400
     assert "Insufficient stock quantity" in resp.json()["detail"]
 
+
+
+@pytest.mark.asyncio
+async def test_repeat_buys_accumulate_wallet(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "repeat@example.com", "repeat", 1000.00)
+    stock = await _create_stock(db_session, "BUY_C", "Repeatable", 50.00)
+
+    for _ in range(2):
+        resp = await test_client.post("/api/v1/transactions/buy", json={"user_id": user.id, "stock_id": stock.id, "amount": "100.00"})
+        assert resp.status_code == 200
+
+    assert Decimal(str(resp.json()["new_balance"])) == Decimal("800.00")
+    w = (await db_session.execute(Wallet.__table__.select().where(Wallet.user_id == user.id, Wallet.stock_id == stock.id))).all()
+    assert len(w) == 1
+    assert w[0].quantity == Decimal("4.000000")
+
+
+@pytest.mark.asyncio
+async def test_sell_entire_position_removes_wallet(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "sellall@example.com", "sellall", 0.00)
+    stock = await _create_stock(db_session, "SELL_C", "Liquidated", 20.00)
+    db_session.add(Wallet(user_id=user.id, stock_id=stock.id, quantity=Decimal("2.000000")))
+    await db_session.commit()
+
+    resp = await test_client.post("/api/v1/transactions/sell", json={"user_id": user.id, "stock_id": stock.id, "quantity": "2.000000"})
+    assert resp.status_code == 200
+    assert Decimal(str(resp.json()["new_balance"])) == Decimal("40.00")
+
+    w = (await db_session.execute(Wallet.__table__.select().where(Wallet.user_id == user.id, Wallet.stock_id == stock.id))).first()
+    assert w is None
+
+
+@pytest.mark.asyncio
+async def test_fractional_sells_drain_position_exactly(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "dust@example.com", "dust", 10.00)
+    stock = await _create_stock(db_session, "DUST_A", "Fractional", 3.00)
+    user_id, stock_id = user.id, stock.id
+
+    buy = await test_client.post("/api/v1/transactions/buy", json={"user_id": user_id, "stock_id": stock_id, "amount": "0.90"})
+    assert buy.status_code == 200
+    assert Decimal(str(buy.json()["quantity"])) == Decimal("0.300000")
+
+    for _ in range(3):
+        resp = await test_client.post("/api/v1/transactions/sell", json={"user_id": user_id, "stock_id": stock_id, "quantity": "0.1"})
+        assert resp.status_code == 200, resp.text
+    assert Decimal(str(resp.json()["new_balance"])) == Decimal("10.00")
+
+    w = (await db_session.execute(Wallet.__table__.select().where(Wallet.user_id == user_id, Wallet.stock_id == stock_id))).first()
+    assert w is None
+
+
+@pytest.mark.asyncio
+async def test_buy_unknown_user(test_client: AsyncClient, db_session: AsyncSession):
+    stock = await _create_stock(db_session, "BUY_D", "Orphan", 10.00)
+
+    resp = await test_client.post("/api/v1/transactions/buy", json={"user_id": 999999, "stock_id": stock.id, "amount": "10.00"})
+    assert resp.status_code == 404
+    assert "User with id 999999 not found" in resp.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_batch_best_effort_mixed_legs(test_client: AsyncClient, db_session: AsyncSession):
+    u1 = await _create_user(db_session, "batch1@example.com", "batch1", 1000.00)
+    u2 = await _create_user(db_session, "batch2@example.com", "batch2", 10.00)
+    stock = await _create_stock(db_session, "BATCH_A", "Batchable", 100.00)
+
+    payload = {
+        "mode": "best_effort",
+        "legs": [
+            {"type": "BUY", "user_id": u1.id, "stock_id": stock.id, "amount": "300.00"},
+            {"type": "SELL", "user_id": u1.id, "stock_id": stock.id, "quantity": "1.000000"},
+            {"type": "BUY", "user_id": u2.id, "stock_id": stock.id, "amount": "50.00"},
+            {"type": "SELL", "user_id": u1.id, "stock_id": stock.id, "quantity": "2.000000"},
+        ],
+    }
+    resp = await test_client.post("/api/v1/transactions/batch", json=payload)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["status"] == "partial"
+    assert [r["status"] for r in data["results"]] == ["success", "success", "failed", "success"]
+    assert "Insufficient balance" in data["results"][2]["error"]
+    assert all(r["transaction_id"] for r in data["results"] if r["status"] == "success")
+
+    await db_session.refresh(u1)
+    assert u1.balance == Decimal("1000.00")
+    w = (await db_session.execute(Wallet.__table__.select().where(Wallet.user_id == u1.id, Wallet.stock_id == stock.id))).first()
+    assert w is None
+
+
+@pytest.mark.asyncio
+async def test_single_and_batch_sells_release_the_same_cost_basis(test_client: AsyncClient, db_session: AsyncSession):
+    single = await _create_user(db_session, "costsingle@example.com", "costsingle", 0.00)
+    batch = await _create_user(db_session, "costbatch@example.com", "costbatch", 0.00)
+    stock = await _create_stock(db_session, "COST_A", "Cost Basis", 40.00)
+    for user in (single, batch):
+        db_session.add(Wallet(
+            user_id=user.id, stock_id=stock.id, quantity=Decimal("769.622450"),
+            total_cost=Decimal("30407.50"), avg_buy_price=Decimal("39.509631")
+        ))
+    await db_session.commit()
+
+    quantity = "594.563244"
+    resp = await test_client.post(
+        "/api/v1/transactions/sell",
+        json={"user_id": single.id, "stock_id": stock.id, "quantity": quantity}
+    )
+    assert resp.status_code == 200
+    resp = await test_client.post(
+        "/api/v1/transactions/batch",
+        json={"legs": [{"type": "SELL", "user_id": batch.id, "stock_id": stock.id, "quantity": quantity}]}
+    )
+    assert resp.status_code == 200
+
+    rows = (await db_session.execute(
+        select(Wallet.user_id, Wallet.total_cost, Wallet.avg_buy_price).where(Wallet.stock_id == stock.id)
+    )).all()
+    wallets = {row.user_id: row for row in rows}
+    assert wallets[single.id].total_cost == wallets[batch.id].total_cost == Decimal("6916.52")
+    assert wallets[single.id].avg_buy_price == wallets[batch.id].avg_buy_price
+
+
+@pytest.mark.asyncio
+async def test_batch_atomic_rolls_back_on_failure(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "atomic@example.com", "atomic", 100.00)
+    stock = await _create_stock(db_session, "BATCH_B", "Atomic", 10.00)
+
+    payload = {
+        "legs": [
+            {"type": "BUY", "user_id": user.id, "stock_id": stock.id, "amount": "50.00"},
+            {"type": "BUY", "user_id": user.id, "stock_id": stock.id, "amount": "80.00"},
+        ],
+    }
+    resp = await test_client.post("/api/v1/transactions/batch", json=payload)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["mode"] == "atomic"
+    assert [r["status"] for r in data["results"]] == ["rolled_back", "failed"]
+
+    await db_session.refresh(user)
+    assert user.balance == Decimal("100.00")
+
+
+@pytest.mark.asyncio
+async def test_buy_idempotency_key_replays_response(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "idem@example.com", "idem", 1000.00)
+    stock = await _create_stock(db_session, "IDEM_A", "Idempotent", 100.00)
+
+    payload = {"user_id": user.id, "stock_id": stock.id, "amount": "200.00"}
+    headers = {"Idempotency-Key": "order-123"}
+    first = await test_client.post("/api/v1/transactions/buy", json=payload, headers=headers)
+    trade_version = user_trade_versions.get(user.id)
+    second = await test_client.post("/api/v1/transactions/buy", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    # The replay must not invalidate the user's cached summaries
+    assert user_trade_versions.get(user.id) == trade_version
+
+    await db_session.refresh(user)
+    assert user.balance == Decimal("800.00")
+
+    mismatched = await test_client.post(
+        "/api/v1/transactions/buy", json={**payload, "amount": "300.00"}, headers=headers
+    )
+    assert mismatched.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_sell_idempotency_key_database_store(test_client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    from app.routes import transactions as transactions_routes
+    from app.services.idempotency import DatabaseIdempotencyStore
+
+    monkeypatch.setattr(transactions_routes, "idempotency_store", DatabaseIdempotencyStore())
+
+    user = await _create_user(db_session, "idemdb@example.com", "idemdb", 0.00)
+    stock = await _create_stock(db_session, "IDEM_B", "Durable", 10.00)
+    db_session.add(Wallet(user_id=user.id, stock_id=stock.id, quantity=Decimal("5.000000")))
+    await db_session.commit()
+
+    payload = {"user_id": user.id, "stock_id": stock.id, "quantity": "2.000000"}
+    headers = {"Idempotency-Key": "sell-abc"}
+    first = await test_client.post("/api/v1/transactions/sell", json=payload, headers=headers)
+    second = await test_client.post("/api/v1/transactions/sell", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json()["transaction_id"] == second.json()["transaction_id"]
+
+    await db_session.refresh(user)
+    assert user.balance == Decimal("20.00")
+
+
+@pytest.mark.asyncio
+async def test_database_idempotency_store_purges_expired_keys(db_session: AsyncSession):
+    from app.services.idempotency import DatabaseIdempotencyStore
+
+    now = datetime.now()
+    db_session.add_all([
+        IdempotencyKey(key="purge-old", request_hash="a", response={}, created_at=now - timedelta(hours=2)),
+        IdempotencyKey(key="purge-new", request_hash="b", response={}, created_at=now),
+    ])
+    await db_session.commit()
+
+    purged = await DatabaseIdempotencyStore(ttl_seconds=3600).purge_expired(db_session)
+    assert purged >= 1
+
+    result = await db_session.execute(
+        select(IdempotencyKey.key).where(IdempotencyKey.key.in_(["purge-old", "purge-new"]))
+    )
+    assert result.scalars().all() == ["purge-new"]
+
+
+@pytest.mark.asyncio
+async def test_transaction_history_keyset_pagination(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "history@example.com", "history", 10000.00)
+    s1 = await _create_stock(db_session, "HIST_A", "History A", 10.00)
+    s2 = await _create_stock(db_session, "HIST_B", "History B", 20.00)
+
+    for i in range(5):
+        stock = s1 if i % 2 == 0 else s2
+        resp = await test_client.post("/api/v1/transactions/buy", json={"user_id": user.id, "stock_id": stock.id, "amount": "10.00"})
+        assert resp.status_code == 200
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = await test_client.get(f"/api/v1/transactions/{user.id}", params=params)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total_count"] == 5
+        seen.extend(t["id"] for t in data["transactions"])
+        cursor = data["next_cursor"]
+        if not data["has_more"]:
+            assert cursor is None
+            break
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+    filtered = (await test_client.get(
+        f"/api/v1/transactions/{user.id}", params={"stock_id": s2.id, "type": "BUY", "count": "exact"}
+    )).json()
+    assert filtered["total_count"] == 2
+    assert {t["stock_id"] for t in filtered["transactions"]} == {s2.id}
+
+
+@pytest.mark.asyncio
+async def test_transaction_history_pages_across_whole_second_timestamps(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "wholesec@example.com", "wholesec", 1000.00)
+    stock = await _create_stock(db_session, "HIST_S", "Whole Second", 10.00)
+
+    # Rows written with explicit whole-second timestamps, several sharing one
+    whole_second = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    for offset in (0, 0, 0, 1, 2):
+        db_session.add(Transaction(
+            user_id=user.id, stock_id=stock.id, type=TransactionType.BUY, amount=Decimal("10.00"),
+            quantity=Decimal("1.000000"), price_per_unit=Decimal("10.00"),
+            timestamp=whole_second + timedelta(seconds=offset)
+        ))
+    await db_session.commit()
+    # ... and one stamped by the database default
+    resp = await test_client.post("/api/v1/transactions/buy", json={"user_id": user.id, "stock_id": stock.id, "amount": "10.00"})
+    assert resp.status_code == 200
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "count": "exact"}
+        if cursor:
+            params["cursor"] = cursor
+        data = (await test_client.get(f"/api/v1/transactions/{user.id}", params=params)).json()
+        seen.extend((t["timestamp"], t["id"]) for t in data["transactions"])
+        cursor = data["next_cursor"]
+        if not data["has_more"]:
+            break
+
+    assert len(seen) == len(set(seen)) == data["total_count"] == 6
+    assert seen == sorted(seen, key=lambda t: (datetime.fromisoformat(t[0]), t[1]), reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_transaction_history_cached_count_tracks_trades(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "histcount@example.com", "histcount", 1000.00)
+    stock = await _create_stock(db_session, "HIST_C", "History C", 10.00)
+    payload = {"user_id": user.id, "stock_id": stock.id, "amount": "10.00"}
+
+    await test_client.post("/api/v1/transactions/buy", json=payload)
+    first = (await test_client.get(f"/api/v1/transactions/{user.id}")).json()
+    assert first["total_count"] == 1
+
+    await test_client.post("/api/v1/transactions/buy", json=payload)
+    second = (await test_client.get(f"/api/v1/transactions/{user.id}")).json()
+    assert second["total_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_transaction_history_invalid_cursor(test_client: AsyncClient):
+    resp = await test_client.get("/api/v1/transactions/1", params={"cursor": "not-a-cursor"})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_transaction_export_csv_and_ndjson(test_client: AsyncClient, db_session: AsyncSession):
+    user = await _create_user(db_session, "export@example.com", "export", 1000.00)
+    stock = await _create_stock(db_session, "EXP_A", "Exportable", 10.00)
+    for _ in range(3):
+        await test_client.post("/api/v1/transactions/buy", json={"user_id": user.id, "stock_id": stock.id, "amount": "10.00"})
+
+    csv_resp = await test_client.get(f"/api/v1/transactions/{user.id}/export")
+    assert csv_resp.status_code == 200
+    assert csv_resp.headers["content-type"].startswith("text/csv")
+    lines = csv_resp.text.strip().splitlines()
+    assert lines[0].startswith("id,user_id,stock_id,type")
+    assert len(lines) == 4
+
+    nd_resp = await test_client.get(f"/api/v1/transactions/{user.id}/export", params={"format": "ndjson"})
+    assert nd_resp.status_code == 200
+    records = [json.loads(line) for line in nd_resp.text.strip().splitlines()]
+    assert len(records) == 3
+    assert all(r["type"] == "BUY" and r["amount"] == "10.00" for r in records)
+
+    missing = await test_client.get("/api/v1/transactions/999999/export")
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_trades_through_group_commit_journal(test_client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    import asyncio
+    from app.routes import transactions as transactions_routes
+    from app.services.trade_journal import TradeJournal
+
+    journal = TradeJournal(enabled=True, flush_interval_ms=20)
+    await journal.start()
+    monkeypatch.setattr(transactions_routes, "trade_journal", journal)
+    try:
+        user = await _create_user(db_session, "journal@example.com", "journal", 100.00)
+        stock = await _create_stock(db_session, "JRNL_A", "Journaled", 10.00)
+        user_id, stock_id = user.id, stock.id
+
+        resp = await test_client.post("/api/v1/transactions/buy", json={"user_id": user.id, "stock_id": stock.id, "amount": "20.00"})
+        assert resp.status_code == 200
+        assert Decimal(str(resp.json()["quantity"])) == Decimal("2.000000")
+
+        poor = await test_client.post("/api/v1/transactions/buy", json={"user_id": user_id, "stock_id": stock_id, "amount": "500.00"})
+        assert poor.status_code == 400
+        assert "Insufficient balance" in poor.json()["detail"]
+
+        batches_before = journal.batches_flushed
+        results = await asyncio.gather(*(
+            journal.buy(user_id, stock_id, Decimal("10.00")) for _ in range(5)
+        ))
+        assert journal.batches_flushed == batches_before + 1
+        assert len({r.transaction_id for r in results}) == 5
+    finally:
+        await journal.shutdown()
+
+    await db_session.refresh(user)
+    assert user.balance == Decimal("30.00")
@@ -0,0 +1,70 @@
+import random
+from decimal import Decimal
+
+import numpy as np
+
+from app.utils.fixed_point import (
+    Cents,
+    MicroUnits,
+    QUANTITY_SCALE,
+    div_round,
+    from_cents,
+    from_micros,
+    percentage,
+    round_to_cents,
+    to_cents,
+    to_micros,
+)
+
+
+def test_round_trips_preserve_scale():
+    assert to_cents(Decimal("1234.56")) == 123456
+    assert from_cents(123456) == Decimal("1234.56")
+    assert str(from_cents(100000)) == "1000.00"
+    assert to_micros(Decimal("0.000001")) == 1
+    assert str(from_micros(5_000_000)) == "5.000000"
+    assert to_cents(19.99) == 1999
+    assert to_cents("-0.015") == -2
+
+
+def test_div_round_is_half_even():
+    assert div_round(5, 2) == 2
+    assert div_round(7, 2) == 4
+    assert div_round(10, 4) == 2
+    assert div_round(11, 4) == 3
+    assert div_round(-5, 2) == -2
+
+
+def test_round_to_cents_matches_sql_round():
+    assert round_to_cents(0.004) == 0
+    assert round_to_cents(0.5 * 0.01) == 1
+    assert round_to_cents(-2.675) == -268
+    assert round_to_cents(np.array([0.004, 12.345, 80.0])).tolist() == [0, 1235, 8000]
+
+
+def test_percentage_of_cents():
+    assert percentage(2000, 5000) == Decimal("40.00")
+    assert percentage(-1, 3) == Decimal("-33.33")
+    assert percentage(100, 0) == Decimal("0.00")
+
+
+def test_trade_arithmetic_matches_decimal():
+    rng = random.Random(7)
+    for _ in range(2000):
+        amount = Decimal(f"{rng.uniform(0.01, 10000):.2f}")
+        price = Decimal(f"{rng.uniform(1, 1000):.2f}")
+        quantity = (amount / price).quantize(Decimal("0.000001"))
+        fixed_quantity = div_round(to_cents(amount) * QUANTITY_SCALE, to_cents(price))
+        assert from_micros(fixed_quantity) == quantity
+
+        proceeds = (quantity * price).quantize(Decimal("0.01"))
+        assert from_cents(div_round(fixed_quantity * to_cents(price), QUANTITY_SCALE)) == proceeds
+
+
+def test_type_decorators_convert_at_the_boundary():
+    cents, micros = Cents(), MicroUnits()
+    assert cents.process_bind_param(1999, None) == Decimal("19.99")
+    assert cents.process_result_value(Decimal("19.99"), None) == 1999
+    assert micros.process_bind_param(1_500_000, None) == Decimal("1.5")
+    assert micros.process_result_value(1.5, None) == 1_500_000
+    assert cents.process_result_value(None, None) is None
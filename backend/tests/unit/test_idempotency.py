@@ -0,0 +1,61 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from app.schemas.transaction import TransactionResponse
+from app.services.idempotency import InMemoryIdempotencyStore
+
+
+class _FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+
+def _response(transaction_id: int) -> TransactionResponse:
+    return TransactionResponse(
+        transaction_id=transaction_id, status="success", message="ok", new_balance=Decimal("1.00")
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_wait_for_in_flight_result():
+    store = InMemoryIdempotencyStore()
+    db = _FakeSession()
+    calls = 0
+
+    async def operation():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return _response(calls)
+
+    results = await asyncio.gather(*(store.execute(db, "k", "fp", operation) for _ in range(5)))
+
+    assert calls == 1
+    assert db.commits == 1
+    assert {r.transaction_id for r in results} == {1}
+
+
+@pytest.mark.asyncio
+async def test_lru_bound_and_failed_requests_not_stored():
+    store = InMemoryIdempotencyStore(max_keys=2)
+    db = _FakeSession()
+
+    async def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await store.execute(db, "bad", "fp", failing)
+    assert len(store) == 0
+
+    for i in range(3):
+        async def operation(i=i):
+            return _response(i)
+        await store.execute(db, f"k{i}", "fp", operation)
+
+    assert len(store) == 2
+    assert "k0" not in store._entries
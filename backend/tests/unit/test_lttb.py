@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.utils.lttb import lttb_indices
+
+
+def _reference_lttb(x, y, threshold):
+    """Straightforward per-bucket LTTB used to check the vectorized version"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        if i < threshold - 3:
+            next_lo, next_hi = hi, int((i + 2) * every) + 1
+        else:
+            next_lo, next_hi = n - 1, n
+        avg_x = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+        avg_y = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def test_short_series_is_returned_whole():
+    x = np.arange(5, dtype=float)
+    assert lttb_indices(x, x, 5).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(x, x, 50).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(x, x, 2).tolist() == [0, 4]
+
+
+def test_keeps_endpoints_and_spikes():
+    x = np.arange(100, dtype=float)
+    y = np.zeros(100)
+    y[37] = 50.0
+    y[71] = -40.0
+    kept = lttb_indices(x, y, 10)
+    assert len(kept) == 10
+    assert kept[0] == 0 and kept[-1] == 99
+    assert 37 in kept and 71 in kept
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_matches_reference_implementation():
+    rng = np.random.default_rng(7)
+    x = np.cumsum(rng.uniform(1, 3, 500))
+    y = np.cumsum(rng.normal(0, 1, 500))
+    for threshold in (3, 17, 50, 499):
+        assert lttb_indices(x, y, threshold).tolist() == _reference_lttb(x, y, threshold)
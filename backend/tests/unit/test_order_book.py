@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from app.db.models import TransactionType
+from app.services.order_book import BookOrder, OrderBook
+
+
+def _bid(order_id: int, limit: str, amount: str = "100.00") -> BookOrder:
+    return BookOrder(order_id, 1, 1, TransactionType.BUY, Decimal(limit), amount=Decimal(amount))
+
+
+def _ask(order_id: int, limit: str, quantity: str = "1.000000") -> BookOrder:
+    return BookOrder(order_id, 1, 1, TransactionType.SELL, Decimal(limit), quantity=Decimal(quantity))
+
+
+def test_pop_crossed_returns_only_crossed_orders_best_first():
+    book = OrderBook()
+    for order in (_bid(1, "90.00"), _bid(2, "95.00"), _bid(3, "80.00"), _ask(4, "110.00"), _ask(5, "105.00")):
+        book.add(order)
+
+    crossed = book.pop_crossed(1, Decimal("90.00"))
+    assert [o.order_id for o in crossed] == [2, 1]
+    assert len(book) == 3
+
+    crossed = book.pop_crossed(1, Decimal("107.00"))
+    assert [o.order_id for o in crossed] == [5]
+    assert 4 in book and 3 in book
+
+
+def test_remove_and_depth_aggregation():
+    book = OrderBook()
+    book.add(_bid(1, "50.00", "100.00"))
+    book.add(_bid(2, "50.00", "50.00"))
+    book.add(_bid(3, "40.00", "40.00"))
+    book.add(_ask(4, "60.00", "2.000000"))
+
+    bids, asks = book.depth(1, levels=1)
+    assert bids == [{"price": Decimal("50.00"), "quantity": Decimal("3.000000"), "orders": 2}]
+    assert asks == [{"price": Decimal("60.00"), "quantity": Decimal("2.000000"), "orders": 1}]
+
+    assert book.remove(1).order_id == 1
+    assert book.remove(1) is None
+    bids, _ = book.depth(1)
+    assert [level["price"] for level in bids] == [Decimal("50.00"), Decimal("40.00")]
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+from app.services.price_cache import PriceRing
+
+
+def test_ring_keeps_latest_rows_in_order():
+    base = datetime(2026, 1, 1, 12, 0)
+    ring = PriceRing(capacity=4, complete=True)
+    for i in range(6):
+        ring.append(i + 1, base + timedelta(minutes=5 * i), 10000 + i)
+
+    assert len(ring) == 4
+    assert not ring.complete
+    ids, timestamps, cents = ring.since(base)
+    assert ids.tolist() == [3, 4, 5, 6]
+    assert cents.tolist() == [10002, 10003, 10004, 10005]
+    assert timestamps[0].item() == base + timedelta(minutes=10)
+
+    ids, _, _ = ring.since(base + timedelta(minutes=16))
+    assert ids.tolist() == [5, 6]
+
+
+def test_ring_coverage():
+    base = datetime(2026, 1, 1, 12, 0)
+    partial = PriceRing(capacity=3)
+    assert not partial.covers(base)
+    partial.append(1, base, 100)
+    assert partial.covers(base)
+    assert partial.covers(base - timedelta(seconds=1)) is False
+
+    complete = PriceRing(capacity=3, complete=True)
+    complete.append(1, base, 100)
+    assert complete.covers(base - timedelta(days=30))
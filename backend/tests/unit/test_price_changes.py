@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+from app.services.price_changes import PriceChangeLog
+
+
+def test_since_merges_newer_ticks_keeping_latest_price():
+    log = PriceChangeLog(max_entries=10)
+    log.record(1, {1: Decimal("10.00"), 2: Decimal("20.00")})
+    log.record(2, {1: Decimal("11.00")})
+    log.record(3, {3: Decimal("30.00"), 1: Decimal("12.00")})
+
+    assert log.since(1, 3) == {1: Decimal("12.00"), 3: Decimal("30.00")}
+    assert log.since(2, 3) == {1: Decimal("12.00"), 3: Decimal("30.00")}
+    assert log.since(0, 3) == {1: Decimal("12.00"), 2: Decimal("20.00"), 3: Decimal("30.00")}
+    assert log.since(3, 3) == {}
+
+
+def test_since_refuses_versions_it_cannot_answer():
+    log = PriceChangeLog(max_entries=2)
+    for version in range(1, 5):
+        log.record(version, {1: Decimal(version)})
+
+    # Versions 1 and 2 were evicted, so changes after 1 are unknown
+    assert log.since(1, 4) is None
+    assert log.since(2, 4) == {1: Decimal(4)}
+    # From the future (e.g. before a restart) or behind an unlogged tick
+    assert log.since(7, 4) is None
+    assert log.since(3, 5) is None
@@ -0,0 +1,44 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.services.price_stream import PriceBroadcaster
+
+
+@pytest.mark.asyncio
+async def test_publish_serializes_once_for_every_subscriber():
+    broadcaster = PriceBroadcaster(queue_size=4)
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+
+    message = broadcaster.publish({1: Decimal("150.25")}, datetime(2026, 1, 1, 12, 0), version=7)
+
+    assert first.get_nowait() is message
+    assert second.get_nowait() is message
+    assert json.loads(message.text) == {
+        "type": "tick",
+        "version": 7,
+        "timestamp": "2026-01-01T12:00:00",
+        "prices": {"1": "150.25"},
+    }
+    assert message.sse == f"id: 7\nevent: tick\ndata: {message.text}\n\n"
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped_without_blocking():
+    broadcaster = PriceBroadcaster(queue_size=2)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+
+    for version in range(1, 4):
+        broadcaster.publish({1: Decimal(version)}, datetime.now(), version)
+        fast.get_nowait()
+
+    # The slow subscriber overflowed on the third tick: only the sentinel is left
+    assert slow.get_nowait() is None
+    assert slow.empty()
+    assert len(broadcaster) == 1
+    assert broadcaster.get_metrics()["dropped"] == 1
+
+    broadcaster.unsubscribe(fast)
+    assert broadcaster.publish({1: Decimal("1")}, datetime.now(), 4) is None
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from app.services.trade_locks import TradeLockManager
+
+
+async def _trade(manager: TradeLockManager, user_id: int, log: list):
+    async with manager.hold(None, user_id):
+        log.append(("start", user_id))
+        await asyncio.sleep(0.01)
+        log.append(("end", user_id))
+
+
+@pytest.mark.asyncio
+async def test_same_user_trades_are_serialized():
+    manager = TradeLockManager(stripes=8)
+    log: list = []
+
+    await asyncio.gather(_trade(manager, 3, log), _trade(manager, 3, log))
+
+    assert log == [("start", 3), ("end", 3), ("start", 3), ("end", 3)]
+    metrics = manager.get_metrics()
+    assert metrics["acquisitions"] == 2
+    assert metrics["contended"] == 1
+    assert metrics["wait_ms_max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_different_stripes_run_in_parallel():
+    manager = TradeLockManager(stripes=8)
+    log: list = []
+
+    await asyncio.gather(_trade(manager, 1, log), _trade(manager, 2, log))
+
+    assert [event for event, _ in log[:2]] == ["start", "start"]
+    assert manager.get_metrics()["contended"] == 0
+
+
+@pytest.mark.asyncio
+async def test_multi_user_hold_releases_all_stripes():
+    manager = TradeLockManager(stripes=4)
+
+    async with manager.hold(None, 5, 2, 1):
+        assert sum(lock.locked() for lock in manager._stripes) == 2
+
+    assert not any(lock.locked() for lock in manager._stripes)
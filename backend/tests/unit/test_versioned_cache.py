@@ -0,0 +1,19 @@
+from app.services.versioned_cache import VersionedLRUCache
+
+
+def test_lru_eviction_and_counters():
+    cache = VersionedLRUCache[str](max_entries=2)
+    cache.put((1, 0), "a")
+    cache.put((2, 0), "b")
+    assert cache.get((1, 0)) == "a"
+
+    cache.put((3, 0), "c")
+    assert cache.get((2, 0)) is None
+    assert cache.get((1, 0)) == "a"
+    assert cache.get((1, 1)) is None
+    assert len(cache) == 2
+
+    metrics = cache.get_metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["entries"]) == (2, 2, 2)
+    cache.clear()
+    assert len(cache) == 0